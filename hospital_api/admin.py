@@ -1,7 +1,33 @@
+from django import forms
 from django.contrib import admin
 
 # Register your models here.
 
 from .models import Department, Doctor, Patient, Appointment, MedicalRecord
 
-admin.site.register([Department, Doctor, Patient, Appointment, MedicalRecord])
\ No newline at end of file
+admin.site.register([Department, Doctor, Patient, Appointment])
+
+
+class MedicalRecordAdminForm(forms.ModelForm):
+    # a property on the model, stored as compressed chunks by MedicalRecord.save()
+    notes = forms.CharField(widget=forms.Textarea, required=False, strip=False)
+
+    class Meta:
+        model = MedicalRecord
+        fields = ["patient", "notes", "created_by"]
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        if self.instance.pk is not None:
+            self.fields["notes"].initial = self.instance.notes
+
+    def save(self, commit=True):
+        if "notes" in self.changed_data:
+            self.instance.notes = self.cleaned_data["notes"]
+        return super().save(commit)
+
+
+@admin.register(MedicalRecord)
+class MedicalRecordAdmin(admin.ModelAdmin):
+    form = MedicalRecordAdminForm
+    readonly_fields = ["preview", "notes_size"]
@@ -0,0 +1,74 @@
+# analytics.py
+# Doctor workload over a range of days, summed from the DoctorDayStat rollup that
+# stats.py keeps up to date, so the cost follows doctors x days, not appointments.
+from datetime import date, datetime, time, timedelta
+
+from django.db.models import Count, Q, Sum
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from .models import APPOINTMENT_STATUS, Appointment, DoctorDayStat
+from .scheduling import WORKDAY_END, WORKDAY_START, working_windows
+
+STATUSES = [status for status, _ in APPOINTMENT_STATUS]
+# cancelled appointments don't take up the doctor's time
+BOOKED_STATUSES = [status for status in STATUSES if status != "cancelled"]
+WORKDAY_MINUTES = (datetime.combine(date.min, WORKDAY_END) - datetime.combine(date.min, WORKDAY_START)).seconds // 60
+# ?ordering= name -> aggregate
+ORDERINGS = {"appointments": "total", "utilization": "booked_minutes", "completed": "completed"}
+
+
+def doctor_workload(start, end, ordering="-appointments", limit=20, specializations=()):
+    """
+    Appointments by status, distinct patients, booked minutes and utilization
+    (booked minutes / working minutes) per doctor from `start` to `end` inclusive,
+    ordered by one of ORDERINGS. Working minutes come from the booking calendar
+    (scheduling.working_windows), which is open every day of the week, weekends
+    included. Two queries: a GROUP BY doctor over the rollup,
+    then distinct patients for the doctors returned (appt_doctor_scheduled_idx),
+    which daily counts can't be summed into.
+    """
+    name = ordering.lstrip("-")
+    order = f"{'-' if ordering.startswith('-') else ''}{ORDERINGS[name]}"
+    rollup = DoctorDayStat.objects.filter(day__range=(start, end))
+    if specializations:
+        rollup = rollup.filter(doctor__specialization__in=specializations)
+    rows = list(
+        rollup.values("doctor_id", "doctor__specialization", "doctor__user__first_name", "doctor__user__last_name")
+        .annotate(
+            total=Sum("appointments"),
+            booked_minutes=Coalesce(Sum("minutes", filter=Q(status__in=BOOKED_STATUSES)), 0),
+            **{status: Coalesce(Sum("appointments", filter=Q(status=status)), 0) for status in STATUSES},
+        )
+        .order_by(order, "doctor_id")[:limit]
+    )
+
+    tz = timezone.get_current_timezone()
+    since = timezone.make_aware(datetime.combine(start, time.min), tz)
+    until = timezone.make_aware(datetime.combine(end + timedelta(days=1), time.min), tz)
+    patients = dict(
+        Appointment.objects.filter(
+            doctor_id__in=[row["doctor_id"] for row in rows],
+            scheduled_at__gte=since,
+            scheduled_at__lt=until,
+            status__in=BOOKED_STATUSES,
+        ).order_by().values("doctor_id").annotate(n=Count("patient_id", distinct=True)).values_list("doctor_id", "n")
+    ) if rows else {}
+
+    working_minutes = int(sum(
+        (window_end - window_start).total_seconds() for window_start, window_end in working_windows(since, until)
+    )) // 60
+    return [
+        {
+            "doctor": row["doctor_id"],
+            # User.get_full_name()
+            "name": f"{row['doctor__user__first_name']} {row['doctor__user__last_name']}".strip(),
+            "specialization": row["doctor__specialization"],
+            "appointments": row["total"],
+            "by_status": {status: row[status] for status in STATUSES if row[status]},
+            "patients": patients.get(row["doctor_id"], 0),
+            "booked_minutes": row["booked_minutes"],
+            "utilization": round(row["booked_minutes"] / working_minutes, 3),
+        }
+        for row in rows
+    ]
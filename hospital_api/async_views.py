@@ -0,0 +1,65 @@
+# async_views.py
+# Async-native list/retrieve for the busiest read endpoints, for ASGI deployments.
+from asgiref.sync import sync_to_async
+from django.http import HttpResponse
+from django.views import View
+from rest_framework.exceptions import APIException
+from rest_framework.permissions import BasePermission
+
+from .renderers import ORJSONRenderer
+
+
+def checks_objects(permissions):
+    return any(type(permission).has_object_permission is not BasePermission.has_object_permission for permission in permissions)
+
+
+class AsyncReadView(View):
+    """
+    GET /async/<prefix>/ and /async/<prefix>/<pk>/ for a viewset with a fast list serializer.
+
+    The rows are fetched with the async ORM, so under ASGI a request waiting on the
+    database holds no thread. Authentication, permissions, throttling, filters,
+    ordering, cursors and the JSON body are the viewset's own: its initial() runs
+    in a thread first, as in a sync request. Object permissions need the model
+    instance, so a viewset that has any loads it for retrieve.
+    """
+    viewset = None
+    http_method_names = ["get", "options"]
+
+    async def get(self, request, pk=None):
+        action = "list" if pk is None else "retrieve"
+        viewset = self.viewset(action_map={"get": action}, format_kwarg=None, args=(), kwargs=self.kwargs)
+        drf_request = viewset.initialize_request(request)
+        viewset.request, viewset.headers = drf_request, viewset.default_response_headers
+        try:
+            # authentication reads the session/user tables
+            await sync_to_async(viewset.initial)(drf_request)
+            fast = viewset.get_list_serializer()
+            queryset = fast.get_queryset(viewset.filter_queryset(viewset.get_queryset()))
+            if pk is not None:
+                return await self.retrieve(viewset, fast, queryset, pk)
+            paginator = viewset.paginator
+            page = await paginator.apaginate_queryset(queryset, drf_request, view=viewset)
+            data = paginator.get_paginated_response(fast.serialize(page)).data
+        except APIException as exc:
+            return await sync_to_async(self.handle_exception)(viewset, drf_request, exc)
+        return self.render(data)
+
+    async def retrieve(self, viewset, fast, queryset, pk):
+        row = await queryset.filter(pk=pk).afirst()
+        if row is None:
+            model = self.viewset.queryset.model
+            return self.render({"detail": f"No {model._meta.object_name} matches the given query."}, 404)
+        permissions = viewset.get_permissions()
+        if checks_objects(permissions):
+            instance = await viewset.get_queryset().aget(pk=pk)
+            await sync_to_async(viewset.check_object_permissions)(viewset.request, instance)
+        return self.render(fast.to_representation(row))
+
+    def handle_exception(self, viewset, request, exc):
+        # DRF's own error response: WWW-Authenticate/403 for anonymous requests, Retry-After for throttling
+        response = viewset.finalize_response(request, viewset.handle_exception(exc))
+        return response.render()
+
+    def render(self, data, status=200):
+        return HttpResponse(ORJSONRenderer().render(data), status=status, content_type="application/json")
@@ -0,0 +1,210 @@
+# bulk.py
+# Bulk create / update / delete for viewsets, validated with the regular serializers.
+from django.db import transaction
+from django.utils import timezone
+from rest_framework import serializers, status
+from rest_framework.decorators import action
+from rest_framework.response import Response
+from rest_framework.validators import UniqueValidator
+
+from . import stats
+from .caching import invalidate
+
+BULK_MAX_ITEMS = 1000
+
+
+class BulkMixin:
+    """
+    POST/PATCH/DELETE /<prefix>/bulk/ with a JSON array of items (or {"ids": [...]} to delete).
+
+    Every item is validated with `serializer_class`. Related pks (`bulk_related`) and
+    unique fields (`bulk_unique`) are checked with one query per field for the whole
+    batch. Nothing is written unless every item is valid; errors are reported per item
+    index. Valid batches are written with bulk_create / bulk_update in one transaction.
+    """
+    # field name -> queryset used to resolve that field's pks in one query
+    bulk_related = {}
+    bulk_unique = ()
+
+    @action(detail=False, methods=["post", "patch", "delete"])
+    def bulk(self, request):
+        if request.method == "DELETE":
+            return self.bulk_destroy(request)
+
+        items = request.data
+        if not isinstance(items, list) or not items:
+            raise serializers.ValidationError({"detail": "Expected a non-empty list of items."})
+        if len(items) > BULK_MAX_ITEMS:
+            raise serializers.ValidationError({"detail": f"At most {BULK_MAX_ITEMS} items per request."})
+        if not all(isinstance(item, dict) for item in items):
+            raise serializers.ValidationError({"detail": "Every item must be an object."})
+
+        if request.method == "POST":
+            return self.bulk_create(items)
+        return self.bulk_update(items)
+
+    def get_bulk_context(self, items):
+        context = self.get_serializer_context()
+        context["prefetched"] = {}
+        for field, queryset in self.bulk_related.items():
+            pks = set()
+            for item in items:
+                try:
+                    pks.add(int(item[field]))
+                except (KeyError, TypeError, ValueError):
+                    pass
+            context["prefetched"][queryset.model] = queryset.in_bulk(pks)
+        return context
+
+    def get_bulk_serializer(self, context, instance=None, data=None):
+        serializer = self.get_serializer_class()(instance, data=data, partial=instance is not None, context=context)
+        # uniqueness is checked once for the whole batch in unique_errors()
+        for field in self.bulk_unique:
+            serializer.fields[field].validators = [
+                validator for validator in serializer.fields[field].validators
+                if not isinstance(validator, UniqueValidator)
+            ]
+        return serializer
+
+    def unique_errors(self, rows, errors, exclude_pks=()):
+        model = self.get_queryset().model
+        for field in self.bulk_unique:
+            values = [row.get(field) for row in rows]
+            taken = set(
+                model.objects.filter(**{f"{field}__in": [v for v in values if v is not None]})
+                .exclude(pk__in=exclude_pks)
+                .values_list(field, flat=True)
+            )
+            seen = set()
+            for index, value in enumerate(values):
+                if value is None:
+                    continue
+                if value in taken or value in seen:
+                    errors.setdefault(index, {})[field] = [f"{model._meta.verbose_name} with this {field} already exists."]
+                seen.add(value)
+
+    def bulk_errors(self, objs, errors, exclude_pks=()):
+        """Hook for cross-row checks on the unsaved/updated instances, e.g. double booking."""
+
+    def bulk_created(self, objs):
+        """Hook run in the create transaction after the rows are inserted."""
+
+    def bulk_updated(self, before, objs):
+        """Hook run in the update transaction after the rows are written, `before` are the rows as they were stored."""
+
+    def error_response(self, errors):
+        return Response(
+            {"errors": [{"index": index, "errors": errors[index]} for index in sorted(errors)]},
+            status=status.HTTP_400_BAD_REQUEST,
+        )
+
+    def bulk_create(self, items):
+        context = self.get_bulk_context(items)
+        model = self.get_queryset().model
+        serializers_ = [self.get_bulk_serializer(context, data=item) for item in items]
+        errors = {index: s.errors for index, s in enumerate(serializers_) if not s.is_valid()}
+
+        rows = [s.validated_data if index not in errors else {} for index, s in enumerate(serializers_)]
+        self.unique_errors(rows, errors)
+        objs = [model(**row) for row in rows]
+        with transaction.atomic():
+            # cross-row checks run in the same transaction as the write
+            self.bulk_errors(objs, errors)
+            if errors:
+                return self.error_response(errors)
+            model.objects.bulk_create(objs)
+            self.bulk_created(objs)
+            stats.record(model, after=objs)
+        invalidate(model)
+        data = self.get_serializer_class()(objs, many=True, context=context).data
+        return Response(data, status=status.HTTP_201_CREATED)
+
+    def bulk_update(self, items):
+        model = self.get_queryset().model
+        errors = {}
+        pks = []
+        for index, item in enumerate(items):
+            try:
+                pks.append(int(item["id"]))
+            except (KeyError, TypeError, ValueError):
+                errors[index] = {"id": ["A valid id is required."]}
+                pks.append(None)
+        given = [pk for pk in pks if pk is not None]
+        if len(set(given)) != len(given):
+            raise serializers.ValidationError({"detail": "Each id may appear only once."})
+        instances = self.get_queryset().in_bulk(given)
+        for index, pk in enumerate(pks):
+            if pk is not None and pk not in instances:
+                errors[index] = {"id": [f"No {model._meta.verbose_name} with id {pk}."]}
+        if errors:
+            return self.error_response(errors)
+
+        context = self.get_bulk_context(items)
+        serializers_ = [
+            self.get_bulk_serializer(context, instance=instances[pk], data=item) for pk, item in zip(pks, items)
+        ]
+        errors = {index: s.errors for index, s in enumerate(serializers_) if not s.is_valid()}
+        rows = [s.validated_data if index not in errors else {} for index, s in enumerate(serializers_)]
+        self.unique_errors(rows, errors, exclude_pks=pks)
+
+        with transaction.atomic():
+            # the instances above were read without a lock: counters and bulk_updated() move
+            # from the rows as stored now, locked until commit, and the columns the items
+            # don't set are taken from them too, so the new counters see the current values
+            stored = model.objects.select_for_update().in_bulk(given)
+            deleted = {
+                index: {"id": [f"No {model._meta.verbose_name} with id {pk}."]}
+                for index, pk in enumerate(pks) if pk not in stored
+            }
+            if deleted:
+                return self.error_response({**errors, **deleted})
+            counted = stats.changes(model, before=stored.values()) if model in stats.TRACKED else None
+
+            fields = set()
+            objs = []
+            for pk, row in zip(pks, rows):
+                obj = instances[pk]
+                for field in model._meta.concrete_fields:
+                    setattr(obj, field.attname, getattr(stored[pk], field.attname))
+                for field, value in row.items():
+                    setattr(obj, field, value)
+                    fields.add(field)
+                objs.append(obj)
+
+            # bulk_update() skips auto_now, so bump those fields here
+            now = timezone.now()
+            for field in model._meta.concrete_fields:
+                if getattr(field, "auto_now", False):
+                    fields.add(field.name)
+                    for obj in objs:
+                        setattr(obj, field.attname, now)
+
+            self.bulk_errors(objs, errors, exclude_pks=pks)
+            if errors:
+                return self.error_response(errors)
+            if fields:
+                model.objects.bulk_update(objs, sorted(fields))
+            self.bulk_updated(list(stored.values()), objs)
+            if counted is not None:
+                counted.update(stats.changes(model, after=objs))
+                stats.apply(counted)
+        invalidate(model)
+        data = self.get_serializer_class()(objs, many=True, context=context).data
+        return Response(data)
+
+    def bulk_destroy(self, request):
+        ids = request.data.get("ids") if isinstance(request.data, dict) else None
+        if not isinstance(ids, list) or not ids:
+            raise serializers.ValidationError({"ids": "Expected a non-empty list of ids."})
+        if len(ids) > BULK_MAX_ITEMS:
+            raise serializers.ValidationError({"ids": f"At most {BULK_MAX_ITEMS} ids per request."})
+        try:
+            ids = [int(pk) for pk in ids]
+        except (TypeError, ValueError):
+            raise serializers.ValidationError({"ids": "Every id must be an integer."})
+
+        with transaction.atomic():
+            queryset = self.get_queryset().model.objects.filter(pk__in=ids)
+            found = set(queryset.values_list("pk", flat=True))
+            queryset.delete()
+        return Response({"deleted": sorted(found), "not_found": sorted(set(ids) - found)})
@@ -0,0 +1,90 @@
+# caching.py
+# Response cache for read-heavy endpoints, invalidated by model signals (see signals.py).
+import hashlib
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.utils.http import parse_etags
+from rest_framework import status
+from rest_framework.renderers import JSONRenderer
+from rest_framework.response import Response
+
+GENERATION_KEY = "hospital_api:generation:{}"
+RESPONSE_KEY = "hospital_api:response:{}"
+
+
+def invalidate(model):
+    """
+    Drops every cached response that depends on `model`. Responses are keyed on the
+    generation of each model they read, so replacing the generation is O(1).
+    Call this after writes that skip signals (queryset.update(), bulk_create()).
+
+    Inside a transaction the generation moves on commit: moved earlier, a request
+    in between would cache the pre-commit rows under the new generation.
+    """
+    key = GENERATION_KEY.format(model._meta.label_lower)
+    transaction.on_commit(lambda: cache.set(key, time.time_ns(), None))
+
+
+def etag_matches(header, etag):
+    """If-None-Match comparison: weak comparison, so W/ prefixes are ignored."""
+    tags = parse_etags(header)
+    return "*" in tags or etag in [tag.removeprefix("W/") for tag in tags]
+
+
+def generations(models):
+    keys = [GENERATION_KEY.format(model._meta.label_lower) for model in models]
+    found = cache.get_many(keys)
+    for key in keys:
+        if key not in found:
+            cache.add(key, time.time_ns(), None)
+            found[key] = cache.get(key)
+    return [found[key] for key in keys]
+
+
+class CachedResponseMixin:
+    """
+    Caches list/retrieve response data per endpoint and query string, and answers
+    If-None-Match with 304 before touching the database or the serializer.
+    """
+    cache_models = ()
+
+    def list(self, request, *args, **kwargs):
+        return self.cached_response(request, super().list, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.cached_response(request, super().retrieve, *args, **kwargs)
+
+    def cached_response(self, request, view, *args, **kwargs):
+        key = self.response_cache_key(request)
+        entry = cache.get(key)
+        if entry is None:
+            response = view(request, *args, **kwargs)
+            if response.status_code != status.HTTP_200_OK:
+                return response
+            etag = '"%s"' % hashlib.md5(JSONRenderer().render(response.data)).hexdigest()
+            entry = (etag, response.data)
+            cache.set(key, entry, getattr(settings, "RESPONSE_CACHE_TIMEOUT", 300))
+        else:
+            response = None
+
+        etag, data = entry
+        if etag_matches(request.headers.get("If-None-Match", ""), etag):
+            response = Response(status=status.HTTP_304_NOT_MODIFIED)
+        elif response is None:
+            response = Response(data)
+        response["ETag"] = etag
+        return response
+
+    def response_cache_key(self, request):
+        parts = [
+            self.basename,
+            self.action,
+            ",".join(str(generation) for generation in generations(self.cache_models or [self.queryset.model])),
+            request.get_host(),
+            request.get_full_path(),
+            request.headers.get("Accept", ""),
+        ]
+        return RESPONSE_KEY.format(hashlib.md5("|".join(parts).encode()).hexdigest())
@@ -0,0 +1,37 @@
+# fieldsets.py
+# Sparse fieldsets: ?fields=id,name returns only those keys, ?exclude=uses drops
+# keys. Both narrow the SQL column list too, not just the JSON.
+from rest_framework.exceptions import ValidationError
+
+from .filters import split_values
+
+FIELDS_PARAM = "fields"
+EXCLUDE_PARAM = "exclude"
+
+
+def requested_fields(request, available):
+    """The names in `available` (kept in that order) left by ?fields= and ?exclude=, None if neither is given."""
+    fields = split_values(request, FIELDS_PARAM)
+    exclude = split_values(request, EXCLUDE_PARAM)
+    if not fields and not exclude:
+        return None
+    for param, names in [(FIELDS_PARAM, fields), (EXCLUDE_PARAM, exclude)]:
+        unknown = [name for name in names if name not in available]
+        if unknown:
+            raise ValidationError({param: f"Unknown field '{unknown[0]}', use any of: {', '.join(available)}."})
+    selected = tuple(name for name in available if (not fields or name in fields) and name not in exclude)
+    if not selected:
+        raise ValidationError({EXCLUDE_PARAM: "No fields left to return."})
+    return selected
+
+
+def project(queryset, columns):
+    """
+    `queryset.only(*columns)`, with select_related() cut down to the relations the
+    columns go through: a deferred foreign key can't also be followed.
+    """
+    relations = {column.rsplit("__", 1)[0] for column in columns if "__" in column}
+    queryset = queryset.select_related(None)
+    if relations:
+        queryset = queryset.select_related(*relations)
+    return queryset.only(*columns)
@@ -0,0 +1,102 @@
+# filters.py
+# Query-param filtering and whitelisted ordering, declared per viewset:
+#
+#     filter_fields = {"status": "in", "scheduled_at": "range"}
+#     ordering_fields = {"scheduled_at": ("scheduled_at", "id")}
+#
+# "in" fields take ?status=a,b (or ?status=a&status=b), "range" fields take
+# ?scheduled_at_after=...&scheduled_at_before=... (dates or datetimes, both inclusive).
+# ?ordering=-scheduled_at picks one of `ordering_fields`, each backed by an index.
+from datetime import datetime, timedelta
+
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.db import models
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+from rest_framework.exceptions import ValidationError
+from rest_framework.filters import BaseFilterBackend
+
+ORDERING_PARAM = "ordering"
+
+
+def split_values(request, param):
+    values = []
+    for value in request.query_params.getlist(param):
+        values.extend(part.strip() for part in value.split(",") if part.strip())
+    return values
+
+
+def to_python(field, param, value):
+    if field.is_relation:
+        field = field.target_field
+    try:
+        return field.to_python(value)
+    except DjangoValidationError:
+        raise ValidationError({param: f"'{value}' is not a valid {field.name}."})
+
+
+def parse_bound(field, param, value, upper):
+    """Lower/upper bound of a range filter. A date as the upper bound of a datetime covers that whole day."""
+    if not isinstance(field, models.DateTimeField):
+        return "lte" if upper else "gte", to_python(field, param, value)
+    try:
+        # parse_datetime() also accepts a bare date, so dates are checked first. Both
+        # raise ValueError for well-formed but impossible dates (2024-02-30)
+        day = parse_date(value)
+        moment = parse_datetime(value) if day is None else None
+    except ValueError:
+        day = moment = None
+    if day is not None:
+        moment = timezone.make_aware(datetime.combine(day + timedelta(days=1) if upper else day, datetime.min.time()))
+        return "lt" if upper else "gte", moment
+    if moment is None:
+        raise ValidationError({param: f"'{value}' is not a valid date or datetime."})
+    if timezone.is_naive(moment):
+        moment = timezone.make_aware(moment)
+    return "lte" if upper else "gte", moment
+
+
+def requested_ordering(request, view):
+    """The ordering asked for with ?ordering=, or None. Unknown fields are a 400, not a silent full sort."""
+    value = request.query_params.get(ORDERING_PARAM)
+    if not value:
+        return None
+    allowed = getattr(view, "ordering_fields", None) or {}
+    descending = value.startswith("-")
+    name = value.lstrip("-")
+    if name not in allowed:
+        raise ValidationError({ORDERING_PARAM: f"Can't order by '{name}', use one of: {', '.join(sorted(allowed)) or 'none'}."})
+    if not descending:
+        return tuple(allowed[name])
+    return tuple(field[1:] if field.startswith("-") else f"-{field}" for field in allowed[name])
+
+
+class HospitalFilterBackend(BaseFilterBackend):
+    """Applies the viewset's `filter_fields` and `ordering_fields` to the list queryset."""
+
+    def filter_queryset(self, request, queryset, view):
+        lookups = {}
+        for name, kind in (getattr(view, "filter_fields", None) or {}).items():
+            field = queryset.model._meta.get_field(name)
+            column = field.attname
+            if kind == "in":
+                values = split_values(request, name)
+                if values:
+                    lookups[f"{column}__in"] = [to_python(field, name, value) for value in values]
+            elif kind == "range":
+                for suffix, upper in [("after", False), ("before", True)]:
+                    param = f"{name}_{suffix}"
+                    value = request.query_params.get(param)
+                    if value:
+                        lookup, bound = parse_bound(field, param, value, upper)
+                        lookups[f"{column}__{lookup}"] = bound
+            else:
+                raise ValueError(f"Unknown filter kind '{kind}' for {view.__class__.__name__}.{name}")
+        if lookups:
+            queryset = queryset.filter(**lookups)
+
+        # paginated lists are ordered by the paginator, this covers unpaginated ones
+        ordering = requested_ordering(request, view) if getattr(view, "action", None) == "list" else None
+        if ordering:
+            queryset = queryset.order_by(*ordering)
+        return queryset
@@ -0,0 +1,170 @@
+# forecast.py
+# Reorder forecasting: a burn rate per item from the dispense history in the
+# StockMovement ledger, then for every item at once how long its stock lasts, how
+# much of it expires before it can be used and how much to order. Results go to
+# InventoryForecast, read by GET /inventory/reorder/. NumPy is optional: without
+# it the same numbers come from a plain Python loop.
+import math
+import time
+from datetime import timedelta
+from itertools import islice, repeat
+
+from django.db import connection, transaction
+from django.db.models import Sum
+from django.utils import timezone
+
+from .models import InventoryForecast, InventoryItem, StockMovement
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+HISTORY_DAYS = 90  # dispensing averaged over
+LEAD_TIME_DAYS = 7  # from placing an order to the stock arriving
+COVER_DAYS = 30  # how long an order should last once it arrives
+HORIZON_DAYS = 3650  # longest days_of_stock, for items nobody dispenses
+BATCH_SIZE = 5000
+# InventoryForecast columns computed per item
+RESULTS = (
+    "burn_rate", "usable_stock", "expiring_quantity", "days_of_stock", "reorder_point", "order_quantity", "needs_reorder",
+)
+
+
+def load_columns(now, history_days, batch_size=BATCH_SIZE):
+    """
+    One list per input, in item order: two queries, the items and a GROUP BY item
+    over the dispense rows in the window.
+    """
+    dispensed = dict(
+        StockMovement.objects.filter(kind="dispense", created_at__gte=now - timedelta(days=history_days))
+        .order_by().values("item_id").annotate(total=Sum("quantity")).values_list("item_id", "total")
+    )
+    today = timezone.localdate(now)
+    columns = {name: [] for name in ("id", "stock", "min_stock", "dispensed", "history_days", "expires_in")}
+    rows = InventoryItem.objects.order_by("pk").values_list("pk", "stock", "min_stock", "expiry_date", "created_at")
+    for pk, stock, min_stock, expiry_date, created_at in rows.iterator(chunk_size=batch_size):
+        columns["id"].append(pk)
+        columns["stock"].append(max(stock, 0))
+        columns["min_stock"].append(min_stock)
+        # dispense quantities are negative in the ledger
+        columns["dispensed"].append(-dispensed.get(pk, 0))
+        # an item added during the window is averaged over the days it has existed
+        columns["history_days"].append(min(max((now - created_at).total_seconds() / 86400, 1.0), history_days))
+        columns["expires_in"].append(math.inf if expiry_date is None else (expiry_date - today).days)
+    return columns
+
+
+def forecast_python(columns, lead_time_days, cover_days):
+    """forecast_numpy() one item at a time, for installs without NumPy."""
+    results = {name: [] for name in RESULTS}
+    for stock, min_stock, dispensed, history_days, expires_in in zip(
+        columns["stock"], columns["min_stock"], columns["dispensed"], columns["history_days"], columns["expires_in"]
+    ):
+        burn_rate = dispensed / history_days
+        reorder_point = math.ceil(burn_rate * lead_time_days + min_stock)
+        if burn_rate == 0:
+            usable = stock if expires_in > 0 else 0
+            days_of_stock = float(min(expires_in, HORIZON_DAYS)) if usable else 0.0
+            order_quantity = 0
+        else:
+            if expires_in == math.inf:
+                usable = stock
+            else:
+                usable = min(max(math.floor(burn_rate * expires_in), 0), stock)
+            days_of_stock = min(usable / burn_rate, HORIZON_DAYS)
+            target = math.ceil(burn_rate * (lead_time_days + cover_days) + min_stock)
+            order_quantity = max(target - usable, 0) if usable <= reorder_point else 0
+        results["burn_rate"].append(burn_rate)
+        results["usable_stock"].append(usable)
+        results["expiring_quantity"].append(stock - usable)
+        results["days_of_stock"].append(days_of_stock)
+        results["reorder_point"].append(reorder_point)
+        results["order_quantity"].append(order_quantity)
+        results["needs_reorder"].append(order_quantity > 0)
+    return results
+
+
+def forecast_numpy(columns, lead_time_days, cover_days):
+    """
+    Burn rate = units dispensed / days of history. Stock that won't be dispensed
+    before the expiry date at that rate expires first; the rest is usable. An item
+    is reordered once its usable stock won't last the lead time on top of
+    min_stock, topped up to cover the lead time plus `cover_days`. Items nobody
+    dispenses are never reordered, their stock lasts until it expires.
+    """
+    stock = numpy.array(columns["stock"], dtype=numpy.int64)
+    min_stock = numpy.array(columns["min_stock"], dtype=numpy.float64)
+    burn_rate = numpy.array(columns["dispensed"], dtype=numpy.float64) / numpy.array(columns["history_days"])
+    expires_in = numpy.array(columns["expires_in"], dtype=numpy.float64)
+    # 0 * inf is nan for items without an expiry date, replaced by where()
+    with numpy.errstate(invalid="ignore"):
+        used_before_expiry = numpy.floor(burn_rate * expires_in)
+    unused = burn_rate == 0
+    usable = numpy.where(
+        numpy.isinf(expires_in), stock, numpy.minimum(numpy.maximum(used_before_expiry, 0), stock)
+    )
+    usable = numpy.where(unused, numpy.where(expires_in > 0, stock, 0), usable).astype(numpy.int64)
+    # unused stock lasts until it expires
+    days_of_stock = numpy.where(usable > 0, expires_in, 0.0)
+    numpy.divide(usable, burn_rate, out=days_of_stock, where=~unused)
+    days_of_stock = numpy.minimum(days_of_stock, HORIZON_DAYS)
+    reorder_point = numpy.ceil(burn_rate * lead_time_days + min_stock).astype(numpy.int64)
+    target = numpy.ceil(burn_rate * (lead_time_days + cover_days) + min_stock).astype(numpy.int64)
+    order_quantity = numpy.where(~unused & (usable <= reorder_point), numpy.maximum(target - usable, 0), 0)
+    # tolist() hands back Python ints/floats/bools for the ORM
+    return {
+        "burn_rate": burn_rate.tolist(),
+        "usable_stock": usable.tolist(),
+        "expiring_quantity": (stock - usable).tolist(),
+        "days_of_stock": days_of_stock.tolist(),
+        "reorder_point": reorder_point.tolist(),
+        "order_quantity": order_quantity.tolist(),
+        "needs_reorder": (order_quantity > 0).tolist(),
+    }
+
+
+def write_forecasts(item_ids, results, now, batch_size=BATCH_SIZE):
+    """
+    Replaces every InventoryForecast row in one transaction. Plain executemany()
+    instead of bulk_create(): per-value field preparation made up most of the
+    run time at 100k items.
+    """
+    quote = connection.ops.quote_name
+    names = ["item_id", *RESULTS, "computed_at"]
+    sql = "INSERT INTO {} ({}) VALUES ({})".format(
+        quote(InventoryForecast._meta.db_table), ", ".join(map(quote, names)), ", ".join(["%s"] * len(names))
+    )
+    computed_at = InventoryForecast._meta.get_field("computed_at").get_db_prep_value(now, connection)
+    rows = zip(item_ids, *(results[name] for name in RESULTS), repeat(computed_at))
+    with transaction.atomic(), connection.cursor() as cursor:
+        InventoryForecast.objects.all().delete()
+        while batch := list(islice(rows, batch_size)):
+            cursor.executemany(sql, batch)
+
+
+def refresh_forecasts(
+    now=None, history_days=HISTORY_DAYS, lead_time_days=LEAD_TIME_DAYS, cover_days=COVER_DAYS, batch_size=BATCH_SIZE,
+):
+    """Recomputes every item's InventoryForecast in one transaction and returns what it did."""
+    now = now or timezone.now()
+    started = time.perf_counter()
+    columns = load_columns(now, history_days, batch_size)
+    loaded = time.perf_counter()
+    forecast = forecast_numpy if numpy is not None else forecast_python
+    results = forecast(columns, lead_time_days, cover_days)
+    computed = time.perf_counter()
+    write_forecasts(columns["id"], results, now, batch_size)
+    finished = time.perf_counter()
+    items = len(columns["id"])
+    return {
+        "items": items,
+        "needs_reorder": sum(results["needs_reorder"]),
+        "order_units": sum(results["order_quantity"]),
+        "expiring_units": sum(results["expiring_quantity"]),
+        "engine": forecast.__name__.removeprefix("forecast_"),
+        "load_seconds": round(loaded - started, 3),
+        "compute_seconds": round(computed - loaded, 3),
+        "write_seconds": round(finished - computed, 3),
+        "items_per_second": round(items / (finished - started), 1) if items else None,
+    }
@@ -0,0 +1,186 @@
+# jobs.py
+# Periodic background jobs, run by `manage.py run_jobs` (no broker needed).
+import time
+from collections import Counter, defaultdict
+from datetime import timedelta
+
+from django.db import transaction
+from django.db.models import Count, F, IntegerField, Max, OuterRef, Q, Subquery
+from django.db.models.functions import Coalesce, TruncDate
+from django.utils import timezone
+
+from . import stats
+from .caching import invalidate
+from .forecast import refresh_forecasts
+from .models import Appointment, Doctor, Patient
+
+# status of an appointment that has ended -> status it moves to
+TRANSITIONS = {"confirmed": "completed", "scheduled": "no_show"}
+BATCH_SIZE = 500
+
+
+def transition_past_appointments(now=None, grace=timedelta(0), batch_size=BATCH_SIZE):
+    """
+    Moves appointments that ended more than `grace` ago out of the active statuses,
+    one batch at a time, and returns what it did. Completed visits advance
+    Patient.last_visit, and a doctor's first completed visit with a patient adds
+    one to Doctor.patients, so neither is ever recounted from scratch.
+    """
+    cutoff = (now or timezone.now()) - grace
+    report = {"batches": 0, "transitioned": Counter(), "patients_updated": 0, "doctors_updated": 0}
+    started = time.perf_counter()
+    position = None
+    while True:
+        with transaction.atomic():
+            # a range scan of appt_scheduled_idx, which also gives the batch order
+            queryset = Appointment.objects.filter(status__in=TRANSITIONS, scheduled_at__lt=cutoff)
+            if position is not None:
+                queryset = queryset.filter(Q(scheduled_at__gt=position[0]) | Q(scheduled_at=position[0], id__gt=position[1]))
+            rows = list(
+                queryset.select_for_update()
+                .order_by("scheduled_at", "id")
+                .values_list("id", "status", "scheduled_at", "duration_minutes", "patient_id", "doctor_id")[:batch_size]
+            )
+            if not rows:
+                break
+            position = rows[-1][2], rows[-1][0]
+            # still running at the cutoff, picked up by a later run
+            ended = [row for row in rows if row[2] + timedelta(minutes=row[3]) <= cutoff]
+            if ended:
+                patients, doctors = transition_batch(ended)
+                report["batches"] += 1
+                report["patients_updated"] += patients
+                report["doctors_updated"] += doctors
+                for _, status, *_ in ended:
+                    report["transitioned"][TRANSITIONS[status]] += 1
+        if len(rows) < batch_size:
+            break
+
+    if report["batches"]:
+        # queryset.update() sends no signals
+        for model in [Appointment, Patient, Doctor]:
+            invalidate(model)
+    seconds = time.perf_counter() - started
+    total = sum(report["transitioned"].values())
+    report.update(
+        transitioned=dict(report["transitioned"]),
+        seconds=round(seconds, 3),
+        rows_per_second=round(total / seconds, 1) if seconds else None,
+    )
+    return report
+
+
+def transition_batch(rows):
+    """One UPDATE per status change, plus the last_visit and Doctor.patients updates. Returns rows changed."""
+    by_status = defaultdict(list)
+    for row in rows:
+        by_status[row[1]].append(row[0])
+    completed = [row for row in rows if TRANSITIONS[row[1]] == "completed"]
+    new_pairs = first_visits(completed)
+
+    for status, ids in by_status.items():
+        Appointment.objects.filter(pk__in=ids).update(status=TRANSITIONS[status])
+    stats.record(
+        Appointment,
+        before=[
+            Appointment(status=row[1], scheduled_at=row[2], duration_minutes=row[3], doctor_id=row[5]) for row in rows
+        ],
+        after=[
+            Appointment(status=TRANSITIONS[row[1]], scheduled_at=row[2], duration_minutes=row[3], doctor_id=row[5])
+            for row in rows
+        ],
+    )
+
+    patients = advance_last_visits((row[4], timezone.localdate(row[2])) for row in completed)
+
+    doctors = 0
+    by_increment = defaultdict(list)
+    for doctor_id, n in Counter(doctor_id for doctor_id, _ in new_pairs).items():
+        by_increment[n].append(doctor_id)
+    for n, doctor_ids in by_increment.items():
+        doctors += Doctor.objects.filter(pk__in=doctor_ids).update(patients=F("patients") + n)
+    return patients, doctors
+
+
+def advance_last_visits(visits):
+    """Moves Patient.last_visit forward to the (patient, day) visits, never back. Returns rows changed."""
+    by_day = defaultdict(set)
+    for patient_id, day in visits:
+        by_day[day].add(patient_id)
+    patients = 0
+    for day, patient_ids in by_day.items():
+        patients += Patient.objects.filter(
+            Q(last_visit__isnull=True) | Q(last_visit__lt=day), pk__in=patient_ids
+        ).update(last_visit=day)
+    return patients
+
+
+def first_visits(completed):
+    """(doctor, patient) pairs in `completed` that had no completed appointment before."""
+    pairs = {(row[5], row[4]) for row in completed if row[5] is not None}
+    if not pairs:
+        return set()
+    seen = Appointment.objects.filter(
+        status="completed",
+        doctor_id__in={doctor_id for doctor_id, _ in pairs},
+        patient_id__in={patient_id for _, patient_id in pairs},
+    ).values_list("doctor_id", "patient_id").distinct()
+    return pairs - set(seen)
+
+
+def rebuild_visit_counts():
+    """Recomputes Doctor.patients and Patient.last_visit from completed appointments."""
+    with transaction.atomic():
+        update_visit_counts(Doctor.objects.all(), Patient.objects.all())
+    invalidate(Doctor)
+    invalidate(Patient)
+
+
+def refresh_visit_counts(before=(), after=()):
+    """
+    Recounts Doctor.patients for the doctors whose completed visits differ between the
+    `before` and `after` appointments, for writes outside transition_past_appointments():
+    API edits and deletes, bulk updates. New completed visits only advance
+    Patient.last_visit; it is recomputed for the patients that lost one.
+    """
+    before, after = completed_visits(before), completed_visits(after)
+    if before == after:
+        return
+    lost = {patient_id for _, patient_id, _ in before - after}
+    update_visit_counts(
+        Doctor.objects.filter(pk__in={doctor_id for doctor_id, _, _ in before ^ after if doctor_id is not None}),
+        Patient.objects.filter(pk__in=lost),
+    )
+    advance_last_visits((patient_id, day) for _, patient_id, day in after - before if patient_id not in lost)
+    invalidate(Doctor)
+    invalidate(Patient)
+
+
+def completed_visits(appointments):
+    return {
+        (appointment.doctor_id, appointment.patient_id, timezone.localdate(appointment.scheduled_at))
+        for appointment in appointments if appointment.status == "completed"
+    }
+
+
+def update_visit_counts(doctors, patients):
+    completed = Appointment.objects.filter(status="completed").order_by()
+    doctors.update(patients=Coalesce(Subquery(
+        completed.filter(doctor=OuterRef("pk")).values("doctor")
+        .annotate(n=Count("patient", distinct=True)).values("n"),
+        output_field=IntegerField(),
+    ), 0))
+    # patients without a completed appointment keep whatever last_visit they have
+    patients.filter(pk__in=completed.values("patient_id")).update(last_visit=Subquery(
+        completed.filter(patient=OuterRef("pk")).values("patient")
+        .annotate(day=Max(TruncDate("scheduled_at", tzinfo=timezone.get_current_timezone()))).values("day")
+    ))
+
+
+# name -> (function, seconds between runs)
+JOBS = {
+    "appointment_transitions": (transition_past_appointments, 300),
+    "inventory_forecast": (refresh_forecasts, 24 * 3600),
+}
+# left out of `run_jobs --once` (the every-few-minutes cron tick) unless named with --job
+SEPARATE_CRON_JOBS = {"inventory_forecast"}
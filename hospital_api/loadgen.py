@@ -0,0 +1,177 @@
+# loadgen.py
+# Deterministic synthetic data for load testing, written with bulk_create in batches.
+import random
+from datetime import date, datetime, time, timedelta
+
+from django.contrib.auth.models import User
+from django.db import transaction
+from django.utils import timezone
+
+from .models import Patient, Doctor, Appointment, MedicalRecord, InventoryItem
+
+FIRST_NAMES = [
+    "Wanjiku", "Kipchoge", "Akinyi", "Omondi", "Chebet", "Kamau", "Fatuma", "Jelimo",
+    "Peter", "Mary", "Njeri", "Otieno", "Achieng", "Mutua", "Amina", "Kiprono",
+    "Wairimu", "Baraka", "Zawadi", "Juma", "Nyambura", "Kibet", "Atieno", "Mwangi",
+]
+LAST_NAMES = [
+    "Kamau", "Rotich", "Odhiambo", "Otieno", "Koech", "Njuguna", "Mohamed", "Cheruiyot",
+    "Wachira", "Wambui", "Mwangi", "Hassan", "Kariuki", "Musyoka", "Ochieng", "Kiplagat",
+    "Njoroge", "Wekesa", "Owino", "Mutai", "Ndungu", "Barasa", "Chege", "Langat",
+]
+SPECIALIZATIONS = {
+    "Cardiologist": ["Cardiology Checkup", "Heart Checkup", "ECG Review"],
+    "Pediatrician": ["Pediatric Consultation", "Pediatric Vaccination", "Growth Monitoring"],
+    "Orthopedic Surgeon": ["Orthopedic Follow-up", "Bone Density Scan", "Fracture Review"],
+    "Neurologist": ["Neurology Consultation", "EEG Review"],
+    "Dermatologist": ["Dermatology Consultation", "Skin Biopsy Review"],
+    "General Practitioner": ["General Checkup", "Follow-up Visit"],
+}
+MEDICINE_CATEGORIES = {
+    "Analgesic": ("tablets", "Pain relief and fever reduction"),
+    "NSAID": ("tablets", "Pain relief, inflammation reduction"),
+    "Antibiotic": ("capsules", "Treat bacterial infections"),
+    "Pediatric Antibiotic": ("bottles", "Bacterial infections in children"),
+    "IV Fluid": ("bags", "Rehydration and IV medication dilution"),
+    "Oral Rehydration": ("sachets", "Treat dehydration and diarrhea"),
+    "Emergency Injection": ("vials", "Anaphylaxis treatment"),
+}
+NOTES = [
+    "Patient reports mild headache for three days. Advised rest and hydration.",
+    "Blood pressure within normal range. Continue current medication.",
+    "Follow-up on previous infection, symptoms resolved.",
+    "Routine checkup, no abnormalities found.",
+    "Prescribed a course of antibiotics, review in one week.",
+    "Vaccination administered, no adverse reaction observed.",
+]
+BLOOD_TYPES = ["O+", "O-", "A+", "A-", "B+", "B-", "AB+", "AB-"]
+# dates are generated around this day unless an origin is passed, so a seed
+# produces the same rows whatever day it runs on
+ORIGIN_DAY = date(2025, 1, 6)
+
+
+class LoadGenerator:
+    """Generates rows with a seeded RNG so two runs with the same seed produce the same data."""
+
+    def __init__(self, seed=42, batch_size=5000, origin=None, log=None):
+        self.rng = random.Random(seed)
+        self.seed = seed
+        self.batch_size = batch_size
+        self.origin = origin or timezone.make_aware(datetime.combine(ORIGIN_DAY, time(8, 0)))
+        self.log = log or (lambda message: None)
+
+    def bulk_insert(self, model, count, build, created=None, keep_pks=False):
+        """
+        Inserts `count` rows built by `build(n)`, one transaction per batch. Returns the
+        number inserted, or the pks with `keep_pks`. `created(objs)` runs in each batch's
+        transaction, for rows that save() would have written.
+        """
+        pks = []
+        inserted = 0
+        for start in range(0, count, self.batch_size):
+            objs = [build(n) for n in range(start, min(start + self.batch_size, count))]
+            with transaction.atomic():
+                objs = model.objects.bulk_create(objs)
+                if created is not None:
+                    created(objs)
+            inserted += len(objs)
+            if keep_pks:
+                pks.extend(obj.pk for obj in objs)
+            self.log(f"{model.__name__}: {inserted}/{count}")
+        return pks if keep_pks else inserted
+
+    def doctors(self, count):
+        rng = self.rng
+        user_ids = self.bulk_insert(User, count, lambda n: User(
+            username=f"loadgen{self.seed}_dr_{n}",
+            first_name=rng.choice(FIRST_NAMES),
+            last_name=rng.choice(LAST_NAMES),
+            email=f"dr{n}.s{self.seed}@hospital.com",
+        ), keep_pks=True)
+        specializations = list(SPECIALIZATIONS)
+        doctor_ids = self.bulk_insert(Doctor, count, lambda n: Doctor(
+            user_id=user_ids[n],
+            specialization=specializations[n % len(specializations)],
+            experience=rng.randint(1, 35),
+            phone=f"+2547{rng.randint(10_000_000, 99_999_999)}",
+            availability=rng.choices(["available", "unavailable", "on_leave"], [8, 1, 1])[0],
+            rating=round(rng.uniform(3.0, 5.0), 1),
+        ), keep_pks=True)
+        specialization_by_doctor = {pk: specializations[n % len(specializations)] for n, pk in enumerate(doctor_ids)}
+        return doctor_ids, user_ids, specialization_by_doctor
+
+    def patients(self, count):
+        rng = self.rng
+        today = self.origin.date()
+
+        def build(n):
+            first_name = rng.choice(FIRST_NAMES)
+            last_name = rng.choice(LAST_NAMES)
+            return Patient(
+                first_name=first_name,
+                last_name=last_name,
+                dob=today - timedelta(days=rng.randint(0, 90 * 365)),
+                gender=rng.choice(["Female", "Male"]),
+                phone=f"+2547{rng.randint(10_000_000, 99_999_999)}",
+                email=f"{first_name.lower()}.{last_name.lower()}{n}@email.com",
+                address=f"P.O. Box {rng.randint(100, 99_999)}, Nairobi",
+                blood_type=rng.choice(BLOOD_TYPES),
+                status=rng.choices(["active", "inactive"], [9, 1])[0],
+            )
+
+        return self.bulk_insert(Patient, count, build, keep_pks=True)
+
+    def appointments(self, count, patient_ids, doctors):
+        rng = self.rng
+        doctor_ids = list(doctors)
+
+        def build(n):
+            doctor_id = rng.choice(doctor_ids)
+            # two years of history and three months of bookings, in 30 minute slots
+            scheduled_at = self.origin + timedelta(minutes=30 * rng.randint(-2 * 365 * 20, 90 * 20))
+            if scheduled_at < self.origin:
+                status = rng.choices(["completed", "cancelled"], [9, 1])[0]
+            else:
+                status = rng.choices(["scheduled", "confirmed", "cancelled"], [6, 3, 1])[0]
+            return Appointment(
+                patient_id=rng.choice(patient_ids),
+                doctor_id=doctor_id,
+                scheduled_at=scheduled_at,
+                type=rng.choice(SPECIALIZATIONS[doctors[doctor_id]]),
+                status=status,
+            )
+
+        return self.bulk_insert(Appointment, count, build)
+
+    def records(self, count, patient_ids, user_ids):
+        rng = self.rng
+        return self.bulk_insert(MedicalRecord, count, lambda n: MedicalRecord(
+            patient_id=rng.choice(patient_ids),
+            notes=" ".join(rng.sample(NOTES, rng.randint(1, 3))),
+            created_by_id=rng.choice(user_ids),
+        ), created=lambda records: MedicalRecord.save_notes(records, replace=False))
+
+    def inventory(self, count):
+        rng = self.rng
+        today = self.origin.date()
+        categories = list(MEDICINE_CATEGORIES)
+
+        def build(n):
+            category = categories[n % len(categories)]
+            unit, uses = MEDICINE_CATEGORIES[category]
+            min_stock = rng.randint(10, 200)
+            return InventoryItem(
+                sku=f"LG{self.seed}-{n:06d}",
+                name=f"{category} {n}",
+                category=category,
+                uses=uses,
+                stock=rng.randint(0, 4 * min_stock),
+                min_stock=min_stock,
+                unit=unit,
+                expiry_date=today + timedelta(days=rng.randint(-60, 3 * 365)),
+            )
+
+        return self.bulk_insert(InventoryItem, count, build)
+
+    def already_generated(self):
+        return User.objects.filter(username__startswith=f"loadgen{self.seed}_").exists()
@@ -0,0 +1,172 @@
+# hospital_api/management/commands/benchmark_api.py
+
+import json
+import platform
+import statistics
+import subprocess
+import time
+import tracemalloc
+from datetime import timedelta
+
+import django
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from hospital_api.loadgen import LoadGenerator
+from hospital_api.models import Patient, Doctor
+from hospital_api.urls import router
+
+
+# basename -> function(n) returning a valid POST body for that endpoint
+def create_payloads():
+    patient_id = Patient.objects.order_by("id").values_list("id", flat=True).first()
+    doctor_id = Doctor.objects.order_by("id").values_list("id", flat=True).first()
+    start = timezone.now() + timedelta(days=365)
+    return {
+        "patient": lambda n: {"first_name": "Bench", "last_name": f"Patient{n}", "dob": "1990-01-01", "gender": "Female"},
+        "doctor": lambda n: {"user_name": f"Bench Doctor{n}", "user_email": f"bench.doctor{n}@hospital.com", "specialization": "Cardiologist"},
+        "appointment": lambda n: {"patient": patient_id, "doctor": doctor_id, "scheduled_at": (start + timedelta(minutes=30 * n)).isoformat(), "type": "Checkup"},
+        "department": lambda n: {"name": f"Bench Department {n}", "location": "Block Z"},
+        "medicalrecord": lambda n: {"patient": patient_id, "notes": "Routine checkup, no abnormalities found."},
+        "inventory": lambda n: {"sku": f"BENCH-{n:06d}", "name": f"Bench Medicine {n}", "stock": 100, "min_stock": 10},
+    }
+
+
+class QueryCounter:
+    # execute_wrapper counts every query, independent of DEBUG and the queries_log size
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        self.count += 1
+        return execute(sql, params, many, context)
+
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, max(0, round(pct / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmarks list/retrieve/create for every router-registered endpoint and prints "
+        "latency percentiles, queries per request and peak memory as JSON. The seeded "
+        "dataset and created rows are rolled back afterwards."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--patients", type=int, default=2000, help="Patients to seed, 0 benchmarks the existing data")
+        parser.add_argument("--iterations", type=int, default=50)
+        parser.add_argument("--warmup", type=int, default=5)
+        parser.add_argument("--page-size", type=int, default=50)
+        parser.add_argument("--seed", type=int, default=42)
+        parser.add_argument("--output", help="Write the JSON report to this file instead of stdout")
+
+    def handle(self, *args, **options):
+        self.iterations = options["iterations"]
+        self.warmup = options["warmup"]
+        # DEBUG allows localhost when ALLOWED_HOSTS is empty, otherwise use a configured host
+        host = next((h for h in settings.ALLOWED_HOSTS if h != "*" and not h.startswith(".")), "localhost")
+        self.client = APIClient(HTTP_HOST=host)
+
+        with transaction.atomic():
+            if options["patients"]:
+                self.seed(options["patients"], options["seed"])
+            self.payloads = create_payloads()
+            self.created = 0
+
+            endpoints = {}
+            for prefix, viewset, basename in router.registry:
+                basename = basename or router.get_default_basename(viewset)
+                list_url = reverse(f"{basename}-list")
+                self.stderr.write(f"Benchmarking /{prefix}/")
+                results = {"list": self.measure(lambda: self.client.get(list_url, {"page_size": options["page_size"]}))}
+
+                pk = viewset.queryset.order_by("pk").values_list("pk", flat=True).first()
+                if pk is not None:
+                    detail_url = reverse(f"{basename}-detail", args=[pk])
+                    results["retrieve"] = self.measure(lambda: self.client.get(detail_url))
+
+                if basename in self.payloads:
+                    payload = self.payloads[basename]
+                    results["create"] = self.measure(lambda: self.client.post(list_url, self.next_payload(payload), format="json"))
+
+                endpoints[prefix] = results
+
+            report = {"meta": self.meta(options), "endpoints": endpoints}
+            transaction.set_rollback(True)
+
+        output = json.dumps(report, indent=2)
+        if options["output"]:
+            with open(options["output"], "w") as f:
+                f.write(output + "\n")
+            self.stderr.write(self.style.SUCCESS(f"✔ Report written to {options['output']}"))
+        else:
+            self.stdout.write(output)
+
+    def seed(self, patients, seed):
+        generator = LoadGenerator(seed=seed)
+        doctor_ids, user_ids, specializations = generator.doctors(max(1, patients // 500))
+        patient_ids = generator.patients(patients)
+        generator.appointments(patients * 10, patient_ids, specializations)
+        generator.records(patients * 5, patient_ids, user_ids)
+        generator.inventory(max(1, patients // 10))
+
+    def next_payload(self, payload):
+        self.created += 1
+        return payload(self.created)
+
+    def measure(self, request):
+        for _ in range(self.warmup):
+            request()
+
+        timings = []
+        for _ in range(self.iterations):
+            start = time.perf_counter()
+            response = request()
+            timings.append((time.perf_counter() - start) * 1000)
+
+        # queries and memory are measured on separate requests so their overhead stays out of the timings
+        queries = QueryCounter()
+        with connection.execute_wrapper(queries):
+            request()
+        tracemalloc.start()
+        response = request()
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+        return {
+            "status": response.status_code,
+            "bytes": len(response.content),
+            "queries": queries.count,
+            "peak_memory_kb": round(peak / 1024, 1),
+            "mean_ms": round(statistics.mean(timings), 3),
+            "p50_ms": round(percentile(timings, 50), 3),
+            "p90_ms": round(percentile(timings, 90), 3),
+            "p99_ms": round(percentile(timings, 99), 3),
+            "min_ms": round(min(timings), 3),
+            "max_ms": round(max(timings), 3),
+        }
+
+    def meta(self, options):
+        try:
+            commit = subprocess.run(
+                ["git", "rev-parse", "HEAD"], capture_output=True, text=True, check=True
+            ).stdout.strip()
+        except (OSError, subprocess.CalledProcessError):
+            commit = None
+        return {
+            "commit": commit,
+            "timestamp": timezone.now().isoformat(),
+            "python": platform.python_version(),
+            "django": django.get_version(),
+            "database": connection.vendor,
+            "patients": options["patients"],
+            "iterations": self.iterations,
+            "page_size": options["page_size"],
+        }
@@ -0,0 +1,119 @@
+# hospital_api/management/commands/benchmark_asgi.py
+
+import asyncio
+import json
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from asgiref.sync import ThreadSensitiveContext, async_to_sync
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import AsyncClient, Client, override_settings
+
+from hospital_api.models import Appointment, InventoryItem, Patient
+
+# path under /api/ (sync) and /api/async/ (async) -> model whose first row is retrieved
+ENDPOINTS = {"patients": Patient, "appointments": Appointment, "inventory": InventoryItem}
+
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, max(0, round(pct / 100 * len(ordered)) - 1))]
+
+
+def summary(samples, wall, errors):
+    return {
+        "requests": len(samples),
+        "errors": errors,
+        "seconds": round(wall, 2),
+        "requests_per_second": round(len(samples) / wall, 1),
+        "p50_ms": round(percentile(samples, 50), 2),
+        "p99_ms": round(percentile(samples, 99), 2),
+        "max_ms": round(max(samples), 2),
+        "mean_ms": round(statistics.mean(samples), 2),
+    }
+
+
+class Command(BaseCommand):
+    help = (
+        "Compares the read endpoints served three ways at high concurrency: sync views in a "
+        "WSGI thread pool, the same sync views through the ASGI handler, and the async views "
+        "under /api/async/. Runs in-process against the existing data (nothing is written) "
+        "and prints requests/s and latency percentiles as JSON."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--concurrency", type=int, default=200, help="Requests in flight at once")
+        parser.add_argument("--requests", type=int, default=2000, help="Requests per mode")
+        parser.add_argument("--threads", type=int, default=32, help="WSGI worker threads")
+        parser.add_argument("--page-size", type=int, default=50)
+        parser.add_argument("--modes", default="wsgi,asgi_sync,asgi_async")
+
+    def handle(self, *args, **options):
+        paths = self.paths(options["page_size"])
+        if not paths:
+            raise CommandError("No data to read, run `manage.py seed` first.")
+        runners = {"wsgi": self.run_wsgi, "asgi_sync": self.run_asgi, "asgi_async": self.run_asgi}
+        report = {
+            "vendor": connection.vendor,
+            "concurrency": options["concurrency"],
+            "wsgi_threads": options["threads"],
+            "paths": paths,
+            "modes": {},
+        }
+        # the test clients send Host: testserver
+        with override_settings(ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, "testserver"]):
+            for mode in options["modes"].split(","):
+                prefix = "/api/async/" if mode == "asgi_async" else "/api/"
+                requests = [prefix + paths[n % len(paths)] for n in range(options["requests"])]
+                runners[mode](requests, options, report["modes"].setdefault(mode, {}))
+        self.stdout.write(json.dumps(report, indent=2))
+
+    def paths(self, page_size):
+        paths = []
+        for path, model in ENDPOINTS.items():
+            pk = model.objects.order_by("pk").values_list("pk", flat=True).first()
+            if pk is not None:
+                paths += [f"{path}/?page_size={page_size}", f"{path}/{pk}/"]
+        return paths
+
+    def run_wsgi(self, requests, options, result):
+        def get(path):
+            start = time.perf_counter()
+            status = Client().get(path).status_code
+            return (time.perf_counter() - start) * 1000, status
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(options["threads"]) as pool:
+            outcomes = list(pool.map(get, requests))
+        self.collect(outcomes, time.perf_counter() - started, result)
+
+    def run_asgi(self, requests, options, result):
+        outcomes = []
+
+        async def get(client, path, slots):
+            async with slots:
+                # what the ASGI handler does per request: sync code called from this
+                # request (sync views, the async ORM) gets the request's own thread
+                async with ThreadSensitiveContext():
+                    start = time.perf_counter()
+                    status = (await client.get(path)).status_code
+                    outcomes.append(((time.perf_counter() - start) * 1000, status))
+
+        async def run():
+            client = AsyncClient()
+            slots = asyncio.Semaphore(options["concurrency"])
+            await asyncio.gather(*(get(client, path, slots) for path in requests))
+
+        started = time.perf_counter()
+        async_to_sync(run)()
+        self.collect(outcomes, time.perf_counter() - started, result)
+
+    def collect(self, outcomes, wall, result):
+        samples = [elapsed for elapsed, status in outcomes if status == 200]
+        errors = len(outcomes) - len(samples)
+        if not samples:
+            raise CommandError(f"Every request failed ({errors}).")
+        result.update(summary(samples, wall, errors))
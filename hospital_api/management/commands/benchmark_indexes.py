@@ -0,0 +1,103 @@
+# hospital_api/management/commands/benchmark_indexes.py
+
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.utils import timezone
+from hospital_api.models import (
+    Patient, Doctor, Appointment, InventoryItem, MedicalRecord, ACTIVE_APPOINTMENT_STATUSES
+)
+from hospital_api.loadgen import LoadGenerator
+from hospital_api.views import AppointmentViewSet, PatientViewSet, InventoryItemViewSet
+
+
+class Command(BaseCommand):
+    help = (
+        "Prints EXPLAIN plans and timings for the list endpoint queries with and without "
+        "the hot path indexes. Runs inside a transaction that is rolled back, so the "
+        "generated rows and dropped indexes never persist."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--appointments", type=int, default=1_000_000)
+        parser.add_argument("--patients", type=int, default=50_000)
+        parser.add_argument("--doctors", type=int, default=200)
+        parser.add_argument("--repeat", type=int, default=5)
+        parser.add_argument("--page-size", type=int, default=50)
+
+    def handle(self, *args, **options):
+        self.repeat = options["repeat"]
+        with transaction.atomic():
+            self.generate(options)
+            with connection.cursor() as cursor:
+                cursor.execute("ANALYZE")
+
+            queries = self.queries(options["page_size"])
+            self.stdout.write(self.style.MIGRATE_HEADING("== With indexes =="))
+            after = self.run(queries, "with indexes")
+
+            # DDL is transactional in SQLite and PostgreSQL, so this is undone on rollback
+            with connection.cursor() as cursor:
+                for model in (Appointment, Patient, InventoryItem, MedicalRecord):
+                    for index in model._meta.indexes:
+                        cursor.execute(f"DROP INDEX {connection.ops.quote_name(index.name)}")
+            self.stdout.write(self.style.MIGRATE_HEADING("== Without indexes =="))
+            before = self.run(queries, "without indexes")
+
+            self.stdout.write(self.style.MIGRATE_HEADING("== Summary (best of %d) ==" % self.repeat))
+            for label in queries:
+                self.stdout.write(
+                    f"{label:<40} {before[label] * 1000:>10.2f} ms -> {after[label] * 1000:>8.2f} ms"
+                )
+            transaction.set_rollback(True)
+
+    def generate(self, options):
+        start = time.perf_counter()
+        generator = LoadGenerator(seed=0, batch_size=10_000)
+        doctor_ids, user_ids, specializations = generator.doctors(options["doctors"])
+        patient_ids = generator.patients(options["patients"])
+        generator.inventory(min(options["appointments"] // 10, 100_000))
+        generator.appointments(options["appointments"], patient_ids, specializations)
+        self.stdout.write(self.style.SUCCESS(
+            f"✔ Generated {options['appointments']} appointments in {time.perf_counter() - start:.1f}s"
+        ))
+
+    def queries(self, page_size):
+        doctor = Doctor.objects.order_by("id").first()
+        appointments = AppointmentViewSet.queryset
+        return {
+            "appointments list": appointments.order_by(*AppointmentViewSet.cursor_ordering)[:page_size],
+            "appointments by doctor": appointments.filter(doctor=doctor).order_by("-scheduled_at")[:page_size],
+            "appointments by status": appointments.filter(status="cancelled").order_by("-scheduled_at")[:page_size],
+            "upcoming active appointments": appointments.filter(
+                status__in=ACTIVE_APPOINTMENT_STATUSES, scheduled_at__gte=timezone.now()
+            ).order_by("scheduled_at")[:page_size],
+            "patients list": PatientViewSet.queryset.order_by(*PatientViewSet.cursor_ordering)[:page_size],
+            "patients by status": PatientViewSet.queryset.filter(status="inactive")[:page_size],
+            "inventory list": InventoryItemViewSet.queryset.order_by(*InventoryItemViewSet.cursor_ordering)[:page_size],
+            "inventory by expiry": InventoryItemViewSet.queryset.order_by("expiry_date")[:page_size],
+        }
+
+    def explain(self, queryset, phase):
+        # QuerySet.explain() would reuse sqlite3's cached EXPLAIN statement after the
+        # indexes are dropped, so tag the SQL with the phase to force a fresh plan
+        sql, params = queryset.query.sql_with_params()
+        with connection.cursor() as cursor:
+            cursor.execute(f"{connection.ops.explain_query_prefix()} {sql} /* {phase} */", params)
+            return "\n".join(" ".join(str(col) for col in row) for row in cursor.fetchall())
+
+    def run(self, queries, phase):
+        timings = {}
+        for label, queryset in queries.items():
+            self.stdout.write(self.style.HTTP_INFO(label))
+            self.stdout.write(self.explain(queryset, phase))
+            best = None
+            for _ in range(self.repeat):
+                start = time.perf_counter()
+                list(queryset.all())  # .all() clones, so the result cache is never reused
+                elapsed = time.perf_counter() - start
+                best = elapsed if best is None else min(best, elapsed)
+            timings[label] = best
+            self.stdout.write(f"  {best * 1000:.2f} ms\n")
+        return timings
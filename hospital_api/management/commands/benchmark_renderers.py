@@ -0,0 +1,85 @@
+# hospital_api/management/commands/benchmark_renderers.py
+
+import json
+import statistics
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils.text import compress_string
+from rest_framework.renderers import JSONRenderer
+
+from hospital_api.loadgen import LoadGenerator
+from hospital_api.middleware import BROTLI_QUALITY, brotli
+from hospital_api.models import Appointment, Patient
+from hospital_api.renderers import MessagePackRenderer, ORJSONRenderer, msgpack
+from hospital_api.serializers import AppointmentListSerializer, PatientListSerializer
+from hospital_api.views import AppointmentViewSet, PatientViewSet
+
+LISTS = {
+    "patients": (PatientViewSet, PatientListSerializer),
+    "appointments": (AppointmentViewSet, AppointmentListSerializer),
+}
+
+
+def median_ms(function, iterations):
+    timings = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        result = function()
+        timings.append((time.perf_counter() - start) * 1000)
+    return result, round(statistics.median(timings), 2)
+
+
+class Command(BaseCommand):
+    help = (
+        "Encodes large patient and appointment list responses with each renderer "
+        "(DRF JSON, orjson, MessagePack) and compresses them (gzip, brotli), printing "
+        "encode time and bytes on the wire as JSON. Seeds rows in a rolled-back "
+        "transaction when the database has fewer than --rows."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--rows", type=int, default=10000)
+        parser.add_argument("--iterations", type=int, default=5)
+        parser.add_argument("--seed", type=int, default=42)
+
+    def handle(self, *args, **options):
+        rows, iterations = options["rows"], options["iterations"]
+        renderers = {"drf_json": JSONRenderer(), "orjson": ORJSONRenderer()}
+        if msgpack is not None:
+            renderers["msgpack"] = MessagePackRenderer()
+        compressors = {"gzip": lambda body: compress_string(body, max_random_bytes=100)}
+        if brotli is not None:
+            compressors["brotli"] = lambda body: brotli.compress(body, quality=BROTLI_QUALITY)
+
+        with transaction.atomic():
+            self.ensure_rows(rows, options["seed"])
+            report = {"rows": rows, "iterations": iterations, "lists": {}}
+            for name, (viewset, serializer_class) in LISTS.items():
+                fast = serializer_class()
+                queryset = viewset.queryset.order_by(*viewset.cursor_ordering)[:rows]
+                data = {"next": None, "previous": None, "results": fast.serialize(fast.get_queryset(queryset))}
+                results = report["lists"][name] = {}
+                for renderer_name, renderer in renderers.items():
+                    body, encode_ms = median_ms(lambda: renderer.render(data), iterations)
+                    results[renderer_name] = {"encode_ms": encode_ms, "bytes": len(body)}
+                    for compressor_name, compress in compressors.items():
+                        compressed, compress_ms = median_ms(lambda: compress(body), iterations)
+                        results[renderer_name][compressor_name] = {
+                            "compress_ms": compress_ms,
+                            "bytes": len(compressed),
+                            "ratio": round(len(body) / len(compressed), 1),
+                        }
+            transaction.set_rollback(True)
+        self.stdout.write(json.dumps(report, indent=2))
+
+    def ensure_rows(self, rows, seed):
+        missing = max(rows - Patient.objects.count(), rows - Appointment.objects.count(), 0)
+        if not missing:
+            return
+        self.stderr.write(f"Seeding {missing} patients and appointments (rolled back afterwards)")
+        generator = LoadGenerator(seed=seed)
+        _, _, specializations = generator.doctors(max(1, missing // 500))
+        patient_ids = generator.patients(missing)
+        generator.appointments(missing, patient_ids, specializations)
@@ -0,0 +1,31 @@
+# hospital_api/management/commands/forecast_inventory.py
+
+import json
+
+from django.core.management.base import BaseCommand
+
+from hospital_api import forecast
+
+
+class Command(BaseCommand):
+    help = (
+        "Recomputes the reorder forecast of every inventory item (burn rate, days of "
+        "stock, stock expiring before use, order quantity) from the dispense history "
+        "and prints what it did as JSON. Meant to run nightly from cron; run_jobs "
+        "also runs it once a day."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--history-days", type=int, default=forecast.HISTORY_DAYS)
+        parser.add_argument("--lead-time-days", type=int, default=forecast.LEAD_TIME_DAYS)
+        parser.add_argument("--cover-days", type=int, default=forecast.COVER_DAYS)
+        parser.add_argument("--batch-size", type=int, default=forecast.BATCH_SIZE)
+
+    def handle(self, *args, **options):
+        report = forecast.refresh_forecasts(
+            history_days=options["history_days"],
+            lead_time_days=options["lead_time_days"],
+            cover_days=options["cover_days"],
+            batch_size=options["batch_size"],
+        )
+        self.stdout.write(json.dumps(report))
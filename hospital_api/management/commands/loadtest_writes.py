@@ -0,0 +1,163 @@
+# hospital_api/management/commands/loadtest_writes.py
+
+import json
+import random
+import statistics
+import threading
+import time
+from collections import Counter
+from datetime import date, timedelta
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import OperationalError, connection
+from django.utils import timezone
+
+from rest_framework.exceptions import ValidationError
+
+from hospital_api.models import Appointment, Doctor, InventoryItem, Patient
+from hospital_api.serializers import AppointmentSerializer
+from hospital_api.stock import InsufficientStock, apply_movement
+
+PREFIX = "LOADTEST"
+
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, max(0, round(pct / 100 * len(ordered)) - 1))]
+
+
+class Command(BaseCommand):
+    help = (
+        "Runs concurrent writer threads against the configured database (stock dispensing, "
+        "patient registration, appointment booking and updates) and reports throughput, latency and lock "
+        "errors as JSON. Rows it creates are deleted afterwards. Compare configurations by "
+        "running it under different environments, e.g. SQLITE_DEFAULTS=1 for stock SQLite."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--threads", type=int, default=8)
+        parser.add_argument("--seconds", type=float, default=10)
+        parser.add_argument("--hot-items", type=int, default=5, help="Inventory items all threads dispense from")
+        parser.add_argument("--seed", type=int, default=42)
+
+    def handle(self, *args, **options):
+        self.setup(options["hot_items"])
+        try:
+            results = self.run(options["threads"], options["seconds"], options["seed"])
+        finally:
+            self.cleanup()
+        self.stdout.write(json.dumps({"config": self.config(), **results}, indent=2))
+
+    def setup(self, hot_items):
+        user = User.objects.create(username=f"{PREFIX.lower()}_doctor")
+        self.doctor = Doctor.objects.create(user=user, specialization="General Practitioner")
+        self.item_ids = [
+            InventoryItem.objects.create(sku=f"{PREFIX}-{n}", name=f"Load test item {n}", stock=10**9).id
+            for n in range(hot_items)
+        ]
+        self.patient = Patient.objects.create(first_name=PREFIX, last_name="Patient", dob=date(1990, 1, 1))
+        self.start = timezone.now() + timedelta(days=3650)
+        self.appointment_ids = [
+            Appointment.objects.create(
+                patient=self.patient, doctor=self.doctor, scheduled_at=self.start - timedelta(hours=n + 1)
+            ).id
+            for n in range(20)
+        ]
+
+    def cleanup(self):
+        Patient.objects.filter(first_name=PREFIX).delete()
+        InventoryItem.objects.filter(sku__startswith=f"{PREFIX}-").delete()
+        User.objects.filter(username=f"{PREFIX.lower()}_doctor").delete()
+
+    def run(self, threads, seconds, seed):
+        samples = {"dispense": [], "register_patient": [], "book_appointment": [], "update_appointment": []}
+        errors = Counter()
+        rejected = Counter()
+        lock = threading.Lock()
+        deadline = time.perf_counter() + seconds
+
+        def worker(n):
+            rng = random.Random(seed + n)
+            try:
+                while time.perf_counter() < deadline:
+                    kind = rng.choices(list(samples), [5, 2, 2, 1])[0]
+                    start = time.perf_counter()
+                    try:
+                        self.operation(kind, rng)
+                    except (InsufficientStock, ValidationError):
+                        # a business rule said no (slot taken), not a database failure
+                        with lock:
+                            rejected[kind] += 1
+                        continue
+                    except OperationalError as exc:
+                        with lock:
+                            errors[f"{kind}: {exc}"] += 1
+                        continue
+                    elapsed = (time.perf_counter() - start) * 1000
+                    with lock:
+                        samples[kind].append(elapsed)
+            finally:
+                connection.close()
+
+        workers = [threading.Thread(target=worker, args=(n,)) for n in range(threads)]
+        started = time.perf_counter()
+        for thread in workers:
+            thread.start()
+        for thread in workers:
+            thread.join()
+        wall = time.perf_counter() - started
+
+        total = sum(len(values) for values in samples.values())
+        return {
+            "threads": threads,
+            "seconds": round(wall, 2),
+            "operations": total,
+            "ops_per_second": round(total / wall, 1),
+            "errors": dict(errors),
+            "rejected": dict(rejected),
+            "operations_by_kind": {
+                kind: {
+                    "count": len(values),
+                    "mean_ms": round(statistics.mean(values), 2),
+                    "p50_ms": round(percentile(values, 50), 2),
+                    "p99_ms": round(percentile(values, 99), 2),
+                    "max_ms": round(max(values), 2),
+                }
+                for kind, values in samples.items() if values
+            },
+        }
+
+    def operation(self, kind, rng):
+        if kind == "dispense":
+            apply_movement(rng.choice(self.item_ids), "dispense", rng.randint(1, 5))
+        elif kind == "register_patient":
+            Patient.objects.create(first_name=PREFIX, last_name=f"P{rng.randint(0, 10**6)}", dob=date(1990, 1, 1))
+        elif kind == "book_appointment":
+            # reads (conflict check) then writes in one transaction, the pattern that
+            # fails outright on SQLite without BEGIN IMMEDIATE
+            serializer = AppointmentSerializer(data={
+                "patient": self.patient.id,
+                "doctor": self.doctor.id,
+                "scheduled_at": (self.start + timedelta(minutes=30 * rng.randint(0, 10**6))).isoformat(),
+            })
+            serializer.is_valid(raise_exception=True)
+            serializer.save()
+        else:
+            appointment = Appointment.objects.get(pk=rng.choice(self.appointment_ids))
+            appointment.status = rng.choice(["scheduled", "confirmed"])
+            appointment.save(update_fields=["status"])
+
+    def config(self):
+        with connection.cursor() as cursor:
+            pragmas = {}
+            if connection.vendor == "sqlite":
+                for pragma in ["journal_mode", "synchronous", "busy_timeout", "mmap_size"]:
+                    cursor.execute(f"PRAGMA {pragma}")
+                    pragmas[pragma] = cursor.fetchone()[0]
+        return {
+            "vendor": connection.vendor,
+            "conn_max_age": connection.settings_dict["CONN_MAX_AGE"],
+            "transaction_mode": getattr(connection, "transaction_mode", None),
+            **pragmas,
+        }
@@ -0,0 +1,21 @@
+# hospital_api/management/commands/rebuild_search_index.py
+
+import time
+
+from django.core.management.base import BaseCommand
+
+from hospital_api.models import Patient
+from hospital_api.search import get_backend
+
+
+class Command(BaseCommand):
+    help = "Rebuilds the patient search index from the patients table, e.g. after bulk imports."
+
+    def handle(self, *args, **options):
+        backend = get_backend()
+        start = time.perf_counter()
+        backend.rebuild()
+        self.stdout.write(self.style.SUCCESS(
+            f"✔ {type(backend).__name__}: indexed {Patient.objects.count()} patients "
+            f"in {time.perf_counter() - start:.1f}s"
+        ))
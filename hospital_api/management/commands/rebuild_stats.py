@@ -0,0 +1,28 @@
+# hospital_api/management/commands/rebuild_stats.py
+
+from django.core.management.base import BaseCommand, CommandError
+
+from hospital_api import stats
+
+
+class Command(BaseCommand):
+    help = (
+        "Recounts the dashboard counters from the patients, appointments, doctors and "
+        "inventory tables and verifies them. With --check nothing is written and the "
+        "command fails if any counter is out of sync."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--check", action="store_true", help="Only compare the stored counters with a recount")
+
+    def handle(self, *args, **options):
+        if not options["check"]:
+            stats.rebuild()
+            self.stdout.write(self.style.SUCCESS(f"✔ Rebuilt {len(stats.stored_counts())} counters"))
+
+        differences = stats.differences()
+        for (metric, key, day), (stored, actual) in sorted(differences.items(), key=str):
+            self.stdout.write(f"  {metric}.{key}{f' {day}' if day else ''}: stored {stored}, actual {actual}")
+        if differences:
+            raise CommandError(f"{len(differences)} counters are out of sync, run rebuild_stats to fix them")
+        self.stdout.write(self.style.SUCCESS("✔ Counters match the tables"))
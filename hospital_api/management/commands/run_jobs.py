@@ -0,0 +1,64 @@
+# hospital_api/management/commands/run_jobs.py
+
+import json
+import logging
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from hospital_api.jobs import JOBS, SEPARATE_CRON_JOBS, rebuild_visit_counts
+
+logger = logging.getLogger("hospital_api.jobs")
+
+
+class Command(BaseCommand):
+    help = (
+        "Runs the periodic background jobs (see hospital_api/jobs.py) in a loop, each on "
+        "its own interval, and prints one JSON line per run with what it changed and its "
+        "throughput. Use --once from cron instead of keeping the process running; it "
+        "skips the daily jobs, schedule those with their own --once --job <name> entry."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--once", action="store_true",
+            help=f"Run every job once and exit, except {', '.join(sorted(SEPARATE_CRON_JOBS))} unless named with --job",
+        )
+        parser.add_argument("--job", action="append", choices=sorted(JOBS), help="Only run this job (repeatable)")
+        parser.add_argument("--interval", type=float, help="Seconds between runs, overriding each job's default")
+        parser.add_argument(
+            "--rebuild", action="store_true",
+            help="Recompute Doctor.patients and Patient.last_visit from completed appointments first",
+        )
+
+    def handle(self, *args, **options):
+        names = options["job"] or [
+            name for name in sorted(JOBS) if not (options["once"] and name in SEPARATE_CRON_JOBS)
+        ]
+        if options["rebuild"]:
+            rebuild_visit_counts()
+        due = {name: 0.0 for name in names}
+        try:
+            while True:
+                for name in names:
+                    if due[name] <= time.monotonic():
+                        self.run(name)
+                        due[name] = time.monotonic() + (options["interval"] or JOBS[name][1])
+                if options["once"]:
+                    return
+                time.sleep(max(0.0, min(due.values()) - time.monotonic()))
+                # a long-lived process must not hold on to connections the database dropped
+                close_old_connections()
+        except KeyboardInterrupt:
+            pass
+
+    def run(self, name):
+        try:
+            report = JOBS[name][0]()
+        except Exception as exc:
+            # one failed run must not stop the loop, the next run retries
+            logger.exception("Job %s failed", name)
+            report = {"error": str(exc)}
+        self.stdout.write(json.dumps({"job": name, **report}))
+        self.stdout.flush()
@@ -1,14 +1,39 @@
 # hospital_api/management/commands/seed.py
 
-from django.core.management.base import BaseCommand
+import time
+
+from django.core.management.base import BaseCommand, CommandError
 from django.contrib.auth.models import User
+from django.utils import timezone
 from hospital_api.models import Patient, Doctor, Appointment, InventoryItem, Department
+from hospital_api.loadgen import LoadGenerator
+from hospital_api import stats
+from hospital_api.jobs import rebuild_visit_counts
+from hospital_api.search import get_backend
 from datetime import datetime, date
 
 class Command(BaseCommand):
     help = "Seeds the database with sample data for hospital_api"
 
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--scale", type=int, default=0,
+            help="Generate this many synthetic patients (plus doctors, appointments, records and inventory) instead of the sample data",
+        )
+        parser.add_argument("--seed", type=int, default=42, help="RNG seed, the same seed produces the same data")
+        parser.add_argument("--appointments-per-patient", type=int, default=10)
+        parser.add_argument("--records-per-patient", type=int, default=5)
+        parser.add_argument("--patients-per-doctor", type=int, default=500)
+        parser.add_argument("--medicines", type=int, default=1000)
+        parser.add_argument("--batch-size", type=int, default=5000)
+        parser.add_argument(
+            "--from-today", action="store_true",
+            help="Date the generated rows around today instead of a fixed day (not reproducible across days)",
+        )
+
     def handle(self, *args, **kwargs):
+        if kwargs["scale"]:
+            return self.handle_scale(**kwargs)
 
         # ---- Admin user ----
         if not User.objects.filter(username="admin").exists():
@@ -124,3 +149,56 @@ class Command(BaseCommand):
 
 
         self.stdout.write(self.style.SUCCESS("🎉 Database seeded successfully!"))
+
+    def handle_scale(self, **options):
+        patients = options["scale"]
+        generator = LoadGenerator(
+            seed=options["seed"],
+            batch_size=options["batch_size"],
+            origin=timezone.now() if options["from_today"] else None,
+            log=lambda message: self.stdout.write(f"  {message}", ending="\r"),
+        )
+        if generator.already_generated():
+            raise CommandError(f"Data for --seed {options['seed']} already exists, pick another seed")
+
+        start = time.perf_counter()
+
+        doctor_ids, user_ids, specializations = generator.doctors(
+            max(1, patients // options["patients_per_doctor"])
+        )
+        self.report("Doctors", len(doctor_ids), start)
+
+        step = time.perf_counter()
+        patient_ids = generator.patients(patients)
+        self.report("Patients", len(patient_ids), step)
+
+        step = time.perf_counter()
+        count = generator.appointments(patients * options["appointments_per_patient"], patient_ids, specializations)
+        self.report("Appointments", count, step)
+
+        step = time.perf_counter()
+        count = generator.records(patients * options["records_per_patient"], patient_ids, user_ids)
+        self.report("Medical records", count, step)
+
+        step = time.perf_counter()
+        count = generator.inventory(options["medicines"])
+        self.report("Inventory items", count, step)
+
+        # bulk_create sends no post_save, so the search index and counters are rebuilt in one pass
+        step = time.perf_counter()
+        get_backend().rebuild()
+        self.report("Search index entries", len(patient_ids), step)
+
+        step = time.perf_counter()
+        stats.rebuild()
+        self.report("Dashboard counters", len(stats.stored_counts()), step)
+
+        # Patient.last_visit and Doctor.patients from the completed appointments
+        step = time.perf_counter()
+        rebuild_visit_counts()
+        self.report("Visit counts for patients", len(patient_ids), step)
+
+        self.stdout.write(self.style.SUCCESS(f"🎉 Scale seed finished in {time.perf_counter() - start:.1f}s"))
+
+    def report(self, label, count, started):
+        self.stdout.write(self.style.SUCCESS(f"✔ {label} added: {count} in {time.perf_counter() - started:.1f}s"))
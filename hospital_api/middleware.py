@@ -0,0 +1,238 @@
+# middleware.py
+import logging
+import re
+import threading
+import time
+from bisect import bisect_left
+from collections import deque
+from contextlib import ExitStack
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from django.utils.cache import patch_vary_headers
+from django.utils.text import compress_sequence, compress_string
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+logger = logging.getLogger("hospital_api.metrics")
+
+# upper bounds of the histogram buckets, the last bucket is everything above
+WALL_TIME_BUCKETS_MS = [5, 10, 25, 50, 100, 250, 500, 1000, 2500]
+QUERY_COUNT_BUCKETS = [0, 1, 2, 5, 10, 20, 50, 100]
+
+COMPRESSIBLE_TYPES = ("application/json", "application/msgpack", "application/x-ndjson", "text/")
+ACCEPTS_ENCODING = re.compile(r"\b(gzip|br)\b(?!\s*;\s*q=0(?:\.0*)?\s*(?:,|$))")
+# 11 is brotli's default but costs ~10x the CPU of 5 for a couple of percent
+BROTLI_QUALITY = 5
+
+
+class QueryTimer:
+    # execute_wrapper that counts queries and the time spent in the database
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.duration += time.perf_counter() - start
+            self.count += 1
+
+
+class RequestMetrics:
+    """Thread-safe, in-process aggregation of per-view request measurements."""
+
+    def __init__(self, recent_budget_violations=50):
+        self.lock = threading.Lock()
+        self.views = {}
+        self.budget_violations = deque(maxlen=recent_budget_violations)
+
+    def record(self, key, wall_ms, queries, db_ms, size, budget):
+        with self.lock:
+            stats = self.views.get(key)
+            if stats is None:
+                stats = self.views[key] = {
+                    "requests": 0,
+                    "wall_ms_total": 0.0,
+                    "wall_ms_max": 0.0,
+                    "db_ms_total": 0.0,
+                    "queries_total": 0,
+                    "queries_max": 0,
+                    "bytes_total": 0,
+                    "over_query_budget": 0,
+                    "wall_ms_histogram": [0] * (len(WALL_TIME_BUCKETS_MS) + 1),
+                    "queries_histogram": [0] * (len(QUERY_COUNT_BUCKETS) + 1),
+                }
+            stats["requests"] += 1
+            stats["wall_ms_total"] += wall_ms
+            stats["wall_ms_max"] = max(stats["wall_ms_max"], wall_ms)
+            stats["db_ms_total"] += db_ms
+            stats["queries_total"] += queries
+            stats["queries_max"] = max(stats["queries_max"], queries)
+            stats["bytes_total"] += size or 0
+            stats["wall_ms_histogram"][bisect_left(WALL_TIME_BUCKETS_MS, wall_ms)] += 1
+            stats["queries_histogram"][bisect_left(QUERY_COUNT_BUCKETS, queries)] += 1
+            if budget is not None and queries > budget:
+                stats["over_query_budget"] += 1
+                self.budget_violations.append({
+                    "view": key, "queries": queries, "wall_ms": round(wall_ms, 3), "at": time.time(),
+                })
+
+    def snapshot(self):
+        with self.lock:
+            views = {}
+            for key, stats in self.views.items():
+                requests = stats["requests"]
+                views[key] = {
+                    **stats,
+                    "wall_ms_histogram": list(stats["wall_ms_histogram"]),
+                    "queries_histogram": list(stats["queries_histogram"]),
+                    "wall_ms_mean": round(stats["wall_ms_total"] / requests, 3),
+                    "db_ms_mean": round(stats["db_ms_total"] / requests, 3),
+                    "queries_mean": round(stats["queries_total"] / requests, 3),
+                    "bytes_mean": round(stats["bytes_total"] / requests, 1),
+                }
+            return {
+                "wall_ms_buckets": WALL_TIME_BUCKETS_MS,
+                "queries_buckets": QUERY_COUNT_BUCKETS,
+                "query_budget": getattr(settings, "REQUEST_METRICS_QUERY_BUDGET", None),
+                "views": views,
+                "budget_violations": list(self.budget_violations),
+            }
+
+    def reset(self):
+        with self.lock:
+            self.views.clear()
+            self.budget_violations.clear()
+
+
+metrics = RequestMetrics()
+
+
+class RequestMetricsMiddleware:
+    """
+    Records wall time, query count, DB time and response size per view/action.
+    Disabled unless REQUEST_METRICS_ENABLED is set, in which case Django drops it
+    from the middleware chain at startup. Runs natively under ASGI, so async views
+    stay async.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not getattr(settings, "REQUEST_METRICS_ENABLED", False):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.budget = getattr(settings, "REQUEST_METRICS_QUERY_BUDGET", None)
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        timers = [QueryTimer() for _ in connections]
+        start = time.perf_counter()
+        with self.timing(timers):
+            response = self.get_response(request)
+        return self.record(request, response, timers, start)
+
+    async def __acall__(self, request):
+        timers = [QueryTimer() for _ in connections]
+        start = time.perf_counter()
+        # the async ORM runs queries on the request's sync thread, whose connection
+        # objects are not the event loop's, so the timers are installed there
+        stack = await sync_to_async(self.timing)(timers)
+        try:
+            response = await self.get_response(request)
+        finally:
+            await sync_to_async(stack.close)()
+        return self.record(request, response, timers, start)
+
+    def timing(self, timers):
+        stack = ExitStack()
+        for alias, timer in zip(connections, timers):
+            stack.enter_context(connections[alias].execute_wrapper(timer))
+        return stack
+
+    def record(self, request, response, timers, start):
+        wall_ms = (time.perf_counter() - start) * 1000
+        queries = sum(timer.count for timer in timers)
+        db_ms = sum(timer.duration for timer in timers) * 1000
+        size = None if response.streaming else len(response.content)
+
+        match = request.resolver_match
+        key = f"{request.method} {match.view_name if match else 'unresolved'}"
+        metrics.record(key, wall_ms, queries, db_ms, size, self.budget)
+
+        if self.budget is not None and queries > self.budget:
+            logger.warning("%s ran %d queries (budget %d) in %.1f ms", key, queries, self.budget, wall_ms)
+        response["Server-Timing"] = f"app;dur={wall_ms:.1f}, db;dur={db_ms:.1f}"
+        response["X-Query-Count"] = str(queries)
+        return response
+
+
+class CompressionMiddleware:
+    """
+    Compresses responses of at least RESPONSE_COMPRESSION_MIN_BYTES with brotli when
+    the client accepts it and the package is installed, otherwise gzip. Smaller
+    responses go out as they are, compressing them costs more than it saves.
+    Streaming responses (exports) are gzipped as they stream.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.min_bytes = getattr(settings, "RESPONSE_COMPRESSION_MIN_BYTES", 1024)
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        return self.compress(request, self.get_response(request))
+
+    async def __acall__(self, request):
+        return self.compress(request, await self.get_response(request))
+
+    def compress(self, request, response):
+        if response.has_header("Content-Encoding") or not response.get("Content-Type", "").startswith(COMPRESSIBLE_TYPES):
+            return response
+        patch_vary_headers(response, ("Accept-Encoding",))
+        accepted = ACCEPTS_ENCODING.findall(request.headers.get("Accept-Encoding", "").lower())
+
+        if response.streaming:
+            if response.is_async or "gzip" not in accepted:
+                return response
+            response.streaming_content = compress_sequence(response.streaming_content, max_random_bytes=100)
+            encoding = "gzip"
+            if response.has_header("Content-Length"):
+                del response["Content-Length"]
+        else:
+            if len(response.content) < self.min_bytes:
+                return response
+            if brotli is not None and "br" in accepted:
+                content, encoding = brotli.compress(response.content, quality=BROTLI_QUALITY), "br"
+            elif "gzip" in accepted:
+                # random padding as in django.middleware.gzip, against BREACH
+                content, encoding = compress_string(response.content, max_random_bytes=100), "gzip"
+            else:
+                return response
+            response.content = content
+            response["Content-Length"] = str(len(content))
+
+        # the body changed, a strong ETag would no longer match it byte for byte
+        etag = response.get("ETag")
+        if etag and etag.startswith('"'):
+            response["ETag"] = "W/" + etag
+        response["Content-Encoding"] = encoding
+        return response
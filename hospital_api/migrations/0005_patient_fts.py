@@ -0,0 +1,60 @@
+import re
+
+from django.db import migrations, OperationalError
+
+FTS_TABLE = "hospital_api_patient_fts"
+
+
+# frozen copies of hospital_api.search.split_digits / phone_terms as of this migration
+def split_digits(text):
+    return re.sub(r"(?<=[^\W\d])(?=\d)|(?<=\d)(?=[^\W\d])", " ", text)
+
+
+def phone_terms(phone):
+    digits = re.sub(r"\D", "", phone or "")
+    return f"{digits} {digits[-9:]}" if len(digits) > 9 else digits
+
+
+def create_index(apps, schema_editor):
+    connection = schema_editor.connection
+    if connection.vendor != "sqlite":
+        return
+    with connection.cursor() as cursor:
+        try:
+            cursor.execute(
+                f"CREATE VIRTUAL TABLE {FTS_TABLE} USING fts5("
+                "names, email, phone, tokenize = 'unicode61 remove_diacritics 2', prefix = '2 3 4')"
+            )
+        except OperationalError:
+            # SQLite built without FTS5, search falls back to DatabaseSearchBackend
+            return
+        cursor.execute(f"CREATE VIRTUAL TABLE {FTS_TABLE}_vocab USING fts5vocab({FTS_TABLE}, col)")
+
+        Patient = apps.get_model("hospital_api", "Patient")
+        rows = Patient.objects.using(connection.alias).values_list("id", "first_name", "last_name", "email", "phone")
+        cursor.executemany(
+            f"INSERT INTO {FTS_TABLE} (rowid, names, email, phone) VALUES (%s, %s, %s, %s)",
+            [
+                (pk, f"{first_name} {last_name}", split_digits(email or ""), phone_terms(phone))
+                for pk, first_name, last_name, email, phone in rows.order_by().iterator(5000)
+            ],
+        )
+        cursor.execute(f"INSERT INTO {FTS_TABLE} ({FTS_TABLE}) VALUES ('optimize')")
+
+
+def drop_index(apps, schema_editor):
+    if schema_editor.connection.vendor == "sqlite":
+        with schema_editor.connection.cursor() as cursor:
+            cursor.execute(f"DROP TABLE IF EXISTS {FTS_TABLE}_vocab")
+            cursor.execute(f"DROP TABLE IF EXISTS {FTS_TABLE}")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("hospital_api", "0004_stock_movement"),
+    ]
+
+    operations = [
+        migrations.RunPython(create_index, drop_index),
+    ]
@@ -0,0 +1,26 @@
+# Generated by Django 5.2.18 on 2026-10-18 20:31
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('hospital_api', '0005_patient_fts'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StatCounter',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('metric', models.CharField(max_length=50)),
+                ('key', models.CharField(max_length=50)),
+                ('day', models.DateField(blank=True, null=True)),
+                ('count', models.IntegerField(default=0)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(condition=models.Q(('day__isnull', True)), fields=('metric', 'key'), name='stat_counter_unique'), models.UniqueConstraint(condition=models.Q(('day__isnull', False)), fields=('metric', 'key', 'day'), name='stat_counter_daily_unique')],
+            },
+        ),
+    ]
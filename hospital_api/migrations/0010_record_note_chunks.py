@@ -0,0 +1,36 @@
+# Generated by Django 5.2.18 on 2026-10-18 20:53
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('hospital_api', '0009_appointment_no_show'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MedicalRecordNoteChunk',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('index', models.PositiveIntegerField()),
+                ('data', models.BinaryField()),
+                ('record', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='note_chunks', to='hospital_api.medicalrecord')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('record', 'index'), name='note_chunk_unique')],
+            },
+        ),
+        migrations.AddField(
+            model_name='medicalrecord',
+            name='notes_size',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='medicalrecord',
+            name='preview',
+            field=models.CharField(blank=True, max_length=200),
+        ),
+    ]
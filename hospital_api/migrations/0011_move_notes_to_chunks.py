@@ -0,0 +1,86 @@
+# Moves MedicalRecord.notes into compressed MedicalRecordNoteChunk rows.
+
+import zlib
+
+from django.db import migrations
+
+BATCH_SIZE = 2000
+
+# frozen copies of hospital_api.notes as of this migration
+NOTE_CHUNK_CHARS = 64 * 1024
+NOTE_PREVIEW_CHARS = 200
+COMPRESSION_LEVEL = 6
+
+
+def make_preview(text):
+    text = " ".join(text.split())
+    if len(text) <= NOTE_PREVIEW_CHARS:
+        return text
+    cut = text[:NOTE_PREVIEW_CHARS - 1]
+    if " " in cut[NOTE_PREVIEW_CHARS // 2:]:
+        cut = cut.rsplit(" ", 1)[0]
+    return cut + "…"
+
+
+def compress_chunks(text):
+    return [
+        zlib.compress(text[start:start + NOTE_CHUNK_CHARS].encode(), COMPRESSION_LEVEL)
+        for start in range(0, len(text), NOTE_CHUNK_CHARS)
+    ]
+
+
+def decompress_chunk(data):
+    return zlib.decompress(bytes(data)).decode()
+
+
+def batches(queryset):
+    # keyset batches, so no cursor stays open on a table that is being written
+    last = 0
+    while True:
+        batch = list(queryset.filter(pk__gt=last).order_by("pk")[:BATCH_SIZE])
+        if not batch:
+            return
+        yield batch
+        last = batch[-1].pk
+
+
+def move_notes_to_chunks(apps, schema_editor):
+    alias = schema_editor.connection.alias
+    MedicalRecord = apps.get_model("hospital_api", "MedicalRecord")
+    MedicalRecordNoteChunk = apps.get_model("hospital_api", "MedicalRecordNoteChunk")
+    for records in batches(MedicalRecord.objects.using(alias).only("pk", "notes")):
+        chunks = []
+        for record in records:
+            record.preview = make_preview(record.notes)
+            record.notes_size = len(record.notes)
+            chunks.extend(
+                MedicalRecordNoteChunk(record_id=record.pk, index=index, data=data)
+                for index, data in enumerate(compress_chunks(record.notes))
+            )
+        MedicalRecord.objects.using(alias).bulk_update(records, ["preview", "notes_size"])
+        MedicalRecordNoteChunk.objects.using(alias).bulk_create(chunks)
+
+
+def restore_notes(apps, schema_editor):
+    alias = schema_editor.connection.alias
+    MedicalRecord = apps.get_model("hospital_api", "MedicalRecord")
+    MedicalRecordNoteChunk = apps.get_model("hospital_api", "MedicalRecordNoteChunk")
+    for records in batches(MedicalRecord.objects.using(alias).only("pk")):
+        chunks = MedicalRecordNoteChunk.objects.using(alias).filter(record__in=records).order_by("record", "index")
+        notes = {}
+        for record_id, data in chunks.values_list("record_id", "data"):
+            notes[record_id] = notes.get(record_id, "") + decompress_chunk(data)
+        for record in records:
+            record.notes = notes.get(record.pk, "")
+        MedicalRecord.objects.using(alias).bulk_update(records, ["notes"])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('hospital_api', '0010_record_note_chunks'),
+    ]
+
+    operations = [
+        migrations.RunPython(move_notes_to_chunks, restore_notes),
+    ]
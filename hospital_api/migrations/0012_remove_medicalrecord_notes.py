@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-18 20:53
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('hospital_api', '0011_move_notes_to_chunks'),
+    ]
+
+    operations = [
+        # a default, so that reversing can add the column back to existing rows
+        migrations.AlterField(
+            model_name='medicalrecord',
+            name='notes',
+            field=models.TextField(default=''),
+        ),
+        migrations.RemoveField(
+            model_name='medicalrecord',
+            name='notes',
+        ),
+    ]
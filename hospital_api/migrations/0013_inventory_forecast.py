@@ -0,0 +1,31 @@
+# Generated by Django 5.2.18 on 2026-10-18 20:57
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('hospital_api', '0012_remove_medicalrecord_notes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='InventoryForecast',
+            fields=[
+                ('item', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='forecast', serialize=False, to='hospital_api.inventoryitem')),
+                ('burn_rate', models.FloatField()),
+                ('usable_stock', models.IntegerField()),
+                ('expiring_quantity', models.IntegerField()),
+                ('days_of_stock', models.FloatField()),
+                ('reorder_point', models.IntegerField()),
+                ('order_quantity', models.IntegerField()),
+                ('needs_reorder', models.BooleanField()),
+                ('computed_at', models.DateTimeField()),
+            ],
+            options={
+                'indexes': [models.Index(fields=['needs_reorder', 'days_of_stock'], name='forecast_reorder_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 5.2.18 on 2026-10-18 21:05
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('hospital_api', '0013_inventory_forecast'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DoctorDayStat',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('status', models.CharField(choices=[('scheduled', 'Scheduled'), ('confirmed', 'Confirmed'), ('completed', 'Completed'), ('no_show', 'No Show'), ('cancelled', 'Cancelled')], max_length=20)),
+                ('appointments', models.IntegerField(default=0)),
+                ('minutes', models.IntegerField(default=0)),
+                ('doctor', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='day_stats', to='hospital_api.doctor')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['day', 'doctor'], name='doctor_day_stat_day_idx')],
+                'constraints': [models.UniqueConstraint(fields=('doctor', 'day', 'status'), name='doctor_day_stat_unique')],
+            },
+        ),
+    ]
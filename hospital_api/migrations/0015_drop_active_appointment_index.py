@@ -0,0 +1,17 @@
+# Generated by Django 5.2.18 on 2026-10-18 21:49
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('hospital_api', '0014_doctor_day_stats'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='appointment',
+            name='appt_active_scheduled_idx',
+        ),
+    ]
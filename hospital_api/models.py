@@ -1,9 +1,13 @@
 # models.py
-from django.db import models
+from datetime import timedelta
+
+from django.db import models, transaction
 from django.contrib.auth.models import User
 from django.utils import timezone
 from django.core.validators import MinValueValidator, MaxValueValidator
 
+from .notes import NOTE_PREVIEW_CHARS, compress_chunks, decompress_chunk, make_preview
+
 ROLE_CHOICES = [
     ("admin", "Admin"),
     ("staff", "Staff"),
@@ -20,9 +24,26 @@ APPOINTMENT_STATUS = [
     ("scheduled", "Scheduled"),
     ("confirmed", "Confirmed"),
     ("completed", "Completed"),
+    ("no_show", "No Show"),
     ("cancelled", "Cancelled"),
 ]
 
+ACTIVE_APPOINTMENT_STATUSES = ["scheduled", "confirmed"]
+
+MAX_APPOINTMENT_MINUTES = 8 * 60
+
+
+class CountedModel(models.Model):
+    """Rows behind the dashboard counters (stats.py), see stats.snapshot_before()."""
+
+    class Meta:
+        abstract = True
+
+    def save(self, *args, **kwargs):
+        # the counters are moved in the same transaction, under the row lock the snapshot takes
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+
 class Profile(models.Model):
     user = models.OneToOneField(User, on_delete=models.CASCADE, related_name="profile")
     role = models.CharField(max_length=20, choices=ROLE_CHOICES, default="staff")
@@ -39,7 +60,7 @@ class Department(models.Model):
         return self.name
 
 
-class Doctor(models.Model):
+class Doctor(CountedModel):
     user = models.OneToOneField(User, on_delete=models.CASCADE)
     specialization = models.CharField(max_length=255, blank=True)
     experience = models.PositiveIntegerField(default=0)
@@ -48,12 +69,19 @@ class Doctor(models.Model):
     rating = models.FloatField(default=0.0)
     patients = models.PositiveIntegerField(default=0)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=["availability"], name="doctor_availability_idx"),
+            models.Index(fields=["specialization"], name="doctor_specialization_idx"),
+            models.Index(fields=["rating", "id"], name="doctor_rating_idx"),
+        ]
+
     def __str__(self):
         return f"{self.user.first_name} {self.user.last_name}"
 
 
 
-class Patient(models.Model):
+class Patient(CountedModel):
     # keep first_name + last_name for normalization, expose full name in serializer
     first_name = models.CharField(max_length=100)
     last_name = models.CharField(max_length=100)
@@ -68,6 +96,13 @@ class Patient(models.Model):
 
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["created_at", "id"], name="patient_created_idx"),
+            models.Index(fields=["status"], name="patient_status_idx"),
+            models.Index(fields=["last_name", "first_name"], name="patient_name_idx"),
+        ]
  
     def __str__(self):
         return f"{self.first_name} {self.last_name}"
@@ -83,7 +118,7 @@ class Patient(models.Model):
         return age
 
 
-class Appointment(models.Model):
+class Appointment(CountedModel):
     patient = models.ForeignKey(
         Patient, on_delete=models.CASCADE, related_name="appointments"
     )
@@ -91,6 +126,9 @@ class Appointment(models.Model):
         Doctor, on_delete=models.SET_NULL, null=True, related_name="appointments"
     )
     scheduled_at = models.DateTimeField()
+    duration_minutes = models.PositiveIntegerField(
+        default=30, validators=[MinValueValidator(5), MaxValueValidator(MAX_APPOINTMENT_MINUTES)]
+    )
     type = models.CharField(max_length=150, blank=True)  # e.g., "Cardiology Checkup"
     reason = models.TextField(blank=True)
     status = models.CharField(max_length=20, choices=APPOINTMENT_STATUS, default="scheduled")
@@ -98,24 +136,98 @@ class Appointment(models.Model):
 
     class Meta:
         ordering = ["-scheduled_at"]
+        indexes = [
+            models.Index(fields=["scheduled_at", "id"], name="appt_scheduled_idx"),
+            models.Index(fields=["status"], name="appt_status_idx"),
+            models.Index(fields=["doctor", "scheduled_at"], name="appt_doctor_scheduled_idx"),
+            models.Index(fields=["patient", "scheduled_at", "id"], name="appt_patient_scheduled_idx"),
+        ]
 
     def __str__(self):
         return f"{self.patient} with {self.doctor} at {self.scheduled_at}"
 
+    @property
+    def ends_at(self):
+        return self.scheduled_at + timedelta(minutes=self.duration_minutes)
+
 
 class MedicalRecord(models.Model):
     patient = models.ForeignKey(
         Patient, on_delete=models.CASCADE, related_name="records"
     )
-    notes = models.TextField()
+    # the full note lives compressed in MedicalRecordNoteChunk, see notes.py
+    preview = models.CharField(max_length=NOTE_PREVIEW_CHARS, blank=True)
+    notes_size = models.PositiveIntegerField(default=0)
     created_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
 
+    # text assigned to `notes` and not saved yet
+    _unsaved_notes = None
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["created_at", "id"], name="record_created_idx"),
+            models.Index(fields=["patient", "created_at", "id"], name="record_patient_created_idx"),
+        ]
+
     def __str__(self):
         return f"Record for {self.patient} at {self.created_at}"
 
+    @property
+    def notes(self):
+        """The full note, read from the chunks on access."""
+        if self._unsaved_notes is not None:
+            return self._unsaved_notes
+        return "".join(self.iter_notes())
+
+    @notes.setter
+    def notes(self, text):
+        self._unsaved_notes = text
+        self.preview = make_preview(text)
+        self.notes_size = len(text)
+
+    def iter_notes(self):
+        # every compressed chunk in one query, so a concurrent save_notes(replace=True)
+        # can't mix old and new chunks; decompressed one at a time
+        chunks = list(self.note_chunks.order_by("index").values_list("data", flat=True))
+        for data in chunks:
+            yield decompress_chunk(data)
+
+    def save(self, *args, **kwargs):
+        replace = not self._state.adding
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+            MedicalRecord.save_notes([self], replace=replace)
+
+    @staticmethod
+    def save_notes(records, replace=True):
+        """Writes the chunks of records whose notes were assigned, for save() and after bulk_create()."""
+        records = [record for record in records if record._unsaved_notes is not None]
+        if not records:
+            return
+        if replace:
+            MedicalRecordNoteChunk.objects.filter(record__in=records).delete()
+        MedicalRecordNoteChunk.objects.bulk_create([
+            MedicalRecordNoteChunk(record=record, index=index, data=data)
+            for record in records
+            for index, data in enumerate(compress_chunks(record._unsaved_notes))
+        ])
+        for record in records:
+            record._unsaved_notes = None
 
-class InventoryItem(models.Model):
+
+class MedicalRecordNoteChunk(models.Model):
+    record = models.ForeignKey(MedicalRecord, on_delete=models.CASCADE, related_name="note_chunks")
+    index = models.PositiveIntegerField()
+    data = models.BinaryField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["record", "index"], name="note_chunk_unique"),
+        ]
+
+
+class InventoryItem(CountedModel):
     # medicines / consumables
     sku = models.CharField(max_length=50, unique=True)  # e.g., "M001"
     name = models.CharField(max_length=255)
@@ -128,8 +240,106 @@ class InventoryItem(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=["name", "id"], name="inventory_name_idx"),
+            models.Index(fields=["category"], name="inventory_category_idx"),
+            models.Index(fields=["expiry_date"], name="inventory_expiry_idx"),
+        ]
+
     def needs_reorder(self):
         return self.stock <= self.min_stock
 
     def __str__(self):
         return f"{self.name} ({self.sku})"
+
+
+STOCK_MOVEMENT_KINDS = [
+    ("receive", "Receive"),
+    ("dispense", "Dispense"),
+    ("adjust", "Adjust"),
+]
+
+
+class StockMovement(models.Model):
+    # append-only ledger, InventoryItem.stock is the running balance of these rows
+    item = models.ForeignKey(InventoryItem, on_delete=models.CASCADE, related_name="movements")
+    kind = models.CharField(max_length=20, choices=STOCK_MOVEMENT_KINDS)
+    quantity = models.IntegerField()  # signed change applied to stock
+    balance_after = models.IntegerField()
+    reason = models.CharField(max_length=255, blank=True)
+    created_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ["-created_at", "-id"]
+        indexes = [
+            models.Index(fields=["item", "created_at"], name="movement_item_created_idx"),
+            models.Index(fields=["kind", "created_at"], name="movement_kind_created_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.kind} {self.quantity:+d} {self.item.sku}"
+
+
+class InventoryForecast(models.Model):
+    # one row per item, rewritten by hospital_api.forecast from the dispense history
+    item = models.OneToOneField(InventoryItem, on_delete=models.CASCADE, primary_key=True, related_name="forecast")
+    burn_rate = models.FloatField()  # units dispensed per day
+    usable_stock = models.IntegerField()  # stock that will be used before it expires
+    expiring_quantity = models.IntegerField()  # stock that will expire first
+    days_of_stock = models.FloatField()  # until the usable stock runs out
+    reorder_point = models.IntegerField()
+    order_quantity = models.IntegerField()
+    needs_reorder = models.BooleanField()
+    computed_at = models.DateTimeField()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["needs_reorder", "days_of_stock"], name="forecast_reorder_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.item_id}: {self.days_of_stock:.1f} days"
+
+
+
+class StatCounter(models.Model):
+    # dashboard counts, kept up to date by hospital_api.stats instead of COUNT(*) per request
+    metric = models.CharField(max_length=50)  # e.g. patients, appointments
+    key = models.CharField(max_length=50)  # e.g. the status value
+    day = models.DateField(null=True, blank=True)  # set for per-day metrics
+    count = models.IntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["metric", "key"], condition=models.Q(day__isnull=True), name="stat_counter_unique"
+            ),
+            models.UniqueConstraint(
+                fields=["metric", "key", "day"], condition=models.Q(day__isnull=False), name="stat_counter_daily_unique"
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.metric}.{self.key}{f' {self.day}' if self.day else ''} = {self.count}"
+
+
+class DoctorDayStat(models.Model):
+    # appointments per doctor, day and status, kept up to date by hospital_api.stats like StatCounter
+    doctor = models.ForeignKey(Doctor, on_delete=models.CASCADE, related_name="day_stats")
+    day = models.DateField()
+    status = models.CharField(max_length=20, choices=APPOINTMENT_STATUS)
+    appointments = models.IntegerField(default=0)
+    minutes = models.IntegerField(default=0)  # sum of duration_minutes
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["doctor", "day", "status"], name="doctor_day_stat_unique"),
+        ]
+        indexes = [
+            models.Index(fields=["day", "doctor"], name="doctor_day_stat_day_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.doctor_id} {self.day} {self.status} = {self.appointments}"
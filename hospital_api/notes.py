@@ -0,0 +1,32 @@
+# notes.py
+# Medical record note bodies are stored zlib-compressed in MedicalRecordNoteChunk
+# rows of NOTE_CHUNK_CHARS characters each; the record itself keeps a short
+# preview and the length, which is all the list endpoints read.
+import zlib
+
+NOTE_CHUNK_CHARS = 64 * 1024
+NOTE_PREVIEW_CHARS = 200
+COMPRESSION_LEVEL = 6
+
+
+def make_preview(text):
+    """The start of the note on one line, cut at a word boundary."""
+    text = " ".join(text.split())
+    if len(text) <= NOTE_PREVIEW_CHARS:
+        return text
+    cut = text[:NOTE_PREVIEW_CHARS - 1]
+    if " " in cut[NOTE_PREVIEW_CHARS // 2:]:
+        cut = cut.rsplit(" ", 1)[0]
+    return cut + "…"
+
+
+def compress_chunks(text):
+    # split on characters, not bytes, so a chunk never ends inside a UTF-8 sequence
+    return [
+        zlib.compress(text[start:start + NOTE_CHUNK_CHARS].encode(), COMPRESSION_LEVEL)
+        for start in range(0, len(text), NOTE_CHUNK_CHARS)
+    ]
+
+
+def decompress_chunk(data):
+    return zlib.decompress(bytes(data)).decode()
@@ -0,0 +1,55 @@
+# renderers.py
+# Compact response encodings, picked by the Accept header (or ?format=json/msgpack).
+# orjson and msgpack are optional: without orjson JSON falls back to DRF's encoder,
+# without msgpack the MessagePack renderer is left out of the settings.
+from rest_framework.renderers import BaseRenderer, JSONRenderer
+from rest_framework.utils.encoders import JSONEncoder
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+# DRF's encoder formats everything orjson doesn't (Decimal, lazy strings, querysets)
+# and the datetimes, so those come out exactly as DRF writes them.
+encode_default = JSONEncoder().default
+
+
+class ORJSONRenderer(JSONRenderer):
+    """
+    JSONRenderer output, encoded by orjson. One difference: NaN and Infinity are
+    encoded as null, where JSONRenderer raises (STRICT_JSON). Indented output and
+    integers beyond 64 bits, which orjson can't encode, are left to JSONRenderer.
+    """
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        # orjson only indents by 2 and with ": " separators
+        if orjson is None or self.get_indent(accepted_media_type, renderer_context or {}):
+            return super().render(data, accepted_media_type, renderer_context)
+        if data is None:
+            return b""
+        try:
+            ret = orjson.dumps(data, default=encode_default, option=orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_NON_STR_KEYS)
+        except TypeError:
+            # JSONEncodeError, e.g. integers beyond 64 bits, DRF's encoder has no limit
+            return super().render(data, accepted_media_type, renderer_context)
+        # as JSONRenderer: valid in JSON but line terminators in JavaScript
+        return ret.replace(b"\xe2\x80\xa8", b"\\u2028").replace(b"\xe2\x80\xa9", b"\\u2029")
+
+
+class MessagePackRenderer(BaseRenderer):
+    """The same values as the JSON responses, as MessagePack."""
+    media_type = "application/msgpack"
+    format = "msgpack"
+    charset = None
+    render_style = "binary"
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b""
+        return msgpack.packb(data, default=encode_default, use_bin_type=True)
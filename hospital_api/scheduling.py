@@ -0,0 +1,163 @@
+# scheduling.py
+# Free-slot search and double-booking checks for doctors' appointments.
+from bisect import bisect_right
+from collections import defaultdict
+from datetime import datetime, time, timedelta
+
+from django.utils import timezone
+
+from .models import Appointment, Doctor, MAX_APPOINTMENT_MINUTES
+
+WORKDAY_START = time(8, 0)
+WORKDAY_END = time(17, 0)
+SLOT_GRID_MINUTES = 15
+
+
+class IntervalIndex:
+    """
+    Busy intervals of one doctor, merged into sorted disjoint (start, end) pairs so
+    overlap checks are a bisect and free gaps are a single walk.
+    """
+
+    def __init__(self, intervals):
+        self.starts = []
+        self.ends = []
+        for start, end in sorted(intervals):
+            if self.ends and start <= self.ends[-1]:
+                self.ends[-1] = max(self.ends[-1], end)
+            else:
+                self.starts.append(start)
+                self.ends.append(end)
+
+    def add(self, start, end):
+        # only for intervals that don't overlap, so both lists stay sorted and disjoint
+        i = bisect_right(self.starts, start)
+        self.starts.insert(i, start)
+        self.ends.insert(i, end)
+
+    def overlaps(self, start, end):
+        # first merged interval ending after `start` is the only candidate
+        i = bisect_right(self.ends, start)
+        return i < len(self.starts) and self.starts[i] < end
+
+    def gaps(self, start, end):
+        cursor = start
+        i = bisect_right(self.ends, start)
+        while i < len(self.starts) and self.starts[i] < end:
+            if self.starts[i] > cursor:
+                yield cursor, self.starts[i]
+            cursor = max(cursor, self.ends[i])
+            i += 1
+        if cursor < end:
+            yield cursor, end
+
+
+def booked_intervals(doctor_ids, start, end, exclude_pks=()):
+    """
+    Busy (start, end) intervals per doctor overlapping [start, end). Appointments are
+    capped at MAX_APPOINTMENT_MINUTES, so the (doctor, scheduled_at) index bounds the scan.
+    """
+    queryset = Appointment.objects.filter(
+        doctor_id__in=doctor_ids,
+        scheduled_at__lt=end,
+        scheduled_at__gt=start - timedelta(minutes=MAX_APPOINTMENT_MINUTES),
+    ).exclude(status="cancelled").order_by()
+    if exclude_pks:
+        queryset = queryset.exclude(pk__in=exclude_pks)
+
+    intervals = defaultdict(list)
+    for doctor_id, scheduled_at, minutes in queryset.values_list("doctor_id", "scheduled_at", "duration_minutes"):
+        ends_at = scheduled_at + timedelta(minutes=minutes)
+        if ends_at > start:
+            intervals[doctor_id].append((scheduled_at, ends_at))
+    return intervals
+
+
+def find_conflict(doctor_id, start, minutes, exclude_pk=None):
+    """Returns the (start, end) of an existing booking overlapping the new one, or None."""
+    end = start + timedelta(minutes=minutes)
+    exclude_pks = [exclude_pk] if exclude_pk is not None else []
+    for busy_start, busy_end in booked_intervals([doctor_id], start, end, exclude_pks)[doctor_id]:
+        if busy_start < end and busy_end > start:
+            return busy_start, busy_end
+    return None
+
+
+def working_windows(start, end):
+    tz = timezone.get_current_timezone()
+    day = timezone.localtime(start, tz).date()
+    while True:
+        window_start = timezone.make_aware(datetime.combine(day, WORKDAY_START), tz)
+        if window_start >= end:
+            return
+        window_end = timezone.make_aware(datetime.combine(day, WORKDAY_END), tz)
+        if window_end > start:
+            yield max(window_start, start), min(window_end, end)
+        day += timedelta(days=1)
+
+
+def round_up(value, minutes=SLOT_GRID_MINUTES):
+    excess = (value.minute % minutes) * 60 + value.second + value.microsecond / 1_000_000
+    if not excess:
+        return value
+    return value + timedelta(seconds=minutes * 60 - excess)
+
+
+def slots(index, start, end, minutes, limit=None):
+    length = timedelta(minutes=minutes)
+    found = 0
+    for window_start, window_end in working_windows(start, end):
+        for gap_start, gap_end in index.gaps(window_start, window_end):
+            slot = round_up(gap_start)
+            while slot + length <= gap_end:
+                yield slot, slot + length
+                found += 1
+                if limit is not None and found >= limit:
+                    return
+                slot += length
+
+
+def free_slots(doctor, start, end, minutes=30, limit=None):
+    """Free slots of `minutes` for `doctor` inside working hours between `start` and `end`."""
+    if doctor.availability != "available":
+        return []
+    start = max(start, timezone.now())
+    if start >= end:
+        return []
+    index = IntervalIndex(booked_intervals([doctor.pk], start, end)[doctor.pk])
+    return list(slots(index, start, end, minutes, limit))
+
+
+def next_available(specialization, minutes=30, after=None, horizon_days=14):
+    """
+    Earliest free slot across every available doctor with `specialization`.
+    Searches one day at a time, with a single appointments query per day.
+    Returns (doctor, start, end) or None.
+    """
+    doctors = list(
+        Doctor.objects.select_related("user").filter(
+            availability="available", specialization__iexact=specialization
+        ).order_by("id")
+    )
+    if not doctors:
+        return None
+
+    day_start = max(after or timezone.now(), timezone.now())
+    horizon = day_start + timedelta(days=horizon_days)
+    while day_start < horizon:
+        day_end = min(
+            timezone.make_aware(
+                datetime.combine(timezone.localtime(day_start).date() + timedelta(days=1), time.min)
+            ),
+            horizon,
+        )
+        busy = booked_intervals([doctor.pk for doctor in doctors], day_start, day_end)
+        best = None
+        for doctor in doctors:
+            slot = next(slots(IntervalIndex(busy[doctor.pk]), day_start, day_end, minutes, limit=1), None)
+            if slot and (best is None or slot[0] < best[1]):
+                best = (doctor, *slot)
+        if best:
+            return best
+        day_start = day_end
+    return None
@@ -0,0 +1,208 @@
+# search.py
+# Patient search index. The backend is picked by PATIENT_SEARCH_BACKEND, defaulting to
+# SQLite FTS5 when available and to plain indexed lookups everywhere else.
+import re
+from abc import ABC, abstractmethod
+from functools import lru_cache
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Q
+from django.utils.module_loading import import_string
+
+from .models import Patient
+
+FTS_TABLE = "hospital_api_patient_fts"
+SEARCH_MAX_RESULTS = 100
+RANK_CANDIDATES = 1000
+# shorter tokens aren't corrected, one edit away from a 3 letter name is too many names
+FUZZY_MIN_LENGTH = 4
+
+
+def tokenize(query):
+    tokens = []
+    # "0712 345-678" is one phone number
+    query = re.sub(r"(?<=\d)[\s-]+(?=\d)", "", query)
+    for token in re.findall(r"\w+", split_digits(query.lower())):
+        if token.isdigit():
+            # phone numbers are indexed without the leading 0 / country code
+            token = token.lstrip("0")
+        if token:
+            tokens.append(token)
+    return tokens
+
+
+def split_digits(text):
+    # "kamau12" is indexed as "kamau 12", otherwise every numbered email is its own term
+    return re.sub(r"(?<=[^\W\d])(?=\d)|(?<=\d)(?=[^\W\d])", " ", text)
+
+
+def phone_terms(phone):
+    digits = re.sub(r"\D", "", phone or "")
+    # full number and the 9 digit national part, so "0712..." and "+254712..." both match
+    return f"{digits} {digits[-9:]}" if len(digits) > 9 else digits
+
+
+def max_edits(token):
+    return 1 if len(token) <= 5 else 2
+
+
+def edit_distance(a, b, limit):
+    """
+    Edit distance of a and b counting a swap of neighbouring letters as one edit,
+    or limit + 1 as soon as it must exceed limit.
+    """
+    if abs(len(a) - len(b)) > limit:
+        return limit + 1
+    before, previous = None, list(range(len(b) + 1))
+    for i, char_a in enumerate(a, 1):
+        current = [i]
+        for j, char_b in enumerate(b, 1):
+            cost = min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (char_a != char_b))
+            if i > 1 and j > 1 and char_a == b[j - 2] and a[i - 2] == char_b:
+                cost = min(cost, before[j - 2] + 1)
+            current.append(cost)
+        if min(current) > limit:
+            return limit + 1
+        before, previous = previous, current
+    return previous[-1]
+
+
+class PatientSearchBackend(ABC):
+    """Interface for patient search indexes. `search` returns patient ids, best match first."""
+
+    def index(self, patient):
+        pass
+
+    def remove(self, pk):
+        pass
+
+    def rebuild(self):
+        pass
+
+    @abstractmethod
+    def search(self, query, limit=20):
+        pass
+
+
+class DatabaseSearchBackend(PatientSearchBackend):
+    """No separate index: prefix lookups on the patient columns, for databases without FTS5."""
+
+    def search(self, query, limit=20):
+        queryset = Patient.objects.all()
+        for token in tokenize(query):
+            queryset = queryset.filter(
+                Q(first_name__istartswith=token) | Q(last_name__istartswith=token)
+                | Q(email__istartswith=token) | Q(phone__contains=token)
+            )
+        return list(queryset.order_by("last_name", "first_name", "id").values_list("id", flat=True)[:limit])
+
+
+class SQLiteFTSBackend(PatientSearchBackend):
+    """
+    FTS5 table keyed by patient id with the names, email and phone columns.
+
+    Every token is matched as a prefix ("kam" finds Kamau). Patients whose names
+    match every token come first, then matches on any column, then, if that still
+    finds fewer than `limit` patients, name terms within one or two edits of the
+    tokens, found by walking the FTS vocabulary for terms sharing the first letter.
+    Each tier is ordered by bm25.
+    """
+    weights = (10.0, 4.0, 2.0)
+
+    def index(self, patient):
+        with connection.cursor() as cursor:
+            cursor.execute(f"DELETE FROM {FTS_TABLE} WHERE rowid = %s", [patient.pk])
+            cursor.execute(
+                f"INSERT INTO {FTS_TABLE} (rowid, names, email, phone) VALUES (%s, %s, %s, %s)",
+                [patient.pk, f"{patient.first_name} {patient.last_name}", split_digits(patient.email or ""), phone_terms(patient.phone)],
+            )
+
+    def remove(self, pk):
+        with connection.cursor() as cursor:
+            cursor.execute(f"DELETE FROM {FTS_TABLE} WHERE rowid = %s", [pk])
+
+    def rebuild(self):
+        with transaction.atomic(), connection.cursor() as cursor:
+            cursor.execute(f"DELETE FROM {FTS_TABLE}")
+            rows = Patient.objects.values_list("id", "first_name", "last_name", "email", "phone").order_by().iterator(5000)
+            batch = []
+            for pk, first_name, last_name, email, phone in rows:
+                batch.append((pk, f"{first_name} {last_name}", split_digits(email or ""), phone_terms(phone)))
+                if len(batch) == 5000:
+                    self.insert_rows(cursor, batch)
+                    batch = []
+            self.insert_rows(cursor, batch)
+            cursor.execute(f"INSERT INTO {FTS_TABLE} ({FTS_TABLE}) VALUES ('optimize')")
+
+    def insert_rows(self, cursor, rows):
+        if rows:
+            cursor.executemany(f"INSERT INTO {FTS_TABLE} (rowid, names, email, phone) VALUES (%s, %s, %s, %s)", rows)
+
+    def search(self, query, limit=20):
+        # single letters match too much of the index to be worth ranking
+        tokens = [token for token in tokenize(query) if len(token) >= 2]
+        if not tokens:
+            return []
+        exact = " AND ".join(self.prefix(token) for token in tokens)
+        ids = []
+        # numbers never match a name, so that tier is skipped for them
+        names_only = None if any(token.isdigit() for token in tokens) else f"names : ({exact})"
+        for expression in [lambda: names_only, lambda: exact, lambda: self.fuzzy_query(tokens)]:
+            if len(ids) >= limit:
+                break
+            expression = expression()
+            if expression:
+                ids += [pk for pk in self.match(expression, limit) if pk not in ids][:limit - len(ids)]
+        return ids
+
+    def prefix(self, token):
+        return f'"{token}"*'
+
+    def match(self, expression, limit):
+        # bm25 over the first RANK_CANDIDATES matches only: ranking every match of a
+        # common name means scoring tens of thousands of rows per request
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"SELECT rowid FROM (SELECT rowid, bm25({FTS_TABLE}, %s, %s, %s) AS score FROM {FTS_TABLE} "
+                f"WHERE {FTS_TABLE} MATCH %s LIMIT %s) ORDER BY score LIMIT %s",
+                [*self.weights, expression, RANK_CANDIDATES, limit],
+            )
+            return [row[0] for row in cursor.fetchall()]
+
+    def fuzzy_query(self, tokens):
+        groups = []
+        corrected = False
+        for token in tokens:
+            alternatives = [self.prefix(token)]
+            if len(token) >= FUZZY_MIN_LENGTH and not token.isdigit():
+                terms = self.similar_terms(token)
+                alternatives += [f'"{term}"' for term in terms]
+                corrected = corrected or bool(terms)
+            groups.append("(" + " OR ".join(alternatives) + ")")
+        return " AND ".join(groups) if corrected else None
+
+    def similar_terms(self, token):
+        limit = max_edits(token)
+        with connection.cursor() as cursor:
+            # the vocabulary is ordered by term, so this is a range scan over one letter
+            cursor.execute(
+                f"SELECT term FROM {FTS_TABLE}_vocab WHERE term >= %s AND term < %s AND col = 'names' "
+                "AND length(term) BETWEEN %s AND %s",
+                [token[0], chr(ord(token[0]) + 1), len(token) - limit, len(token) + limit],
+            )
+            terms = [row[0] for row in cursor.fetchall()]
+        return [term for term in terms if term != token and edit_distance(token, term, limit) <= limit]
+
+
+def fts5_available():
+    # the migration only creates the table when the SQLite build has FTS5
+    return connection.vendor == "sqlite" and FTS_TABLE in connection.introspection.table_names()
+
+
+@lru_cache(maxsize=None)
+def get_backend():
+    path = getattr(settings, "PATIENT_SEARCH_BACKEND", None)
+    if path:
+        return import_string(path)()
+    return SQLiteFTSBackend() if fts5_available() else DatabaseSearchBackend()
@@ -1,11 +1,58 @@
 # serializers.py
 from rest_framework import serializers
 from django.contrib.auth.models import User
+from django.db import transaction
+from django.db.models import BooleanField, ExpressionWrapper, F, Q
 from .models import (
     Profile, Department, Doctor, Patient, Appointment,
-    MedicalRecord, InventoryItem
+    MedicalRecord, InventoryItem, StockMovement
 )
 from django.utils import timezone
+from .scheduling import find_conflict
+from .stock import record_opening_stock
+
+class PrefetchedPrimaryKeyRelatedField(serializers.PrimaryKeyRelatedField):
+    """
+    PrimaryKeyRelatedField that resolves pks from `context["prefetched"][model]`
+    (a pk -> instance dict) when present, so bulk requests look up all related
+    rows with one query instead of one per item.
+    """
+
+    def to_internal_value(self, data):
+        prefetched = self.context.get("prefetched", {}).get(self.get_queryset().model)
+        if prefetched is None:
+            return super().to_internal_value(data)
+        if isinstance(data, bool):
+            self.fail("incorrect_type", data_type=type(data).__name__)
+        try:
+            pk = int(data)
+        except (TypeError, ValueError):
+            self.fail("incorrect_type", data_type=type(data).__name__)
+        if pk not in prefetched:
+            self.fail("does_not_exist", pk_value=data)
+        return prefetched[pk]
+
+
+class SparseFieldsMixin:
+    """
+    Keeps only the fields listed in `context["fields"]` (see fieldsets.py), write-only
+    fields excepted. `field_sources` names the model fields each output field reads
+    when that is not the model field of the same name, for `.only()`.
+    """
+    field_sources = {}
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        fields = self.context.get("fields")
+        if fields is not None:
+            for name in [name for name, field in self.fields.items() if not field.write_only]:
+                if name not in fields:
+                    self.fields.pop(name)
+
+    @classmethod
+    def columns(cls, fields):
+        return [column for name in fields for column in cls.field_sources.get(name, (name,))]
+
 
 class UserSerializer(serializers.ModelSerializer):
     class Meta:
@@ -20,15 +67,16 @@ class ProfileSerializer(serializers.ModelSerializer):
         fields = ["user", "role"]
 
 
-class DepartmentSerializer(serializers.ModelSerializer):
+class DepartmentSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     class Meta:
         model = Department
         fields = "__all__"
 
 
-class DoctorSerializer(serializers.ModelSerializer):
+class DoctorSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     user_name = serializers.CharField(write_only=True)
     user_email = serializers.EmailField(write_only=True)
+    field_sources = {"name": ("user__first_name", "user__last_name"), "email": ("user__email",)}
 
     name = serializers.SerializerMethodField()
     email = serializers.SerializerMethodField()
@@ -74,9 +122,10 @@ class DoctorSerializer(serializers.ModelSerializer):
         return Doctor.objects.create(user=user, **validated_data)
 
 
-class PatientSerializer(serializers.ModelSerializer):
+class PatientSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     name = serializers.SerializerMethodField()
     age = serializers.SerializerMethodField()
+    field_sources = {"name": ("first_name", "last_name"), "age": ("dob",)}
 
     class Meta:
         model = Patient
@@ -94,22 +143,58 @@ class PatientSerializer(serializers.ModelSerializer):
         return obj.age
 
 
-class AppointmentSerializer(serializers.ModelSerializer):
+class AppointmentSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     patientName = serializers.SerializerMethodField()
     doctorName = serializers.SerializerMethodField()
     date = serializers.SerializerMethodField()
     time = serializers.SerializerMethodField()
-    patient = serializers.PrimaryKeyRelatedField(queryset=Patient.objects.all())
-    doctor = serializers.PrimaryKeyRelatedField(queryset=Doctor.objects.all(), allow_null=True)
+    patient = PrefetchedPrimaryKeyRelatedField(queryset=Patient.objects.all())
+    doctor = PrefetchedPrimaryKeyRelatedField(queryset=Doctor.objects.all(), allow_null=True)
+    field_sources = {
+        "patientName": ("patient__first_name", "patient__last_name"),
+        "doctorName": ("doctor__user__first_name", "doctor__user__last_name"),
+        "date": ("scheduled_at",),
+        "time": ("scheduled_at",),
+    }
 
     class Meta:
         model = Appointment
         fields = [
             "id", "patient", "patientName", "doctor", "doctorName",
-            "scheduled_at", "date", "time", "type", "reason", "status", "created_at"
+            "scheduled_at", "duration_minutes", "date", "time", "type", "reason", "status", "created_at"
         ]
         read_only_fields = ["created_at"]
 
+    def create(self, validated_data):
+        with transaction.atomic():
+            self.ensure_doctor_is_free(validated_data)
+            return super().create(validated_data)
+
+    def update(self, instance, validated_data):
+        with transaction.atomic():
+            self.ensure_doctor_is_free(validated_data, instance)
+            return super().update(instance, validated_data)
+
+    def ensure_doctor_is_free(self, validated_data, instance=None):
+        def current(field, default=None):
+            return validated_data.get(field, getattr(instance, field, default))
+
+        doctor = current("doctor")
+        if doctor is None or current("status") == "cancelled":
+            return
+        # lock the doctor row so concurrent bookings for the same doctor serialize
+        Doctor.objects.select_for_update().filter(pk=doctor.pk).exists()
+        conflict = find_conflict(
+            doctor.pk,
+            current("scheduled_at"),
+            current("duration_minutes", Appointment._meta.get_field("duration_minutes").default),
+            exclude_pk=instance.pk if instance else None,
+        )
+        if conflict:
+            raise serializers.ValidationError({
+                "scheduled_at": f"{doctor} is already booked from {conflict[0].isoformat()} to {conflict[1].isoformat()}."
+            })
+
     def get_patientName(self, obj):
         return f"{obj.patient.first_name} {obj.patient.last_name}"
 
@@ -127,15 +212,20 @@ class AppointmentSerializer(serializers.ModelSerializer):
         return obj.scheduled_at.time().strftime("%I:%M %p")  # "09:00 AM"
 
 
-class MedicalRecordSerializer(serializers.ModelSerializer):
+class MedicalRecordSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     created_by = UserSerializer(read_only=True)
+    # write-only: responses carry the preview, the full note is at /records/{id}/notes/
+    notes = serializers.CharField(write_only=True, trim_whitespace=False)
+    field_sources = {"created_by": tuple(f"created_by__{name}" for name in UserSerializer.Meta.fields)}
     class Meta:
         model = MedicalRecord
-        fields = "__all__"
+        fields = ["id", "created_by", "notes", "preview", "notes_size", "created_at", "patient"]
+        read_only_fields = ["preview", "notes_size"]
 
 
-class InventoryItemSerializer(serializers.ModelSerializer):
+class InventoryItemSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     needs_reorder = serializers.SerializerMethodField()
+    field_sources = {"needs_reorder": ("stock", "min_stock")}
 
     class Meta:
         model = InventoryItem
@@ -145,5 +235,240 @@ class InventoryItemSerializer(serializers.ModelSerializer):
             "needs_reorder", "created_at", "updated_at"
         ]
 
+    def get_extra_kwargs(self):
+        # after creation stock only changes through stock movements
+        extra_kwargs = super().get_extra_kwargs()
+        if self.instance is not None:
+            extra_kwargs["stock"] = {**extra_kwargs.get("stock", {}), "read_only": True}
+        return extra_kwargs
+
     def get_needs_reorder(self, obj):
         return obj.needs_reorder()
+
+    def create(self, validated_data):
+        with transaction.atomic():
+            item = super().create(validated_data)
+            record_opening_stock([item], request_user(self.context))
+        return item
+
+    def update(self, instance, validated_data):
+        # save only the edited columns, a full save would write back the stock
+        # read before the update and undo movements applied in the meantime
+        with transaction.atomic():
+            # the stock the low_stock counter is recomputed from, locked until the save
+            instance.stock = InventoryItem.objects.select_for_update().values_list("stock", flat=True).get(pk=instance.pk)
+            for field, value in validated_data.items():
+                setattr(instance, field, value)
+            instance.save(update_fields=[*validated_data, "updated_at"])
+        return instance
+
+
+class StockMovementSerializer(serializers.ModelSerializer):
+    created_by = UserSerializer(read_only=True)
+
+    class Meta:
+        model = StockMovement
+        fields = ["id", "item", "kind", "quantity", "balance_after", "reason", "created_by", "created_at"]
+        read_only_fields = ["item", "balance_after"]
+
+    def validate(self, attrs):
+        if attrs["kind"] == "adjust":
+            if attrs["quantity"] == 0:
+                raise serializers.ValidationError({"quantity": "An adjustment can't be zero."})
+        elif attrs["quantity"] <= 0:
+            raise serializers.ValidationError({"quantity": f"Quantity to {attrs['kind']} must be positive."})
+        return attrs
+
+
+def request_user(context):
+    request = context.get("request")
+    if request is not None and request.user.is_authenticated:
+        return request.user
+    return None
+
+
+# ---- Fast read-only list serializers ----
+# These build exactly the same JSON as the ModelSerializers above, but from
+# `.values()` rows in a single loop instead of model instances pushed through
+# DRF's per-field dispatch. `projections` maps each output key, in Meta.fields
+# order, to the `.values()` columns it reads and a function(serializer, row).
+
+def iso_datetime(value, tz):
+    # same output as serializers.DateTimeField with the default ISO 8601 format
+    if not value:
+        return None
+    value = value.astimezone(tz).isoformat()
+    if value.endswith("+00:00"):
+        value = value[:-6] + "Z"
+    return value
+
+
+def iso_date(value):
+    return value.isoformat() if value else None
+
+
+def column(name):
+    return (name,), lambda fast, row: row[name]
+
+
+def date_column(name):
+    return (name,), lambda fast, row: iso_date(row[name])
+
+
+def datetime_column(name):
+    return (name,), lambda fast, row: iso_datetime(row[name], fast.tz)
+
+
+class FastListSerializer:
+    """
+    Base for the fast list serializers. Subclasses only declare `projections`
+    (and `annotations` for computed columns); there is nothing to override.
+    """
+    projections = {}
+    annotations = {}
+
+    def __init__(self, fields=None, extra=()):
+        """
+        `fields` narrows the output keys (and the columns read) to a subset of
+        `projections`, `extra` adds columns that are read but not output (the
+        cursor paginator needs the ordering columns).
+        """
+        # resolved once per request instead of once per row
+        self.tz = timezone.get_current_timezone()
+        self.today = timezone.localdate()
+        names = list(self.projections) if fields is None else fields
+        self.getters = [(name, self.projections[name][1]) for name in names]
+        columns = [column for name in names for column in self.projections[name][0]]
+        self.values = tuple(dict.fromkeys([*columns, *extra]))
+
+    def get_queryset(self, queryset):
+        annotations = {name: value for name, value in self.annotations.items() if name in self.values}
+        if annotations:
+            queryset = queryset.annotate(**annotations)
+        return queryset.values(*self.values)
+
+    def serialize(self, rows):
+        return [self.to_representation(row) for row in rows]
+
+    def to_representation(self, row):
+        return {name: getter(self, row) for name, getter in self.getters}
+
+
+class PatientListSerializer(FastListSerializer):
+    def age(self, row):
+        dob = row["dob"]
+        if not dob:
+            return None
+        today = self.today
+        return today.year - dob.year - ((today.month, today.day) < (dob.month, dob.day))
+
+    projections = {
+        "id": column("id"),
+        "first_name": column("first_name"),
+        "last_name": column("last_name"),
+        "name": (("first_name", "last_name"), lambda fast, row: f"{row['first_name']} {row['last_name']}"),
+        "age": (("dob",), age),
+        "dob": date_column("dob"),
+        "gender": column("gender"),
+        "phone": column("phone"),
+        "email": column("email"),
+        "address": column("address"),
+        "blood_type": column("blood_type"),
+        "last_visit": date_column("last_visit"),
+        "status": column("status"),
+        "created_at": datetime_column("created_at"),
+        "updated_at": datetime_column("updated_at"),
+    }
+
+
+class AppointmentListSerializer(FastListSerializer):
+    def doctor_name(self, row):
+        if row["doctor_id"] is None:
+            return None
+        # User.get_full_name()
+        return f"{row['doctor__user__first_name']} {row['doctor__user__last_name']}".strip()
+
+    projections = {
+        "id": column("id"),
+        "patient": column("patient_id"),
+        "patientName": (
+            ("patient__first_name", "patient__last_name"),
+            lambda fast, row: f"{row['patient__first_name']} {row['patient__last_name']}",
+        ),
+        "doctor": column("doctor_id"),
+        "doctorName": (("doctor_id", "doctor__user__first_name", "doctor__user__last_name"), doctor_name),
+        "scheduled_at": datetime_column("scheduled_at"),
+        "duration_minutes": column("duration_minutes"),
+        "date": (("scheduled_at",), lambda fast, row: row["scheduled_at"].date().isoformat()),
+        "time": (("scheduled_at",), lambda fast, row: row["scheduled_at"].time().strftime("%I:%M %p")),
+        "type": column("type"),
+        "reason": column("reason"),
+        "status": column("status"),
+        "created_at": datetime_column("created_at"),
+    }
+
+
+class MedicalRecordListSerializer(FastListSerializer):
+    def created_by(self, row):
+        if row["created_by_id"] is None:
+            return None
+        return {
+            "id": row["created_by_id"],
+            "username": row["created_by__username"],
+            "first_name": row["created_by__first_name"],
+            "last_name": row["created_by__last_name"],
+            "email": row["created_by__email"],
+        }
+
+    projections = {
+        "id": column("id"),
+        "created_by": (
+            ("created_by_id", "created_by__username", "created_by__first_name", "created_by__last_name", "created_by__email"),
+            created_by,
+        ),
+        "preview": column("preview"),
+        "notes_size": column("notes_size"),
+        "created_at": datetime_column("created_at"),
+        "patient": column("patient_id"),
+    }
+
+
+class InventoryItemListSerializer(FastListSerializer):
+    projections = {
+        "id": column("id"),
+        "sku": column("sku"),
+        "name": column("name"),
+        "category": column("category"),
+        "uses": column("uses"),
+        "stock": column("stock"),
+        "min_stock": column("min_stock"),
+        "unit": column("unit"),
+        "expiry_date": date_column("expiry_date"),
+        "needs_reorder": column("needs_reorder_flag"),
+        "created_at": datetime_column("created_at"),
+        "updated_at": datetime_column("updated_at"),
+    }
+    annotations = {
+        "needs_reorder_flag": ExpressionWrapper(Q(stock__lte=F("min_stock")), output_field=BooleanField()),
+    }
+
+
+class InventoryReorderListSerializer(FastListSerializer):
+    # inventory items joined with their InventoryForecast
+    projections = {
+        "id": column("id"),
+        "sku": column("sku"),
+        "name": column("name"),
+        "category": column("category"),
+        "unit": column("unit"),
+        "stock": column("stock"),
+        "min_stock": column("min_stock"),
+        "expiry_date": date_column("expiry_date"),
+        "burn_rate": (("forecast__burn_rate",), lambda fast, row: round(row["forecast__burn_rate"], 3)),
+        "usable_stock": column("forecast__usable_stock"),
+        "expiring_quantity": column("forecast__expiring_quantity"),
+        "days_of_stock": (("forecast__days_of_stock",), lambda fast, row: round(row["forecast__days_of_stock"], 1)),
+        "reorder_point": column("forecast__reorder_point"),
+        "order_quantity": column("forecast__order_quantity"),
+        "computed_at": datetime_column("forecast__computed_at"),
+    }
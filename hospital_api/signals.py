@@ -0,0 +1,67 @@
+# signals.py
+from django.contrib.auth.models import User
+from django.db.models.signals import post_save, post_delete, pre_save
+from django.dispatch import receiver
+
+from . import jobs, stats
+from .caching import invalidate
+from .search import get_backend
+from .models import Profile, Department, Doctor, Patient, Appointment, MedicalRecord, InventoryItem
+
+
+@receiver([post_save, post_delete], sender=User)
+@receiver([post_save, post_delete], sender=Profile)
+@receiver([post_save, post_delete], sender=Department)
+@receiver([post_save, post_delete], sender=Doctor)
+@receiver([post_save, post_delete], sender=Patient)
+@receiver([post_save, post_delete], sender=Appointment)
+@receiver([post_save, post_delete], sender=MedicalRecord)
+@receiver([post_save, post_delete], sender=InventoryItem)
+def invalidate_cached_responses(sender, **kwargs):
+    invalidate(sender)
+
+
+@receiver(post_save, sender=Patient)
+def index_patient(sender, instance, **kwargs):
+    get_backend().index(instance)
+
+
+@receiver(post_delete, sender=Patient)
+def unindex_patient(sender, instance, **kwargs):
+    get_backend().remove(instance.pk)
+
+
+@receiver(pre_save, sender=Patient)
+@receiver(pre_save, sender=Appointment)
+@receiver(pre_save, sender=Doctor)
+@receiver(pre_save, sender=InventoryItem)
+def remember_counted_fields(sender, instance, update_fields=None, **kwargs):
+    instance._stats_before = stats.snapshot_before(sender, instance, update_fields)
+
+
+@receiver(post_save, sender=Patient)
+@receiver(post_save, sender=Appointment)
+@receiver(post_save, sender=Doctor)
+@receiver(post_save, sender=InventoryItem)
+def count_saved(sender, instance, **kwargs):
+    before = getattr(instance, "_stats_before", None)
+    stats.apply(stats.changes(sender, [before] if before is not None else [], [instance]))
+
+
+@receiver(post_delete, sender=Patient)
+@receiver(post_delete, sender=Appointment)
+@receiver(post_delete, sender=Doctor)
+@receiver(post_delete, sender=InventoryItem)
+def count_deleted(sender, instance, **kwargs):
+    stats.apply(stats.changes(sender, before=[instance]))
+
+
+@receiver(post_save, sender=Appointment)
+def count_visits_saved(sender, instance, **kwargs):
+    before = getattr(instance, "_stats_before", None)
+    jobs.refresh_visit_counts([before] if before is not None else [], [instance])
+
+
+@receiver(post_delete, sender=Appointment)
+def count_visits_deleted(sender, instance, **kwargs):
+    jobs.refresh_visit_counts(before=[instance])
@@ -0,0 +1,179 @@
+# stats.py
+# Dashboard counters. Every tracked row contributes +1 to a few (metric, key, day)
+# counters; saves and deletes move those contributions instead of recounting.
+# Appointments with a doctor also add to that doctor's DoctorDayStat row (count
+# and minutes) the same way, for the doctor analytics.
+from collections import Counter, defaultdict
+
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Q, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from .models import Appointment, Doctor, DoctorDayStat, InventoryItem, Patient, StatCounter
+
+# first item of the keys that belong to DoctorDayStat rather than StatCounter
+DOCTOR_DAY = "doctor_day"
+
+
+def patient_counters(patient):
+    return [("patients", patient.status, None)]
+
+
+def appointment_counters(appointment):
+    day = timezone.localdate(appointment.scheduled_at)
+    counters = {("appointments", appointment.status, day): 1}
+    if appointment.doctor_id is not None:
+        row = (DOCTOR_DAY, appointment.doctor_id, day, appointment.status)
+        counters[(*row, "appointments")] = 1
+        counters[(*row, "minutes")] = appointment.duration_minutes
+    return counters
+
+
+def doctor_counters(doctor):
+    return [("doctors", doctor.availability, None)]
+
+
+def inventory_counters(item):
+    counters = [("inventory", "total", None)]
+    if item.stock <= item.min_stock:
+        counters.append(("inventory", "low_stock", None))
+    return counters
+
+
+# model -> (fields the counters depend on, function returning an instance's counters,
+# as a list of +1 keys or a {key: amount} dict)
+TRACKED = {
+    Patient: (["status"], patient_counters),
+    # patient for the visit counts, see jobs.refresh_visit_counts()
+    Appointment: (["status", "scheduled_at", "doctor", "patient", "duration_minutes"], appointment_counters),
+    Doctor: (["availability"], doctor_counters),
+    InventoryItem: (["stock", "min_stock"], inventory_counters),
+}
+
+
+def changes(model, before=(), after=()):
+    """Counter deltas for rows going from the `before` instances to the `after` instances."""
+    counters = TRACKED[model][1]
+    deltas = Counter()
+    for obj in before:
+        deltas.subtract(counters(obj))
+    for obj in after:
+        deltas.update(counters(obj))
+    return deltas
+
+
+def apply(deltas):
+    """Adds the deltas with one UPDATE ... SET count = count + n per changed row."""
+    doctor_days = defaultdict(dict)
+    for counter, delta in sorted(deltas.items(), key=str):
+        if not delta:
+            continue
+        if counter[0] == DOCTOR_DAY:
+            _, doctor_id, day, status, field = counter
+            doctor_days[doctor_id, day, status][field] = delta
+        else:
+            metric, key, day = counter
+            add(StatCounter, {"metric": metric, "key": key, "day": day}, {"count": delta})
+    for (doctor_id, day, status), changed in doctor_days.items():
+        add(DoctorDayStat, {"doctor_id": doctor_id, "day": day, "status": status}, changed)
+
+
+def add(model, lookup, amounts):
+    rows = model.objects.filter(**lookup)
+    increments = {field: F(field) + amount for field, amount in amounts.items()}
+    if rows.update(**increments):
+        return
+    try:
+        with transaction.atomic():
+            model.objects.create(**lookup, **amounts)
+    except IntegrityError:
+        # created by a concurrent writer in the meantime
+        rows.update(**increments)
+
+
+def record(model, before=(), after=()):
+    """For writes that send no signals (bulk_create, bulk_update, queryset.update())."""
+    if model in TRACKED:
+        apply(changes(model, before, after))
+
+
+def snapshot_before(model, instance, update_fields=None):
+    """
+    The stored version of `instance` with only the counted fields, None for new rows.
+    Read with select_for_update(): CountedModel.save() runs in a transaction, so the
+    row stays locked until the counters have been moved. Saves whose update_fields
+    leave out every counted field don't read anything.
+    """
+    fields = TRACKED[model][0]
+    if instance.pk is None or instance._state.adding:
+        return None
+    if update_fields is not None and not set(update_fields) & set(fields):
+        return instance
+    return model.objects.select_for_update().filter(pk=instance.pk).only(*fields).first()
+
+
+def count_from_scratch():
+    """The counters recomputed with GROUP BY queries over the tracked tables."""
+    counts = Counter()
+    for row in Patient.objects.order_by().values("status").annotate(n=Count("id")):
+        counts["patients", row["status"], None] = row["n"]
+    for row in Doctor.objects.order_by().values("availability").annotate(n=Count("id")):
+        counts["doctors", row["availability"], None] = row["n"]
+    appointments = Appointment.objects.order_by().annotate(
+        day=TruncDate("scheduled_at", tzinfo=timezone.get_current_timezone())
+    ).values("status", "day").annotate(n=Count("id"))
+    for row in appointments:
+        counts["appointments", row["status"], row["day"]] = row["n"]
+    doctor_days = Appointment.objects.filter(doctor__isnull=False).order_by().annotate(
+        day=TruncDate("scheduled_at", tzinfo=timezone.get_current_timezone())
+    ).values("doctor_id", "day", "status").annotate(n=Count("id"), minutes=Sum("duration_minutes"))
+    for row in doctor_days:
+        counts[DOCTOR_DAY, row["doctor_id"], row["day"], row["status"], "appointments"] = row["n"]
+        counts[DOCTOR_DAY, row["doctor_id"], row["day"], row["status"], "minutes"] = row["minutes"]
+    inventory = InventoryItem.objects.aggregate(
+        total=Count("id"), low_stock=Count("id", filter=Q(stock__lte=F("min_stock")))
+    )
+    for key, n in inventory.items():
+        counts["inventory", key, None] = n
+    return {counter: n for counter, n in counts.items() if n}
+
+
+def stored_counts():
+    counts = {
+        (metric, key, day): count
+        for metric, key, day, count in StatCounter.objects.values_list("metric", "key", "day", "count")
+    }
+    rows = DoctorDayStat.objects.values_list("doctor_id", "day", "status", "appointments", "minutes")
+    for doctor_id, day, status, appointments, minutes in rows:
+        counts[DOCTOR_DAY, doctor_id, day, status, "appointments"] = appointments
+        counts[DOCTOR_DAY, doctor_id, day, status, "minutes"] = minutes
+    return {counter: count for counter, count in counts.items() if count}
+
+
+def rebuild():
+    counters = []
+    doctor_days = defaultdict(dict)
+    for counter, count in count_from_scratch().items():
+        if counter[0] == DOCTOR_DAY:
+            doctor_days[counter[1:4]][counter[4]] = count
+        else:
+            counters.append(StatCounter(metric=counter[0], key=counter[1], day=counter[2], count=count))
+    with transaction.atomic():
+        StatCounter.objects.all().delete()
+        StatCounter.objects.bulk_create(counters)
+        DoctorDayStat.objects.all().delete()
+        DoctorDayStat.objects.bulk_create([
+            DoctorDayStat(doctor_id=doctor_id, day=day, status=status, **amounts)
+            for (doctor_id, day, status), amounts in doctor_days.items()
+        ], batch_size=5000)
+
+
+def differences():
+    """{(metric, key, day): (stored, actual)} for every counter that is out of sync."""
+    stored, actual = stored_counts(), count_from_scratch()
+    return {
+        counter: (stored.get(counter, 0), actual.get(counter, 0))
+        for counter in set(stored) | set(actual)
+        if stored.get(counter, 0) != actual.get(counter, 0)
+    }
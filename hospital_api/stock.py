@@ -0,0 +1,76 @@
+# stock.py
+# Stock movements: every change to InventoryItem.stock goes through here and is
+# recorded in the StockMovement ledger.
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from . import stats
+from .caching import invalidate
+from .models import InventoryItem, StockMovement
+
+
+class InsufficientStock(Exception):
+    def __init__(self, item_id, requested):
+        self.item_id = item_id
+        self.requested = requested
+        super().__init__(f"Not enough stock on item {item_id} to remove {requested}.")
+
+
+def signed_quantity(kind, quantity):
+    # receive/dispense take a positive quantity, adjust takes the signed correction
+    if kind == "dispense":
+        return -quantity
+    return quantity
+
+
+def apply_movement(item_id, kind, quantity, user=None, reason=""):
+    """
+    Applies one movement and appends it to the ledger, returns the StockMovement.
+
+    The balance is changed with a single conditional UPDATE (stock = stock + delta),
+    so concurrent movements never read-modify-write the same value: the database
+    serialises them on the row and a removal that would go below zero matches no
+    row instead of overdrawing. Raises InventoryItem.DoesNotExist or InsufficientStock.
+    """
+    delta = signed_quantity(kind, quantity)
+    with transaction.atomic():
+        items = InventoryItem.objects.filter(pk=item_id)
+        guarded = items.filter(stock__gte=-delta) if delta < 0 else items
+        if not guarded.update(stock=F("stock") + delta, updated_at=timezone.now()):
+            if not items.exists():
+                raise InventoryItem.DoesNotExist(f"No inventory item with id {item_id}.")
+            raise InsufficientStock(item_id, -delta)
+        # the UPDATE holds the row lock until commit, so this is our own balance
+        balance, min_stock = items.values_list("stock", "min_stock").get()
+        stats.record(
+            InventoryItem,
+            before=[InventoryItem(stock=balance - delta, min_stock=min_stock)],
+            after=[InventoryItem(stock=balance, min_stock=min_stock)],
+        )
+        movement = StockMovement.objects.create(
+            item_id=item_id,
+            kind=kind,
+            quantity=delta,
+            balance_after=balance,
+            reason=reason,
+            created_by=user,
+        )
+    # queryset.update() sends no signals
+    invalidate(InventoryItem)
+    return movement
+
+
+def record_opening_stock(items, user=None):
+    """Ledger rows for the stock new items were created with, so the ledger sums to the balance."""
+    StockMovement.objects.bulk_create([
+        StockMovement(
+            item_id=item.pk,
+            kind="receive",
+            quantity=item.stock,
+            balance_after=item.stock,
+            reason="Opening stock",
+            created_by=user,
+        )
+        for item in items if item.stock
+    ])
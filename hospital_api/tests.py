@@ -1,3 +1,1593 @@
-from django.test import TestCase
+import gzip
+import json
+import threading
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+from io import StringIO
+from unittest import mock, skipUnless
 
-# Create your tests here.
+from asgiref.sync import sync_to_async
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.management import CommandError, call_command
+from django.db import connection
+from django.test import AsyncRequestFactory, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.permissions import BasePermission
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APITestCase
+
+from . import forecast, jobs, scheduling, search, stats
+from .async_views import AsyncReadView
+from .renderers import ORJSONRenderer, msgpack
+from .stock import InsufficientStock, apply_movement
+from .exports import streaming_export
+from .loadgen import LoadGenerator
+from .middleware import brotli, metrics
+from .models import (
+    Patient, Doctor, Appointment, Department, MedicalRecord, InventoryItem, StatCounter, StockMovement,
+    MedicalRecordNoteChunk, InventoryForecast,
+)
+from .serializers import (
+    PatientSerializer, AppointmentSerializer, InventoryItemSerializer,
+    PatientListSerializer, AppointmentListSerializer, InventoryItemListSerializer,
+    MedicalRecordSerializer, MedicalRecordListSerializer,
+)
+from .views import PatientViewSet, AppointmentViewSet, InventoryItemViewSet, MedicalRecordViewSet
+
+
+def make_doctor(n):
+    user = User.objects.create(
+        username=f"doctor{n}", first_name="Doc", last_name=f"Number{n}", email=f"doctor{n}@hospital.com"
+    )
+    return Doctor.objects.create(user=user, specialization="Cardiologist")
+
+
+def make_patient(n):
+    return Patient.objects.create(first_name="Pat", last_name=f"Number{n}", dob=date(1990, 1, 1))
+
+
+def make_appointment(patient, doctor, n):
+    scheduled_at = timezone.make_aware(datetime(2024, 1, 1, 9, 0)) + timedelta(hours=n)
+    return Appointment.objects.create(patient=patient, doctor=doctor, scheduled_at=scheduled_at)
+
+
+def seed_rows(count):
+    """Creates `count` rows for every router-registered model."""
+    start = Patient.objects.count()
+    for n in range(start, start + count):
+        doctor = make_doctor(n)
+        patient = make_patient(n)
+        make_appointment(patient, doctor, n)
+        MedicalRecord.objects.create(patient=patient, notes="Routine checkup", created_by=doctor.user)
+        Department.objects.create(name=f"Department {n}")
+        InventoryItem.objects.create(sku=f"M{n:04d}", name=f"Medicine {n}", stock=n, min_stock=5)
+
+
+class QueryCountTests(APITestCase):
+    """Pins the number of SQL queries per endpoint so N+1 regressions fail loudly."""
+
+    # endpoint -> queries for a list/retrieve request, independent of row count
+    LIST_QUERIES = {
+        "/api/patients/": 1,
+        "/api/doctors/": 1,
+        "/api/appointments/": 1,
+        "/api/departments/": 1,
+        "/api/records/": 1,
+        "/api/inventory/": 1,
+    }
+    RETRIEVE_QUERIES = {
+        "/api/patients/": 1,
+        "/api/doctors/": 1,
+        "/api/appointments/": 1,
+        "/api/departments/": 1,
+        "/api/records/": 1,
+        "/api/inventory/": 1,
+    }
+
+    def setUp(self):
+        cache.clear()
+
+    def assertListQueries(self, url, expected):
+        with self.assertNumQueries(expected):
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return response
+
+    def test_list_query_count_is_constant(self):
+        seed_rows(1)
+        for url, expected in self.LIST_QUERIES.items():
+            with self.subTest(url=url, rows=1):
+                self.assertListQueries(url, expected)
+
+        # cached responses are invalidated on commit
+        with self.captureOnCommitCallbacks(execute=True):
+            seed_rows(20)
+        for url, expected in self.LIST_QUERIES.items():
+            with self.subTest(url=url, rows=21):
+                self.assertListQueries(url, expected)
+
+    def test_retrieve_query_count(self):
+        seed_rows(3)
+        for url, expected in self.RETRIEVE_QUERIES.items():
+            response = self.client.get(url)
+            item_url = f"{url}{response.data['results'][0]['id']}/"
+            with self.subTest(url=item_url):
+                self.assertListQueries(item_url, expected)
+
+    def test_appointment_names(self):
+        seed_rows(1)
+        response = self.client.get("/api/appointments/")
+        self.assertEqual(response.data["results"][0]["patientName"], "Pat Number0")
+        self.assertEqual(response.data["results"][0]["doctorName"], "Doc Number0")
+
+
+class CursorPaginationTests(APITestCase):
+    def collect_pages(self, url):
+        ids = []
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            ids.extend(row["id"] for row in response.data["results"])
+            url = response.data["next"]
+        return ids
+
+    def test_walks_every_row_once(self):
+        seed_rows(12)
+        for url in ["/api/patients/", "/api/appointments/", "/api/inventory/"]:
+            with self.subTest(url=url):
+                ids = self.collect_pages(f"{url}?page_size=5")
+                self.assertEqual(len(ids), 12)
+                self.assertEqual(len(set(ids)), 12)
+
+    def test_appointments_newest_first(self):
+        seed_rows(3)
+        response = self.client.get("/api/appointments/")
+        scheduled = [row["scheduled_at"] for row in response.data["results"]]
+        self.assertEqual(scheduled, sorted(scheduled, reverse=True))
+
+    def test_inserts_do_not_shift_next_page(self):
+        seed_rows(6)
+        first = self.client.get("/api/appointments/?page_size=3")
+        # a newer appointment lands on page 1, page 2 must stay the same
+        make_appointment(make_patient(99), None, 1000)
+        second = self.client.get(first.data["next"])
+        first_ids = {row["id"] for row in first.data["results"]}
+        second_ids = [row["id"] for row in second.data["results"]]
+        self.assertEqual(len(second_ids), 3)
+        self.assertFalse(first_ids & set(second_ids))
+
+    def test_page_size_is_capped(self):
+        seed_rows(2)
+        response = self.client.get("/api/patients/?page_size=100000")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data["results"]), 2)
+
+
+class InventorySummaryTests(APITestCase):
+    def setUp(self):
+        today = timezone.localdate()
+        InventoryItem.objects.create(sku="M001", name="Paracetamol", category="Analgesic", stock=450, min_stock=200, expiry_date=today + timedelta(days=10))
+        InventoryItem.objects.create(sku="M002", name="Ibuprofen", category="Analgesic", stock=100, min_stock=150, expiry_date=today - timedelta(days=1))
+        InventoryItem.objects.create(sku="M003", name="Amoxicillin", category="Antibiotic", stock=30, min_stock=30, expiry_date=today + timedelta(days=90))
+        InventoryItem.objects.create(sku="M004", name="Gauze", stock=5, min_stock=0)
+
+    def test_summary_in_one_query(self):
+        with self.assertNumQueries(1):
+            response = self.client.get("/api/inventory/summary/")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data["total_medicines"], 4)
+        self.assertEqual(response.data["total_units"], 585)
+        self.assertEqual(response.data["low_stock"], 2)
+        self.assertEqual(response.data["expiring_soon"], 1)
+        self.assertEqual(response.data["expired"], 1)
+
+        categories = {row["category"]: row for row in response.data["categories"]}
+        self.assertEqual(categories["Analgesic"]["units"], 550)
+        self.assertEqual(categories["Antibiotic"]["low_stock"], 1)
+        self.assertEqual(categories[""]["medicines"], 1)
+
+    def test_summary_window(self):
+        response = self.client.get("/api/inventory/summary/?days=100")
+        self.assertEqual(response.data["expiring_soon"], 2)
+
+    def test_summary_window_is_clamped(self):
+        response = self.client.get("/api/inventory/summary/?days=3000000")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data["expiring_within_days"], 100 * 365)
+        self.assertEqual(response.data["expiring_soon"], 2)
+
+    def test_summary_empty(self):
+        InventoryItem.objects.all().delete()
+        response = self.client.get("/api/inventory/summary/")
+        self.assertEqual(response.data["total_units"], 0)
+        self.assertEqual(response.data["categories"], [])
+
+    def test_low_stock(self):
+        response = self.client.get("/api/inventory/low-stock/")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([row["sku"] for row in response.data["results"]], ["M003", "M002"])
+
+
+class ScaleSeedTests(TestCase):
+    def test_scale_seed_is_deterministic(self):
+        call_command("seed", scale=20, seed=7, batch_size=8, stdout=StringIO())
+        self.assertEqual(Patient.objects.count(), 20)
+        self.assertEqual(Appointment.objects.count(), 200)
+        self.assertEqual(MedicalRecord.objects.count(), 100)
+        first = list(Patient.objects.order_by("id").values_list("first_name", "last_name", "dob"))
+
+        Patient.objects.all().delete()
+        Doctor.objects.all().delete()
+        User.objects.all().delete()
+        InventoryItem.objects.all().delete()
+        call_command("seed", scale=20, seed=7, stdout=StringIO())
+        second = list(Patient.objects.order_by("id").values_list("first_name", "last_name", "dob"))
+        self.assertEqual(first, second)
+
+        # bulk inserts skip the visit count signals, the seed recomputes them
+        counts = (
+            list(Doctor.objects.order_by("id").values_list("patients", flat=True)),
+            list(Patient.objects.order_by("id").values_list("last_visit", flat=True)),
+        )
+        self.assertTrue(any(counts[1]))
+        jobs.rebuild_visit_counts()
+        self.assertEqual(counts, (
+            list(Doctor.objects.order_by("id").values_list("patients", flat=True)),
+            list(Patient.objects.order_by("id").values_list("last_visit", flat=True)),
+        ))
+
+    def test_same_data_on_any_day(self):
+        rows = []
+        for today in [datetime(2024, 1, 1, 12), datetime(2030, 6, 15, 12)]:
+            with mock.patch("django.utils.timezone.now", return_value=timezone.make_aware(today)):
+                generator = LoadGenerator(seed=3)
+                self.assertEqual(generator.inventory(5), 5)
+            rows.append(list(InventoryItem.objects.order_by("id").values_list("expiry_date", "stock")))
+            InventoryItem.objects.all().delete()
+        self.assertEqual(rows[0], rows[1])
+
+
+class BenchmarkApiCommandTests(TestCase):
+    def test_reports_every_endpoint(self):
+        out = StringIO()
+        call_command("benchmark_api", patients=10, iterations=2, warmup=0, stdout=out, stderr=StringIO())
+        report = json.loads(out.getvalue())
+        self.assertEqual(set(report["endpoints"]), {"patients", "doctors", "appointments", "departments", "records", "inventory"})
+        for endpoint, actions in report["endpoints"].items():
+            self.assertEqual(actions["list"]["status"], 200, endpoint)
+            self.assertEqual(actions["create"]["status"], 201, endpoint)
+            self.assertIn("p99_ms", actions["list"])
+        self.assertEqual(report["endpoints"]["appointments"]["list"]["queries"], 1)
+        # everything the benchmark wrote is rolled back
+        self.assertEqual(Patient.objects.count(), 0)
+
+
+@override_settings(REQUEST_METRICS_ENABLED=True, REQUEST_METRICS_QUERY_BUDGET=1)
+class RequestMetricsTests(APITestCase):
+    def setUp(self):
+        metrics.reset()
+        self.client.force_authenticate(User.objects.create(username="ops", is_staff=True))
+
+    def test_records_per_view(self):
+        seed_rows(2)
+        response = self.client.get("/api/appointments/")
+        self.assertEqual(response["X-Query-Count"], "1")
+        self.assertIn("db;dur=", response["Server-Timing"])
+        self.client.get("/api/appointments/")
+
+        snapshot = self.client.get("/api/metrics/").data
+        stats = snapshot["views"]["GET appointment-list"]
+        self.assertEqual(stats["requests"], 2)
+        self.assertEqual(stats["queries_total"], 2)
+        self.assertEqual(sum(stats["wall_ms_histogram"]), 2)
+        self.assertGreater(stats["bytes_total"], 0)
+
+    def test_flags_query_budget(self):
+        seed_rows(1)
+        with self.assertLogs("hospital_api.metrics", "WARNING"):
+            self.client.post("/api/doctors/", {"user_name": "Jane Doe", "user_email": "jane@hospital.com"}, format="json")
+        snapshot = self.client.get("/api/metrics/").data
+        self.assertEqual(snapshot["views"]["POST doctor-list"]["over_query_budget"], 1)
+        self.assertEqual(snapshot["budget_violations"][0]["view"], "POST doctor-list")
+
+    def test_reset(self):
+        self.client.get("/api/patients/")
+        self.client.delete("/api/metrics/")
+        self.assertNotIn("GET patient-list", metrics.snapshot()["views"])
+
+
+class RequestMetricsDisabledTests(APITestCase):
+    def test_no_overhead_when_disabled(self):
+        metrics.reset()
+        response = self.client.get("/api/patients/")
+        self.assertNotIn("X-Query-Count", response)
+        self.assertEqual(metrics.snapshot()["views"], {})
+
+    def test_metrics_endpoint_requires_staff(self):
+        self.assertEqual(self.client.get("/api/metrics/").status_code, 403)
+
+
+class FastListSerializerTests(APITestCase):
+    def setUp(self):
+        seed_rows(5)
+        today = timezone.localdate()
+        Patient.objects.create(first_name="No", last_name="Birthday", email=None)
+        Patient.objects.create(first_name="Birthday", last_name="Today", dob=today.replace(year=today.year - 30), last_visit=today)
+        make_appointment(make_patient(50), None, 50)
+        InventoryItem.objects.create(sku="X1", name="No expiry", stock=5, min_stock=5, uses="Long text " * 50)
+
+    def assertSameBytes(self, viewset, serializer_class, fast_class):
+        queryset = viewset.queryset.order_by(*viewset.cursor_ordering)
+        expected = JSONRenderer().render(serializer_class(queryset, many=True).data)
+        fast = fast_class()
+        actual = JSONRenderer().render(fast.serialize(fast.get_queryset(queryset)))
+        self.assertEqual(actual, expected)
+
+    def test_patients_identical(self):
+        self.assertSameBytes(PatientViewSet, PatientSerializer, PatientListSerializer)
+
+    def test_appointments_identical(self):
+        self.assertSameBytes(AppointmentViewSet, AppointmentSerializer, AppointmentListSerializer)
+
+    def test_inventory_identical(self):
+        self.assertSameBytes(InventoryItemViewSet, InventoryItemSerializer, InventoryItemListSerializer)
+
+    def test_records_identical(self):
+        MedicalRecord.objects.create(patient=Patient.objects.first(), notes="No author")
+        self.assertSameBytes(MedicalRecordViewSet, MedicalRecordSerializer, MedicalRecordListSerializer)
+
+    def test_list_endpoint_matches_retrieve(self):
+        for url in ["/api/patients/", "/api/appointments/", "/api/records/", "/api/inventory/"]:
+            for row in self.client.get(url).data["results"]:
+                with self.subTest(url=url, id=row["id"]):
+                    self.assertEqual(row, self.client.get(f"{url}{row['id']}/").data)
+
+
+class ExportTests(APITestCase):
+    def setUp(self):
+        seed_rows(7)
+
+    def read(self, response):
+        self.assertTrue(response.streaming)
+        return b"".join(response.streaming_content).decode()
+
+    def test_ndjson_matches_list_rows(self):
+        for url in ["/api/patients/", "/api/appointments/", "/api/records/"]:
+            with self.subTest(url=url):
+                response = self.client.get(f"{url}export/")
+                self.assertEqual(response["Content-Type"], "application/x-ndjson")
+                exported = [json.loads(line) for line in self.read(response).splitlines()]
+                listed = self.client.get(url, {"page_size": 100}).data["results"]
+                self.assertEqual(sorted(exported, key=lambda row: row["id"]), sorted(listed, key=lambda row: row["id"]))
+
+    def test_csv(self):
+        response = self.client.get("/api/records/export/", {"as": "csv"})
+        self.assertEqual(response["Content-Type"], "text/csv")
+        self.assertIn('filename="medicalrecord-export-', response["Content-Disposition"])
+        lines = self.read(response).splitlines()
+        self.assertEqual(lines[0], "id,created_by,preview,notes_size,created_at,patient")
+        self.assertEqual(len(lines), 8)
+        record = MedicalRecord.objects.order_by("id").first()
+        self.assertTrue(lines[1].startswith(f"{record.id},{record.created_by_id},Routine checkup,"))
+
+    def test_chunked_output(self):
+        response = streaming_export(PatientListSerializer(), Patient.objects.all(), "ndjson", "patients", chunk_size=3)
+        chunks = list(response.streaming_content)
+        self.assertEqual([chunk.count(b"\n") for chunk in chunks], [3, 3, 1])
+
+    def test_unknown_format(self):
+        self.assertEqual(self.client.get("/api/patients/export/", {"as": "xml"}).status_code, 400)
+
+
+class ResponseCacheTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        seed_rows(3)
+
+    def test_hits_skip_the_database(self):
+        first = self.client.get("/api/doctors/")
+        with self.assertNumQueries(0):
+            second = self.client.get("/api/doctors/")
+        self.assertEqual(first.data, second.data)
+        self.assertEqual(first["ETag"], second["ETag"])
+
+    def test_query_params_are_part_of_the_key(self):
+        self.client.get("/api/departments/", {"page_size": 1})
+        response = self.client.get("/api/departments/", {"page_size": 2})
+        self.assertEqual(len(response.data["results"]), 2)
+
+    def test_save_and_delete_invalidate(self):
+        self.client.get("/api/departments/")
+        with self.captureOnCommitCallbacks(execute=True):
+            Department.objects.create(name="Radiology")
+        self.assertIn("Radiology", [row["name"] for row in self.client.get("/api/departments/").data["results"]])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Department.objects.get(name="Radiology").delete()
+        self.assertNotIn("Radiology", [row["name"] for row in self.client.get("/api/departments/").data["results"]])
+
+    def test_user_change_invalidates_doctors(self):
+        doctor = Doctor.objects.order_by("id").first()
+        url = f"/api/doctors/{doctor.id}/"
+        self.client.get(url)
+        doctor.user.first_name = "Renamed"
+        with self.captureOnCommitCallbacks(execute=True):
+            doctor.user.save()
+        self.assertEqual(self.client.get(url).data["name"], f"Renamed {doctor.user.last_name}")
+
+    def test_if_none_match(self):
+        etag = self.client.get("/api/doctors/")["ETag"]
+        with self.assertNumQueries(0):
+            response = self.client.get("/api/doctors/", HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.content, b"")
+        for header in [f"W/{etag}", f'"other", {etag}', "*"]:
+            self.assertEqual(self.client.get("/api/doctors/", HTTP_IF_NONE_MATCH=header).status_code, 304, header)
+        # a prefix or a longer tag containing it is a different ETag
+        for header in [etag[:-3] + '"', f'"x{etag[1:]}']:
+            self.assertEqual(self.client.get("/api/doctors/", HTTP_IF_NONE_MATCH=header).status_code, 200, header)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            make_doctor(99)
+        response = self.client.get("/api/doctors/", HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response["ETag"], etag)
+
+    def test_invalidated_on_commit(self):
+        first = self.client.get("/api/departments/")
+        with self.captureOnCommitCallbacks() as callbacks:
+            Department.objects.create(name="Radiology")
+            # a request before the commit still gets the cached (committed) rows
+            self.assertEqual(self.client.get("/api/departments/").data, first.data)
+        for callback in callbacks:
+            callback()
+        self.assertNotEqual(self.client.get("/api/departments/").data, first.data)
+
+
+class SchedulingTests(APITestCase):
+    def setUp(self):
+        self.doctor = make_doctor(1)
+        self.patient = make_patient(1)
+        day = timezone.localdate() + timedelta(days=2)
+        self.day_start = timezone.make_aware(datetime.combine(day, datetime.min.time()))
+
+    def at(self, hour, minute=0):
+        return self.day_start + timedelta(hours=hour, minutes=minute)
+
+    def book(self, hour, minute=0, duration=30, **extra):
+        return self.client.post("/api/appointments/", {
+            "patient": self.patient.id, "doctor": self.doctor.id,
+            "scheduled_at": self.at(hour, minute).isoformat(), "duration_minutes": duration, **extra,
+        }, format="json")
+
+    def test_interval_index(self):
+        index = scheduling.IntervalIndex([(1, 3), (2, 5), (7, 8)])
+        self.assertEqual(list(zip(index.starts, index.ends)), [(1, 5), (7, 8)])
+        self.assertTrue(index.overlaps(4, 6))
+        self.assertFalse(index.overlaps(5, 7))
+        self.assertEqual(list(index.gaps(0, 10)), [(0, 1), (5, 7), (8, 10)])
+
+    def test_rejects_overlapping_booking(self):
+        self.assertEqual(self.book(9, duration=60).status_code, 201)
+        response = self.book(9, 30)
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("scheduled_at", response.data)
+        # back to back is fine
+        self.assertEqual(self.book(10).status_code, 201)
+
+    def test_cancelled_bookings_do_not_block(self):
+        self.book(9, status="cancelled")
+        self.assertEqual(self.book(9).status_code, 201)
+
+    def test_update_checks_other_bookings_only(self):
+        first = self.book(9).data["id"]
+        self.book(11)
+        url = f"/api/appointments/{first}/"
+        self.assertEqual(self.client.patch(url, {"duration_minutes": 45}, format="json").status_code, 200)
+        response = self.client.patch(url, {"scheduled_at": self.at(10, 45).isoformat()}, format="json")
+        self.assertEqual(response.status_code, 400)
+
+    def test_free_slots(self):
+        self.book(8, 30, duration=60)
+        response = self.client.get(f"/api/doctors/{self.doctor.id}/free-slots/", {
+            "start": self.at(0).isoformat(), "end": self.at(12).isoformat(), "duration": 60,
+        })
+        starts = [slot["start"] for slot in response.data["slots"]]
+        self.assertEqual(starts, [self.at(h, 30) for h in (9, 10)])
+
+    def test_unavailable_doctor_has_no_slots(self):
+        self.doctor.availability = "on_leave"
+        self.doctor.save()
+        response = self.client.get(f"/api/doctors/{self.doctor.id}/free-slots/")
+        self.assertEqual(response.data["slots"], [])
+
+    def test_next_available_across_doctors(self):
+        other = make_doctor(2)
+        # first doctor is booked all morning, the other only until 08:30
+        self.book(8, duration=240)
+        self.client.post("/api/appointments/", {
+            "patient": self.patient.id, "doctor": other.id,
+            "scheduled_at": self.at(8).isoformat(), "duration_minutes": 30,
+        }, format="json")
+        with self.assertNumQueries(2):
+            response = self.client.get("/api/doctors/next-available/", {
+                "specialization": "cardiologist", "after": self.at(0).isoformat(),
+            })
+        self.assertEqual(response.data["doctor"], other.id)
+        self.assertEqual(response.data["start"], self.at(8, 30))
+
+    def test_next_available_requires_specialization(self):
+        self.assertEqual(self.client.get("/api/doctors/next-available/").status_code, 400)
+
+    def test_bad_ranges_are_rejected(self):
+        url = f"/api/doctors/{self.doctor.id}/free-slots/"
+        for params in [
+            {"start": "2024-02-30"},
+            {"start": "2024-02-30T10:00"},
+            {"start": "tomorrow"},
+            {"start": "2024-03-02", "end": "2024-03-01"},
+        ]:
+            self.assertEqual(self.client.get(url, params).status_code, 400, params)
+        response = self.client.get(
+            "/api/doctors/next-available/", {"specialization": "cardiologist", "after": "2024-02-30T10:00"}
+        )
+        self.assertEqual(response.status_code, 400)
+
+
+class BulkTests(APITestCase):
+    def setUp(self):
+        self.doctor = make_doctor(1)
+        self.patients = [make_patient(n) for n in range(3)]
+        # 20 half hour bookings from 08:00 stay on one day, i.e. one dashboard counter
+        self.start = timezone.make_aware(datetime.combine(timezone.localdate() + timedelta(days=3), datetime.min.time())) + timedelta(hours=8)
+
+    def appointment(self, n, **extra):
+        return {
+            "patient": self.patients[n % 3].id, "doctor": self.doctor.id,
+            "scheduled_at": (self.start + timedelta(minutes=30 * n)).isoformat(), **extra,
+        }
+
+    def test_bulk_create_appointments_in_constant_queries(self):
+        items = [self.appointment(n) for n in range(20)]
+        # patients, doctors, the doctor lock, booked intervals and the insert, plus the
+        # savepoint pair, then the day's counter and the doctor's day: each an UPDATE that
+        # misses and a savepoint-wrapped INSERT
+        with self.assertNumQueries(15):
+            response = self.client.post("/api/appointments/bulk/", items, format="json")
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(len(response.data), 20)
+        self.assertEqual(response.data[0]["doctorName"], "Doc Number1")
+        self.assertEqual(Appointment.objects.count(), 20)
+
+    def test_bulk_create_reports_every_bad_item(self):
+        self.client.post("/api/appointments/", self.appointment(0), format="json")
+        items = [
+            self.appointment(0),                      # clashes with the existing booking
+            self.appointment(1, patient=999),         # unknown patient
+            self.appointment(2),
+            self.appointment(2, status="scheduled"),  # clashes within the batch
+            self.appointment(3, doctor="x"),          # bad pk type
+        ]
+        response = self.client.post("/api/appointments/bulk/", items, format="json")
+        self.assertEqual(response.status_code, 400)
+        errors = {error["index"]: error["errors"] for error in response.data["errors"]}
+        self.assertEqual(sorted(errors), [0, 1, 3, 4])
+        self.assertIn("scheduled_at", errors[0])
+        self.assertIn("patient", errors[1])
+        self.assertIn("doctor", errors[4])
+        self.assertEqual(Appointment.objects.count(), 1)
+
+    def test_bulk_update_appointments(self):
+        ids = [self.client.post("/api/appointments/", self.appointment(n), format="json").data["id"] for n in range(3)]
+        response = self.client.patch("/api/appointments/bulk/", [
+            {"id": ids[0], "status": "confirmed"},
+            {"id": ids[1], "reason": "Follow-up", "duration_minutes": 30},
+        ], format="json")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(Appointment.objects.get(id=ids[0]).status, "confirmed")
+        self.assertEqual(Appointment.objects.get(id=ids[1]).reason, "Follow-up")
+
+        response = self.client.patch("/api/appointments/bulk/", [{"id": ids[0], "duration_minutes": 60}], format="json")
+        self.assertEqual(response.status_code, 400)
+        response = self.client.patch("/api/appointments/bulk/", [{"id": 999, "status": "confirmed"}], format="json")
+        self.assertEqual(response.data["errors"][0]["index"], 0)
+
+    def test_bulk_inventory_unique_sku(self):
+        InventoryItem.objects.create(sku="M001", name="Paracetamol")
+        response = self.client.post("/api/inventory/bulk/", [
+            {"sku": "M001", "name": "Duplicate of existing"},
+            {"sku": "M002", "name": "Ibuprofen"},
+            {"sku": "M002", "name": "Duplicate in batch"},
+        ], format="json")
+        errors = {error["index"]: error["errors"] for error in response.data["errors"]}
+        self.assertEqual(sorted(errors), [0, 2])
+
+        response = self.client.post("/api/inventory/bulk/", [
+            {"sku": "M002", "name": "Ibuprofen", "stock": 10},
+            {"sku": "M003", "name": "Amoxicillin", "stock": 5},
+        ], format="json")
+        self.assertEqual(response.status_code, 201)
+
+        item = InventoryItem.objects.get(sku="M002")
+        before = item.updated_at
+        response = self.client.patch("/api/inventory/bulk/", [{"id": item.id, "min_stock": 20, "stock": 50}], format="json")
+        self.assertEqual(response.status_code, 200)
+        item.refresh_from_db()
+        self.assertEqual(item.min_stock, 20)
+        self.assertEqual(item.stock, 10)  # stock only changes through movements
+        self.assertGreater(item.updated_at, before)
+        self.assertEqual(StockMovement.objects.filter(item=item).get().quantity, 10)
+
+    def test_bulk_update_counts_from_the_stored_rows(self):
+        item = InventoryItem.objects.create(sku="M001", name="Paracetamol", stock=100, min_stock=10)
+        unique_errors = InventoryItemViewSet.unique_errors
+
+        def dispense_meanwhile(viewset, *args, **kwargs):
+            # lands between the unlocked read of the items and the write
+            apply_movement(item.id, "dispense", 85)
+            return unique_errors(viewset, *args, **kwargs)
+
+        with mock.patch.object(InventoryItemViewSet, "unique_errors", dispense_meanwhile):
+            response = self.client.patch("/api/inventory/bulk/", [{"id": item.id, "min_stock": 20}], format="json")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data[0]["stock"], 15)
+        self.assertEqual(stats.differences(), {})
+        self.assertEqual(stats.stored_counts()["inventory", "low_stock", None], 1)
+
+    def test_bulk_delete(self):
+        item = InventoryItem.objects.create(sku="M001", name="Paracetamol")
+        response = self.client.delete("/api/inventory/bulk/", {"ids": [item.id, 999]}, format="json")
+        self.assertEqual(response.data, {"deleted": [item.id], "not_found": [999]})
+        self.assertFalse(InventoryItem.objects.exists())
+
+    def test_rejects_non_list(self):
+        self.assertEqual(self.client.post("/api/inventory/bulk/", {"sku": "M1"}, format="json").status_code, 400)
+
+
+class StockMovementTests(APITestCase):
+    def setUp(self):
+        self.item = InventoryItem.objects.create(sku="M001", name="Paracetamol", stock=100, min_stock=10)
+        self.url = f"/api/inventory/{self.item.id}/movements/"
+
+    def test_dispense_receive_adjust(self):
+        self.assertEqual(self.client.post(self.url, {"kind": "dispense", "quantity": 30}).data["balance_after"], 70)
+        self.assertEqual(self.client.post(self.url, {"kind": "receive", "quantity": 50}).data["balance_after"], 120)
+        response = self.client.post(self.url, {"kind": "adjust", "quantity": -5, "reason": "Broken bottles"})
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data["quantity"], -5)
+        self.item.refresh_from_db()
+        self.assertEqual(self.item.stock, 115)
+
+        response = self.client.get(self.url)
+        self.assertEqual([row["kind"] for row in response.data["results"]], ["adjust", "receive", "dispense"])
+
+    def test_cannot_overdraw(self):
+        response = self.client.post(self.url, {"kind": "dispense", "quantity": 101})
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(self.client.post(self.url, {"kind": "adjust", "quantity": -101}).status_code, 400)
+        self.assertEqual(self.client.post(self.url, {"kind": "receive", "quantity": 0}).status_code, 400)
+        self.item.refresh_from_db()
+        self.assertEqual(self.item.stock, 100)
+        self.assertFalse(self.item.movements.exists())
+
+    def test_create_records_opening_stock_and_patch_keeps_balance(self):
+        response = self.client.post("/api/inventory/", {"sku": "M002", "name": "Ibuprofen", "stock": 40})
+        item_id = response.data["id"]
+        self.assertEqual(StockMovement.objects.get(item_id=item_id).balance_after, 40)
+
+        response = self.client.patch(f"/api/inventory/{item_id}/", {"stock": 0, "min_stock": 5})
+        self.assertEqual(response.data["stock"], 40)
+        self.assertEqual(response.data["min_stock"], 5)
+
+    def test_update_keeps_concurrent_movements(self):
+        serializer = InventoryItemSerializer(self.item, data={"min_stock": 20}, partial=True)
+        serializer.is_valid(raise_exception=True)
+        apply_movement(self.item.id, "dispense", 10)  # lands between the read and the save
+        serializer.save()
+        self.item.refresh_from_db()
+        self.assertEqual((self.item.stock, self.item.min_stock), (90, 20))
+
+    def test_update_counts_low_stock_from_current_stock(self):
+        serializer = InventoryItemSerializer(self.item, data={"min_stock": 20}, partial=True)
+        serializer.is_valid(raise_exception=True)
+        apply_movement(self.item.id, "dispense", 85)
+        serializer.save()
+        self.assertEqual(stats.differences(), {})
+        self.assertEqual(stats.stored_counts()["inventory", "low_stock", None], 1)
+
+
+class StockConcurrencyTests(TransactionTestCase):
+    threads = 8
+    dispenses_per_thread = 20
+
+    def test_concurrent_dispensing_loses_no_updates(self):
+        # more dispensing than stock: exactly `stock` units go out, the rest are refused
+        item = InventoryItem.objects.create(sku="M001", name="Paracetamol", stock=100)
+        refused = []
+        errors = []
+
+        def counter():
+            try:
+                for _ in range(self.dispenses_per_thread):
+                    try:
+                        apply_movement(item.id, "dispense", 1)
+                    except InsufficientStock:
+                        refused.append(1)
+            except Exception as exc:
+                errors.append(exc)
+            finally:
+                connection.close()
+
+        workers = [threading.Thread(target=counter) for _ in range(self.threads)]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+
+        self.assertEqual(errors, [])
+        item.refresh_from_db()
+        self.assertEqual(item.stock, 0)
+        self.assertEqual(len(refused), self.threads * self.dispenses_per_thread - 100)
+        movements = list(item.movements.order_by("id").values_list("quantity", "balance_after"))
+        self.assertEqual(len(movements), 100)
+        # every balance 99..0 was produced exactly once
+        self.assertEqual(sorted(balance for _, balance in movements), list(range(100)))
+
+
+class PatientSearchTests(APITestCase):
+    def setUp(self):
+        search.get_backend.cache_clear()
+        Patient.objects.create(first_name="Wanjiku", last_name="Kamau", phone="+254712345678", email="wanjiku@email.com")
+        Patient.objects.create(first_name="Kamau", last_name="Otieno", phone="0722000111")
+        Patient.objects.create(first_name="Achieng", last_name="Odhiambo", email="achieng.o@email.com")
+
+    def names(self, query):
+        response = self.client.get("/api/patients/search/", {"q": query})
+        self.assertEqual(response.status_code, 200)
+        return [row["name"] for row in response.data["results"]]
+
+    def test_uses_fts_index(self):
+        self.assertIsInstance(search.get_backend(), search.SQLiteFTSBackend)
+
+    def test_prefix_and_ranking(self):
+        # a first or last name match ranks above an email-only match
+        Patient.objects.create(first_name="Zawadi", last_name="Juma", email="kamande@email.com")
+        names = self.names("kam")
+        self.assertEqual(sorted(names[:2]), ["Kamau Otieno", "Wanjiku Kamau"])
+        self.assertEqual(names[2:], ["Zawadi Juma"])
+        self.assertEqual(self.names("wanj kam"), ["Wanjiku Kamau"])
+        self.assertEqual(self.names("achieng.o"), ["Achieng Odhiambo"])
+
+    def test_phone(self):
+        self.assertEqual(self.names("0712 345"), ["Wanjiku Kamau"])
+        self.assertEqual(self.names("254722"), [])
+        self.assertEqual(self.names("722000"), ["Kamau Otieno"])
+
+    def test_typo_tolerance(self):
+        self.assertEqual(self.names("wanjku"), ["Wanjiku Kamau"])
+        self.assertEqual(self.names("odhiamob"), ["Achieng Odhiambo"])
+        self.assertEqual(self.names("zzzz"), [])
+
+    def test_index_follows_saves_and_deletes(self):
+        patient = Patient.objects.get(first_name="Achieng")
+        patient.last_name = "Njoroge"
+        patient.save()
+        self.assertEqual(self.names("njoroge"), ["Achieng Njoroge"])
+        self.assertEqual(self.names("odhiambo"), [])
+        patient.delete()
+        self.assertEqual(self.names("achieng"), [])
+
+    def test_rebuild_and_fallback_backend(self):
+        Patient.objects.bulk_create([Patient(first_name="Baraka", last_name="Chege")])
+        self.assertEqual(self.names("baraka"), [])
+        call_command("rebuild_search_index", stdout=StringIO())
+        self.assertEqual(self.names("baraka"), ["Baraka Chege"])
+
+        with override_settings(PATIENT_SEARCH_BACKEND="hospital_api.search.DatabaseSearchBackend"):
+            search.get_backend.cache_clear()
+            self.assertEqual(sorted(self.names("kamau")), ["Kamau Otieno", "Wanjiku Kamau"])
+        search.get_backend.cache_clear()
+
+    def test_requires_query(self):
+        self.assertEqual(self.client.get("/api/patients/search/").status_code, 400)
+
+
+class DashboardStatsTests(APITestCase):
+    def setUp(self):
+        self.doctor = make_doctor(1)
+        self.patient = make_patient(1)
+        make_patient(2).delete()
+        Patient.objects.create(first_name="Old", last_name="Patient", status="inactive")
+        self.appointment = make_appointment(self.patient, self.doctor, 0)
+        make_appointment(self.patient, self.doctor, 1)
+        InventoryItem.objects.create(sku="M001", name="Paracetamol", stock=100, min_stock=10)
+
+    def assertInSync(self):
+        self.assertEqual(stats.differences(), {})
+
+    def test_counters_follow_saves_and_deletes(self):
+        self.assertInSync()
+        self.appointment.status = "completed"
+        self.appointment.save()
+        self.doctor.availability = "on_leave"
+        self.doctor.save(update_fields=["availability"])
+        self.patient.delete()  # cascades to both appointments
+        self.assertInSync()
+        self.assertEqual(stats.stored_counts(), {
+            ("patients", "inactive", None): 1,
+            ("doctors", "on_leave", None): 1,
+            ("inventory", "total", None): 1,
+        })
+
+    def test_stale_instance_is_counted_from_the_stored_row(self):
+        stale = Appointment.objects.get(pk=self.appointment.pk)
+        self.appointment.status = "completed"
+        self.appointment.save()
+        # a full save writes the status it was read with back over the completed one
+        stale.reason = "Rescheduled by phone"
+        stale.save()
+        self.assertEqual(Appointment.objects.get(pk=stale.pk).status, "scheduled")
+        self.assertInSync()
+
+        doctor = Doctor.objects.get()
+        doctor.phone = "0712345678"
+        with CaptureQueriesContext(connection) as queries:
+            doctor.save(update_fields=["phone"])
+        self.assertFalse([query for query in queries if query["sql"].startswith("SELECT")])
+
+    def test_counters_follow_bulk_writes_and_movements(self):
+        item = InventoryItem.objects.get()
+        apply_movement(item.id, "dispense", 95)
+        self.client.post("/api/inventory/bulk/", [{"sku": "M002", "name": "Ibuprofen", "min_stock": 5}], format="json")
+        self.client.patch("/api/appointments/bulk/", [{"id": self.appointment.id, "status": "cancelled"}], format="json")
+        self.assertInSync()
+        self.assertEqual(stats.stored_counts()["inventory", "low_stock", None], 2)
+
+    def test_dashboard_endpoint(self):
+        day = timezone.localdate(self.appointment.scheduled_at)
+        with self.assertNumQueries(2):
+            response = self.client.get("/api/dashboard/", {"from": day.isoformat(), "to": (day + timedelta(days=1)).isoformat()})
+        self.assertEqual(response.data["patients"], {"total": 2, "by_status": {"active": 1, "inactive": 1}})
+        self.assertEqual(response.data["doctors"]["by_availability"], {"available": 1})
+        self.assertEqual(response.data["inventory"], {"total": 1, "low_stock": 0})
+        by_day = response.data["appointments"]["by_day"]
+        self.assertEqual(by_day[0], {"day": day.isoformat(), "total": 2, "by_status": {"scheduled": 2}})
+        self.assertEqual(by_day[1]["total"], 0)
+        self.assertEqual(self.client.get("/api/dashboard/", {"from": "2024-01-02", "to": "2024-01-01"}).status_code, 400)
+        self.assertEqual(self.client.get("/api/dashboard/", {"from": "2024-02-30"}).status_code, 400)
+
+    def test_rebuild_command(self):
+        StatCounter.objects.filter(metric="patients").delete()
+        StatCounter.objects.create(metric="doctors", key="unavailable", count=3)
+        with self.assertRaises(CommandError):
+            call_command("rebuild_stats", "--check", stdout=StringIO())
+        call_command("rebuild_stats", stdout=StringIO())
+        self.assertInSync()
+
+
+class FilteringTests(APITestCase):
+    def setUp(self):
+        self.doctors = [make_doctor(n) for n in range(2)]
+        self.patients = [make_patient(n) for n in range(3)]
+        for n in range(6):
+            appointment = make_appointment(self.patients[n % 3], self.doctors[n % 2], n * 24)
+            if n % 3 == 0:
+                appointment.status = "completed"
+                appointment.save()
+
+    def ids(self, url, params):
+        response = self.client.get(url, params)
+        self.assertEqual(response.status_code, 200, response.data)
+        return [row["id"] for row in response.data["results"]]
+
+    def test_appointment_filters(self):
+        doctor = self.doctors[0].id
+        expected = list(Appointment.objects.filter(doctor=doctor).order_by("-scheduled_at").values_list("id", flat=True))
+        self.assertEqual(self.ids("/api/appointments/", {"doctor": doctor}), expected)
+
+        expected = set(Appointment.objects.exclude(status="completed").values_list("id", flat=True))
+        self.assertEqual(set(self.ids("/api/appointments/", {"status": "scheduled,confirmed"})), expected)
+
+        # date bounds are inclusive: 2024-01-02 and 2024-01-03 hold the second and third booking
+        ids = self.ids("/api/appointments/", {"scheduled_at_after": "2024-01-02", "scheduled_at_before": "2024-01-03"})
+        self.assertEqual(len(ids), 2)
+        # bookings 0 and 3 are completed, both with the first patient
+        ids = self.ids("/api/appointments/", {"patient": [self.patients[0].id, self.patients[1].id], "status": "completed"})
+        self.assertEqual(len(ids), 2)
+        self.assertEqual(self.ids("/api/appointments/", {"patient": self.patients[1].id, "status": "completed"}), [])
+
+    def test_ordering_is_whitelisted_and_paginates(self):
+        response = self.client.get("/api/appointments/", {"ordering": "scheduled_at", "page_size": 4})
+        first = [row["scheduled_at"] for row in response.data["results"]]
+        self.assertEqual(first, sorted(first))
+        rest = [row["scheduled_at"] for row in self.client.get(response.data["next"]).data["results"]]
+        self.assertEqual(len(first + rest), 6)
+        self.assertLess(first[-1], rest[0])
+
+        self.assertEqual(self.client.get("/api/appointments/", {"ordering": "reason"}).status_code, 400)
+        response = self.client.get("/api/patients/", {"ordering": "-last_name"})
+        self.assertEqual([row["last_name"] for row in response.data["results"]], ["Number2", "Number1", "Number0"])
+
+    def test_invalid_values_are_rejected(self):
+        self.assertEqual(self.client.get("/api/appointments/", {"doctor": "abc"}).status_code, 400)
+        self.assertEqual(self.client.get("/api/appointments/", {"scheduled_at_after": "soon"}).status_code, 400)
+        self.assertEqual(self.client.get("/api/appointments/", {"scheduled_at_after": "2024-02-30"}).status_code, 400)
+        self.assertEqual(self.client.get("/api/patients/", {"created_at_before": "2024-02-30T10:00"}).status_code, 400)
+        self.assertEqual(self.client.get("/api/inventory/", {"expiry_date_after": "2024-02-30"}).status_code, 400)
+
+    def test_other_viewsets(self):
+        self.doctors[1].availability = "on_leave"
+        self.doctors[1].save()
+        self.assertEqual(self.ids("/api/doctors/", {"availability": "on_leave"}), [self.doctors[1].id])
+        self.assertEqual(len(self.ids("/api/patients/", {"status": "active"})), 3)
+
+        InventoryItem.objects.create(sku="M001", name="Paracetamol", category="Analgesic", expiry_date=date(2025, 1, 1))
+        InventoryItem.objects.create(sku="M002", name="Amoxicillin", category="Antibiotic", expiry_date=date(2026, 1, 1))
+        self.assertEqual(len(self.ids("/api/inventory/", {"category": "Antibiotic,Analgesic"})), 2)
+        self.assertEqual(len(self.ids("/api/inventory/", {"expiry_date_before": "2025-06-30"})), 1)
+
+        record = MedicalRecord.objects.create(patient=self.patients[0], notes="Checkup")
+        MedicalRecord.objects.create(patient=self.patients[1], notes="Checkup")
+        self.assertEqual(self.ids("/api/records/", {"patient": self.patients[0].id}), [record.id])
+
+    def test_filters_apply_to_exports(self):
+        response = self.client.get("/api/appointments/export/", {"status": "completed"})
+        lines = b"".join(response.streaming_content).splitlines()
+        self.assertEqual(len(lines), 2)
+
+
+class LoadTestWritesCommandTests(TransactionTestCase):
+    def test_concurrent_writers_without_lock_errors(self):
+        out = StringIO()
+        call_command("loadtest_writes", threads=4, seconds=0.5, stdout=out)
+        report = json.loads(out.getvalue())
+        self.assertEqual(report["errors"], {})
+        self.assertGreater(report["operations"], 0)
+        self.assertEqual(report["config"]["transaction_mode"], "IMMEDIATE")
+        # everything it created is cleaned up, counters included
+        self.assertFalse(Patient.objects.exists())
+        self.assertFalse(InventoryItem.objects.exists())
+        self.assertEqual(stats.differences(), {})
+
+
+class AsyncReadViewTests(TestCase):
+    def setUp(self):
+        seed_rows(3)
+
+    async def assertSameAsSync(self, path, params=None):
+        sync = await sync_to_async(self.client.get)(f"/api/{path}", params)
+        response = await self.async_client.get(f"/api/async/{path}", params)
+        self.assertEqual(response.status_code, sync.status_code)
+        expected = json.loads(sync.content)
+        if isinstance(expected, dict):
+            # pagination links point at the path that was requested
+            for link in ["next", "previous"]:
+                if expected.get(link):
+                    expected[link] = expected[link].replace("/api/", "/api/async/")
+        self.assertEqual(json.loads(response.content), expected)
+        return response
+
+    async def test_lists_match_sync_endpoints(self):
+        await self.assertSameAsSync("patients/")
+        await self.assertSameAsSync("appointments/", {"status": "scheduled", "ordering": "scheduled_at"})
+        await self.assertSameAsSync("inventory/", {"page_size": 2})
+        await self.assertSameAsSync("patients/", {"fields": "id,name", "ordering": "last_name"})
+
+    async def test_cursor_pages(self):
+        first = json.loads((await self.assertSameAsSync("patients/", {"page_size": 2})).content)
+        second = json.loads((await self.async_client.get(first["next"])).content)
+        ids = [row["id"] for row in first["results"] + second["results"]]
+        expected = await sync_to_async(list)(Patient.objects.order_by("-created_at", "-id").values_list("id", flat=True))
+        self.assertEqual(ids, expected)
+        # a reversed cursor
+        previous = json.loads((await self.async_client.get(second["previous"])).content)
+        self.assertEqual(previous["results"], first["results"])
+
+    async def test_retrieve(self):
+        appointment = await Appointment.objects.afirst()
+        await self.assertSameAsSync(f"appointments/{appointment.pk}/")
+        response = await self.async_client.get("/api/async/inventory/999/")
+        self.assertEqual(response.status_code, 404)
+
+    async def test_bad_filter(self):
+        response = await self.async_client.get("/api/async/appointments/", {"doctor": "x"})
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("doctor", json.loads(response.content))
+
+    async def test_viewset_permissions_apply(self):
+        class DenyAll(BasePermission):
+            def has_permission(self, request, view):
+                return False
+
+        class DenyObjects(BasePermission):
+            def has_object_permission(self, request, view, obj):
+                return False
+
+        inventory = await InventoryItem.objects.afirst()
+        for permission, path, kwargs in [
+            (DenyAll, "/api/async/inventory/", {}),
+            (DenyAll, f"/api/async/inventory/{inventory.pk}/", {"pk": inventory.pk}),
+            (DenyObjects, f"/api/async/inventory/{inventory.pk}/", {"pk": inventory.pk}),
+        ]:
+            viewset = type("DeniedViewSet", (InventoryItemViewSet,), {"permission_classes": [permission]})
+            response = await AsyncReadView.as_view(viewset=viewset)(AsyncRequestFactory().get(path), **kwargs)
+            self.assertEqual(response.status_code, 403, path)
+
+    @override_settings(REQUEST_METRICS_ENABLED=True)
+    async def test_metrics_middleware_runs_async(self):
+        response = await self.async_client.get("/api/async/patients/")
+        self.assertEqual(response["X-Query-Count"], "1")
+
+
+class BenchmarkAsgiCommandTests(TransactionTestCase):
+    def test_reports_every_mode(self):
+        seed_rows(2)
+        out = StringIO()
+        call_command("benchmark_asgi", requests=24, concurrency=8, threads=4, stdout=out)
+        report = json.loads(out.getvalue())
+        self.assertEqual(set(report["modes"]), {"wsgi", "asgi_sync", "asgi_async"})
+        for mode in report["modes"].values():
+            self.assertEqual(mode["errors"], 0)
+            self.assertEqual(mode["requests"], 24)
+
+
+class PatientTimelineTests(APITestCase):
+    def setUp(self):
+        self.doctor = make_doctor(0)
+        self.patient = make_patient(0)
+        other = make_patient(1)
+        start = timezone.make_aware(datetime(2024, 1, 1, 9, 0))
+        for n in range(5):
+            Appointment.objects.create(patient=self.patient, doctor=self.doctor, scheduled_at=start + timedelta(days=2 * n))
+            record = MedicalRecord.objects.create(patient=self.patient, notes=f"Visit {n}", created_by=self.doctor.user)
+            MedicalRecord.objects.filter(pk=record.pk).update(created_at=start + timedelta(days=2 * n + 1))
+        # same timestamp as an appointment, ties are still ordered
+        record = MedicalRecord.objects.create(patient=self.patient, notes="Same time", created_by=None)
+        MedicalRecord.objects.filter(pk=record.pk).update(created_at=start)
+        Appointment.objects.create(patient=other, doctor=self.doctor, scheduled_at=start)
+        MedicalRecord.objects.create(patient=other, notes="Someone else")
+
+    def test_merged_newest_first_in_two_queries(self):
+        with self.assertNumQueries(2):
+            response = self.client.get(f"/api/patients/{self.patient.pk}/timeline/")
+        self.assertEqual(response.status_code, 200)
+        results = response.data["results"]
+        self.assertEqual(len(results), 11)
+        self.assertIsNone(response.data["next"])
+        self.assertEqual([row["at"] for row in results], sorted((row["at"] for row in results), reverse=True))
+        self.assertEqual(results[0]["type"], "record")
+        self.assertEqual(results[0]["data"]["preview"], "Visit 4")
+        self.assertEqual(results[0]["data"]["created_by"]["username"], "doctor0")
+        self.assertEqual(results[1]["data"]["patientName"], "Pat Number0")
+
+        record = MedicalRecord.objects.select_related("created_by").get(preview="Visit 4")
+        self.assertEqual(JSONRenderer().render(results[0]["data"]), JSONRenderer().render(MedicalRecordSerializer(record).data))
+
+    def test_pages_cover_every_entry_once(self):
+        everything = self.client.get(f"/api/patients/{self.patient.pk}/timeline/").data["results"]
+        url, paged = f"/api/patients/{self.patient.pk}/timeline/?page_size=3", []
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            self.assertLessEqual(len(response.data["results"]), 3)
+            paged.extend(response.data["results"])
+            url = response.data["next"]
+        self.assertEqual(paged, everything)
+
+    def test_missing_patient_and_bad_cursor(self):
+        self.assertEqual(self.client.get("/api/patients/999/timeline/").status_code, 404)
+        empty = make_patient(2)
+        response = self.client.get(f"/api/patients/{empty.pk}/timeline/")
+        self.assertEqual(response.data, {"next": None, "results": []})
+        response = self.client.get(f"/api/patients/{self.patient.pk}/timeline/?cursor=nonsense")
+        self.assertEqual(response.status_code, 404)
+
+
+class AppointmentTransitionTests(APITestCase):
+    def setUp(self):
+        self.now = timezone.now().replace(microsecond=0)
+        self.doctor = make_doctor(0)
+        self.patient = make_patient(0)
+        self.other = make_patient(1)
+
+    def book(self, patient, hours_ago, status="confirmed", duration=30):
+        return Appointment.objects.create(
+            patient=patient, doctor=self.doctor, status=status, duration_minutes=duration,
+            scheduled_at=self.now - timedelta(hours=hours_ago),
+        )
+
+    def test_transitions_and_visit_counts(self):
+        visited = self.book(self.patient, 48)
+        latest = self.book(self.patient, 2)
+        missed = self.book(self.other, 3, status="scheduled")
+        running = self.book(self.other, 1, duration=120)
+        future = self.book(self.other, -5)
+        cancelled = self.book(self.other, 5, status="cancelled")
+
+        report = jobs.transition_past_appointments(now=self.now, batch_size=2)
+        self.assertEqual(report["transitioned"], {"completed": 2, "no_show": 1})
+        statuses = dict(Appointment.objects.values_list("id", "status"))
+        self.assertEqual(statuses[visited.pk], "completed")
+        self.assertEqual(statuses[latest.pk], "completed")
+        self.assertEqual(statuses[missed.pk], "no_show")
+        self.assertEqual(statuses[running.pk], "confirmed")
+        self.assertEqual(statuses[future.pk], "confirmed")
+        self.assertEqual(statuses[cancelled.pk], "cancelled")
+
+        self.patient.refresh_from_db()
+        self.other.refresh_from_db()
+        self.doctor.refresh_from_db()
+        self.assertEqual(self.patient.last_visit, timezone.localdate(latest.scheduled_at))
+        self.assertIsNone(self.other.last_visit)
+        # two visits by the same patient count once
+        self.assertEqual(self.doctor.patients, 1)
+        self.assertEqual(stats.differences(), {})
+
+        # the appointment that was running completes on a later run
+        report = jobs.transition_past_appointments(now=self.now + timedelta(hours=2))
+        self.assertEqual(report["transitioned"], {"completed": 1})
+        self.doctor.refresh_from_db()
+        self.assertEqual(self.doctor.patients, 2)
+        self.assertEqual(jobs.transition_past_appointments(now=self.now + timedelta(hours=2))["transitioned"], {})
+
+    def test_incremental_matches_rebuild(self):
+        for n in range(6):
+            self.book(self.patient if n % 2 else self.other, 24 * n + 1)
+        jobs.transition_past_appointments(now=self.now)
+        incremental = (
+            list(Doctor.objects.values_list("id", "patients")),
+            list(Patient.objects.order_by("id").values_list("id", "last_visit")),
+        )
+        Doctor.objects.update(patients=99)
+        jobs.rebuild_visit_counts()
+        rebuilt = (
+            list(Doctor.objects.values_list("id", "patients")),
+            list(Patient.objects.order_by("id").values_list("id", "last_visit")),
+        )
+        self.assertEqual(incremental, rebuilt)
+
+    def test_api_writes_match_rebuild(self):
+        def assertMatchesRebuild():
+            counts = (
+                list(Doctor.objects.order_by("id").values_list("id", "patients")),
+                list(Patient.objects.order_by("id").values_list("id", "last_visit")),
+            )
+            jobs.rebuild_visit_counts()
+            self.assertEqual(counts, (
+                list(Doctor.objects.order_by("id").values_list("id", "patients")),
+                list(Patient.objects.order_by("id").values_list("id", "last_visit")),
+            ))
+
+        other_doctor = make_doctor(1)
+        first, second = self.book(self.patient, 48), self.book(self.other, 24)
+        response = self.client.patch(f"/api/appointments/{first.pk}/", {"status": "completed"}, format="json")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(Doctor.objects.get(pk=self.doctor.pk).patients, 1)
+        assertMatchesRebuild()
+        response = self.client.patch(f"/api/appointments/{first.pk}/", {"doctor": other_doctor.pk}, format="json")
+        self.assertEqual(response.status_code, 200)
+        assertMatchesRebuild()
+        response = self.client.patch("/api/appointments/bulk/", [
+            {"id": first.pk, "status": "confirmed"}, {"id": second.pk, "status": "completed"},
+        ], format="json")
+        self.assertEqual(response.status_code, 200)
+        assertMatchesRebuild()
+        self.client.post("/api/appointments/bulk/", [{
+            "patient": self.patient.pk, "doctor": self.doctor.pk, "status": "completed",
+            "scheduled_at": (self.now - timedelta(hours=5)).isoformat(),
+        }], format="json")
+        self.assertEqual(Doctor.objects.get(pk=self.doctor.pk).patients, 2)
+        assertMatchesRebuild()
+        self.client.delete(f"/api/appointments/{second.pk}/")
+        self.assertEqual(Doctor.objects.get(pk=self.doctor.pk).patients, 1)
+        assertMatchesRebuild()
+
+    def test_backdated_visit_keeps_the_later_last_visit(self):
+        today = timezone.localdate(self.now)
+        Patient.objects.filter(pk=self.patient.pk).update(last_visit=today)
+        response = self.client.post("/api/appointments/", {
+            "patient": self.patient.pk, "doctor": self.doctor.pk, "status": "completed",
+            "scheduled_at": (self.now - timedelta(days=400)).isoformat(),
+        }, format="json")
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(Patient.objects.get(pk=self.patient.pk).last_visit, today)
+        self.assertEqual(Doctor.objects.get(pk=self.doctor.pk).patients, 1)
+
+    def test_command_reports_throughput(self):
+        self.book(self.patient, 2)
+        out = StringIO()
+        call_command("run_jobs", once=True, stdout=out)
+        reports = {report["job"]: report for report in map(json.loads, out.getvalue().splitlines())}
+        report = reports["appointment_transitions"]
+        self.assertEqual(report["transitioned"], {"completed": 1})
+        self.assertIn("rows_per_second", report)
+        # the daily forecast only runs from its own cron entry
+        self.assertNotIn("inventory_forecast", reports)
+        out = StringIO()
+        call_command("run_jobs", once=True, job=["inventory_forecast"], stdout=out)
+        self.assertEqual([json.loads(line)["job"] for line in out.getvalue().splitlines()], ["inventory_forecast"])
+
+
+class SparseFieldsetTests(APITestCase):
+    def setUp(self):
+        seed_rows(4)
+
+    def get(self, url, expected_queries=1):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200, response.content)
+        self.assertEqual(len(queries), expected_queries)
+        return response, queries[0]["sql"]
+
+    def test_list_fields(self):
+        response, sql = self.get("/api/patients/?fields=id,name,status")
+        self.assertEqual(list(response.data["results"][0]), ["id", "name", "status"])
+        self.assertNotIn("address", sql)
+        self.assertNotIn("blood_type", sql)
+
+    def test_list_exclude(self):
+        response, sql = self.get("/api/inventory/?exclude=uses,needs_reorder")
+        row = response.data["results"][0]
+        self.assertNotIn("uses", row)
+        self.assertNotIn("needs_reorder", row)
+        self.assertIn("stock", row)
+        self.assertNotIn('"uses"', sql)
+
+    def test_retrieve_fields(self):
+        appointment = Appointment.objects.get(patient__last_name="Number0")
+        response, sql = self.get(f"/api/appointments/{appointment.pk}/?fields=id,patientName,time")
+        self.assertEqual(response.data, {
+            "id": appointment.pk,
+            "patientName": "Pat Number0",
+            "time": appointment.scheduled_at.time().strftime("%I:%M %p"),
+        })
+        # only the patient is joined, not the doctor
+        self.assertNotIn("auth_user", sql)
+        self.assertNotIn('"reason"', sql)
+
+    def test_models_without_fast_serializer(self):
+        response, sql = self.get("/api/doctors/?fields=name")
+        self.assertEqual(set(response.data["results"][0]), {"name"})
+        self.assertNotIn("specialization", sql)
+        response, _ = self.get("/api/records/?fields=created_by")
+        self.assertEqual(set(response.data["results"][0]["created_by"]), {"id", "username", "first_name", "last_name", "email"})
+
+    def test_cursor_still_works_without_ordering_column(self):
+        ids = []
+        url = "/api/patients/?fields=id&ordering=last_name&page_size=3"
+        while url:
+            response = self.client.get(url)
+            ids.extend(row["id"] for row in response.data["results"])
+            url = response.data["next"]
+        self.assertEqual(ids, list(Patient.objects.order_by("last_name", "first_name", "id").values_list("id", flat=True)))
+
+    def test_export_fields(self):
+        response = self.client.get("/api/patients/export/?fields=id,name")
+        lines = b"".join(response.streaming_content).decode().splitlines()
+        self.assertEqual(list(json.loads(lines[0])), ["id", "name"])
+
+    def test_invalid_fields(self):
+        response = self.client.get("/api/patients/?fields=id,nope")
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("fields", response.data)
+        response = self.client.get("/api/departments/?exclude=id,name,location")
+        self.assertEqual(response.status_code, 400)
+
+    def test_writes_ignore_fields(self):
+        response = self.client.post(
+            "/api/patients/?fields=id", {"first_name": "New", "last_name": "Patient", "dob": "1990-01-01"}, format="json"
+        )
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data["first_name"], "New")
+
+
+class RendererTests(APITestCase):
+    def test_orjson_matches_drf_json(self):
+        seed_rows(3)
+        data = {
+            "patients": self.client.get("/api/patients/").data,
+            "doctor": self.client.get(f"/api/doctors/{Doctor.objects.first().pk}/").data,
+            "raw": {
+                "when": timezone.make_aware(datetime(2024, 1, 2, 3, 4, 5, 678901)),
+                "day": date(2024, 1, 2),
+                "amount": Decimal("12.50"),
+                "text": "Ünïcode \u2028 \u2029",
+                "nothing": None,
+                "big": 2 ** 70,
+            },
+        }
+        self.assertEqual(ORJSONRenderer().render(data), JSONRenderer().render(data))
+        del data["raw"]["big"]
+        self.assertEqual(ORJSONRenderer().render(data), JSONRenderer().render(data))
+        indented = ORJSONRenderer().render(data, "application/json; indent=4")
+        self.assertEqual(indented, JSONRenderer().render(data, "application/json; indent=4"))
+
+    def test_json_is_the_default(self):
+        response = self.client.get("/api/patients/", HTTP_ACCEPT="*/*")
+        self.assertEqual(response["Content-Type"], "application/json")
+
+    @skipUnless(msgpack, "msgpack is not installed")
+    def test_msgpack(self):
+        seed_rows(2)
+        response = self.client.get("/api/patients/", HTTP_ACCEPT="application/msgpack")
+        self.assertEqual(response["Content-Type"], "application/msgpack")
+        self.assertEqual(msgpack.unpackb(response.content), json.loads(self.client.get("/api/patients/").content))
+
+
+@override_settings(RESPONSE_COMPRESSION_MIN_BYTES=500)
+class CompressionTests(APITestCase):
+    def setUp(self):
+        seed_rows(10)
+
+    def test_large_responses_are_gzipped(self):
+        plain = self.client.get("/api/patients/")
+        response = self.client.get("/api/patients/", HTTP_ACCEPT_ENCODING="gzip, deflate")
+        self.assertEqual(response["Content-Encoding"], "gzip")
+        self.assertIn("Accept-Encoding", response["Vary"])
+        self.assertEqual(gzip.decompress(response.content), plain.content)
+        self.assertLess(len(response.content), len(plain.content))
+        self.assertNotIn("Content-Encoding", plain)
+
+    def test_small_responses_are_not(self):
+        response = self.client.get("/api/patients/?page_size=1&fields=id", HTTP_ACCEPT_ENCODING="gzip")
+        self.assertNotIn("Content-Encoding", response)
+
+    def test_refused_encoding(self):
+        response = self.client.get("/api/patients/", HTTP_ACCEPT_ENCODING="gzip;q=0, identity")
+        self.assertNotIn("Content-Encoding", response)
+
+    @skipUnless(brotli, "brotli is not installed")
+    def test_brotli_preferred(self):
+        response = self.client.get("/api/patients/", HTTP_ACCEPT_ENCODING="gzip, br")
+        self.assertEqual(response["Content-Encoding"], "br")
+        self.assertEqual(brotli.decompress(response.content), self.client.get("/api/patients/").content)
+
+    def test_streaming_export(self):
+        response = self.client.get("/api/patients/export/", HTTP_ACCEPT_ENCODING="gzip")
+        self.assertEqual(response["Content-Encoding"], "gzip")
+        lines = gzip.decompress(b"".join(response.streaming_content)).decode().splitlines()
+        self.assertEqual(len(lines), 10)
+
+
+class BenchmarkRenderersCommandTests(TestCase):
+    def test_reports_every_encoder(self):
+        out = StringIO()
+        call_command("benchmark_renderers", rows=20, iterations=1, stdout=out, stderr=StringIO())
+        report = json.loads(out.getvalue())
+        for results in report["lists"].values():
+            self.assertEqual(results["drf_json"]["bytes"], results["orjson"]["bytes"])
+            self.assertLess(results["orjson"]["gzip"]["bytes"], results["orjson"]["bytes"])
+        # the seeded rows are rolled back
+        self.assertFalse(Patient.objects.exists())
+
+
+class NoteStorageTests(APITestCase):
+    def setUp(self):
+        seed_rows(1)
+        self.patient = Patient.objects.first()
+        # over two chunks, with multi-byte characters on both sides of the chunk boundaries
+        self.long_note = "Présentation: " + "Écho cardiaque normale, suivi à 6 mois. " * 4000
+
+    def test_long_note_round_trip(self):
+        record = MedicalRecord.objects.create(patient=self.patient, notes=self.long_note)
+        self.assertEqual(record.note_chunks.count(), 3)
+        record = MedicalRecord.objects.get(pk=record.pk)
+        self.assertEqual(record.notes, self.long_note)
+        self.assertEqual(record.notes_size, len(self.long_note))
+        self.assertTrue(record.preview.startswith("Présentation: Écho"))
+        self.assertTrue(record.preview.endswith("…"))
+        self.assertLessEqual(len(record.preview), 200)
+
+    def test_list_reads_only_the_preview(self):
+        MedicalRecord.objects.create(patient=self.patient, notes=self.long_note)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get("/api/records/")
+        row = next(row for row in response.data["results"] if row["notes_size"] == len(self.long_note))
+        self.assertNotIn("notes", row)
+        self.assertTrue(row["preview"].startswith("Présentation"))
+        self.assertFalse(any("medicalrecordnotechunk" in query["sql"] for query in queries))
+
+    def test_streamed_note(self):
+        record = MedicalRecord.objects.create(patient=self.patient, notes=self.long_note)
+        response = self.client.get(f"/api/records/{record.pk}/notes/")
+        self.assertEqual(response["Content-Type"], "text/plain; charset=utf-8")
+        self.assertEqual(b"".join(response.streaming_content).decode(), self.long_note)
+
+    @mock.patch("hospital_api.notes.NOTE_CHUNK_CHARS", 1000)
+    def test_stream_is_not_mixed_with_a_replacement(self):
+        record = MedicalRecord.objects.create(patient=self.patient, notes=self.long_note)
+        stream = record.iter_notes()
+        first = next(stream)
+        replaced = MedicalRecord.objects.get(pk=record.pk)
+        replaced.notes = "Replaced " * 20000
+        replaced.save()
+        self.assertEqual(first + "".join(stream), self.long_note)
+
+    def test_create_and_replace_through_the_api(self):
+        response = self.client.post(
+            "/api/records/", {"patient": self.patient.pk, "notes": self.long_note}, format="json"
+        )
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data["notes_size"], len(self.long_note))
+        self.assertNotIn("notes", response.data)
+        record = MedicalRecord.objects.get(pk=response.data["id"])
+
+        response = self.client.patch(f"/api/records/{record.pk}/", {"notes": "Short follow-up"}, format="json")
+        self.assertEqual(response.data["preview"], "Short follow-up")
+        self.assertEqual(record.note_chunks.count(), 1)
+        self.assertEqual(MedicalRecord.objects.get(pk=record.pk).notes, "Short follow-up")
+
+    def test_admin_edits_the_full_note(self):
+        self.client.force_login(User.objects.create_superuser("admin", "admin@example.com", "pass"))
+        response = self.client.post("/admin/hospital_api/medicalrecord/add/", {"patient": self.patient.pk, "notes": self.long_note})
+        self.assertEqual(response.status_code, 302)
+        record = MedicalRecord.objects.get(notes_size=len(self.long_note))
+        self.assertEqual(record.notes, self.long_note)
+
+        url = f"/admin/hospital_api/medicalrecord/{record.pk}/change/"
+        response = self.client.get(url)
+        self.assertEqual(response.context["adminform"].form["notes"].value(), self.long_note)
+        self.assertNotIn("preview", response.context["adminform"].form.fields)
+        self.client.post(url, {"patient": self.patient.pk, "notes": "Short follow-up"})
+        record = MedicalRecord.objects.get(pk=record.pk)
+        self.assertEqual((record.notes, record.preview, record.notes_size), ("Short follow-up", "Short follow-up", 15))
+        self.assertEqual(record.note_chunks.count(), 1)
+
+    def test_chunks_are_deleted_with_the_record(self):
+        record = MedicalRecord.objects.create(patient=self.patient, notes=self.long_note)
+        pk = record.pk
+        record.delete()
+        self.assertFalse(MedicalRecordNoteChunk.objects.filter(record_id=pk).exists())
+
+
+class InventoryForecastTests(APITestCase):
+    def setUp(self):
+        self.now = timezone.now()
+        today = timezone.localdate(self.now)
+        # sku: (stock, min_stock, days until expiry, days since created, units dispensed in the window)
+        self.items = {}
+        for sku, (stock, min_stock, expires_in, age, dispensed) in {
+            "STEADY": (100, 10, None, 200, 90),  # 1/day, 100 days left
+            "LOW": (20, 10, None, 200, 180),  # 2/day, below the 24 needed over the lead time
+            "EXPIRING": (50, 15, 20, 200, 90),  # 1/day, only 20 used before expiry
+            "UNUSED": (5, 0, 10, 200, 0),  # lasts until it expires, nothing to order
+            "DORMANT": (100, 10, 365, 200, 0),  # not reordered however little is used
+            "EXPIRED": (8, 0, -1, 200, 0),
+            "SPARE": (3, 5, None, 200, 0),
+            "NEW": (100, 0, None, 30, 60),  # 2/day over the 30 days it has existed
+        }.items():
+            item = InventoryItem.objects.create(
+                sku=sku, name=sku.title(), category="Test", stock=stock, min_stock=min_stock,
+                expiry_date=today + timedelta(days=expires_in) if expires_in is not None else None,
+            )
+            InventoryItem.objects.filter(pk=item.pk).update(created_at=self.now - timedelta(days=age))
+            if dispensed:
+                self.dispense(item, dispensed, days_ago=5)
+            self.items[sku] = item
+        # outside the 90 day window
+        self.dispense(self.items["STEADY"], 1000, days_ago=120)
+
+    def dispense(self, item, quantity, days_ago):
+        movement = StockMovement.objects.create(item=item, kind="dispense", quantity=-quantity, balance_after=item.stock)
+        StockMovement.objects.filter(pk=movement.pk).update(created_at=self.now - timedelta(days=days_ago))
+
+    def forecasts(self):
+        forecast.refresh_forecasts(now=self.now)
+        return {row.item.sku: row for row in InventoryForecast.objects.select_related("item")}
+
+    def test_forecast(self):
+        rows = self.forecasts()
+        expected = {
+            # burn_rate, usable_stock, expiring_quantity, days_of_stock, reorder_point, order_quantity
+            "STEADY": (1.0, 100, 0, 100.0, 17, 0),
+            "LOW": (2.0, 20, 0, 10.0, 24, 64),
+            "EXPIRING": (1.0, 20, 30, 20.0, 22, 32),
+            "UNUSED": (0.0, 5, 0, 10.0, 0, 0),
+            "DORMANT": (0.0, 100, 0, 365.0, 10, 0),
+            "EXPIRED": (0.0, 0, 8, 0.0, 0, 0),
+            "SPARE": (0.0, 3, 0, float(forecast.HORIZON_DAYS), 5, 0),
+            "NEW": (2.0, 100, 0, 50.0, 14, 0),
+        }
+        for sku, values in expected.items():
+            row = rows[sku]
+            self.assertEqual(
+                (row.burn_rate, row.usable_stock, row.expiring_quantity, row.days_of_stock, row.reorder_point, row.order_quantity),
+                values,
+                sku,
+            )
+            self.assertEqual(row.needs_reorder, row.order_quantity > 0)
+
+    def test_rerun_replaces_the_forecast(self):
+        self.forecasts()
+        apply_movement(self.items["LOW"].pk, "receive", 100)
+        self.assertFalse(self.forecasts()["LOW"].needs_reorder)
+        self.assertEqual(InventoryForecast.objects.count(), len(self.items))
+
+    @skipUnless(forecast.numpy, "numpy is not installed")
+    def test_numpy_matches_python(self):
+        columns = forecast.load_columns(self.now, forecast.HISTORY_DAYS)
+        self.assertEqual(
+            forecast.forecast_numpy(columns, forecast.LEAD_TIME_DAYS, forecast.COVER_DAYS),
+            forecast.forecast_python(columns, forecast.LEAD_TIME_DAYS, forecast.COVER_DAYS),
+        )
+
+    def test_reorder_endpoint(self):
+        self.assertEqual(self.client.get("/api/inventory/reorder/").data["results"], [])
+        forecast.refresh_forecasts(now=self.now)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get("/api/inventory/reorder/")
+        self.assertEqual(len(queries), 1)
+        # soonest to run out first
+        self.assertEqual([row["sku"] for row in response.data["results"]], ["LOW", "EXPIRING"])
+        self.assertEqual(response.data["results"][1]["expiring_quantity"], 30)
+        self.assertEqual(response.data["results"][1]["order_quantity"], 32)
+        page = self.client.get("/api/inventory/reorder/?page_size=1")
+        self.assertEqual([row["sku"] for row in self.client.get(page.data["next"]).data["results"]], ["EXPIRING"])
+        self.assertEqual(self.client.get("/api/inventory/reorder/?sku=LOW").data["results"][0]["sku"], "LOW")
+
+    def test_command(self):
+        out = StringIO()
+        call_command("forecast_inventory", lead_time_days=0, stdout=out)
+        report = json.loads(out.getvalue())
+        self.assertEqual(report["items"], len(self.items))
+        self.assertEqual(InventoryForecast.objects.get(item=self.items["LOW"]).reorder_point, 10)
+
+
+class DoctorAnalyticsTests(APITestCase):
+    def setUp(self):
+        self.busy, self.quiet = make_doctor(1), make_doctor(2)
+        Doctor.objects.filter(pk=self.quiet.pk).update(specialization="Neurologist")
+        patients = [make_patient(n) for n in range(3)]
+        # 2024-01-01 is a Monday
+        for n in range(6):
+            make_appointment(patients[n % 3], self.busy, n)
+        make_appointment(patients[0], self.quiet, 0)
+        # outside the week
+        make_appointment(patients[0], self.quiet, 24 * 7)
+        first = self.busy.appointments.order_by("scheduled_at").first()
+        first.status = "cancelled"
+        first.save()
+        self.busy.appointments.filter(pk=first.pk + 1).get().delete()
+
+    def get(self, **params):
+        response = self.client.get("/api/doctors/analytics/", {"from": "2024-01-01", "to": "2024-01-07", **params})
+        self.assertEqual(response.status_code, 200, response.data)
+        return response.data
+
+    def test_busiest_first(self):
+        with self.assertNumQueries(2):
+            data = self.get()
+        self.assertEqual(data["workday_minutes"], 540)
+        busy, quiet = data["results"]
+        self.assertEqual(busy["doctor"], self.busy.pk)
+        self.assertEqual(busy["name"], "Doc Number1")
+        self.assertEqual(busy["appointments"], 5)
+        self.assertEqual(busy["by_status"], {"scheduled": 4, "cancelled": 1})
+        # the cancelled appointment was patient 0's, the deleted one patient 1's
+        self.assertEqual(busy["patients"], 3)
+        self.assertEqual(busy["booked_minutes"], 120)
+        self.assertEqual(busy["utilization"], round(120 / (540 * 7), 3))
+        self.assertEqual((quiet["appointments"], quiet["patients"]), (1, 1))
+
+    def test_matches_a_rebuild(self):
+        self.busy.appointments.update(duration_minutes=45)  # sends no signals
+        self.assertNotEqual(stats.differences(), {})
+        stats.rebuild()
+        self.assertEqual(stats.differences(), {})
+        self.assertEqual(self.get()["results"][0]["booked_minutes"], 4 * 45)
+
+    def test_transition_job_moves_the_rollup(self):
+        jobs.transition_past_appointments()
+        self.assertEqual(stats.differences(), {})
+        self.assertEqual(self.get()["results"][0]["by_status"], {"no_show": 4, "cancelled": 1})
+
+    def test_parameters(self):
+        self.assertEqual([row["doctor"] for row in self.get(ordering="appointments")["results"]], [self.quiet.pk, self.busy.pk])
+        self.assertEqual([row["doctor"] for row in self.get(limit=1)["results"]], [self.busy.pk])
+        self.assertEqual([row["doctor"] for row in self.get(specialization="Neurologist")["results"]], [self.quiet.pk])
+        self.assertEqual(self.get(**{"from": "2024-01-08", "to": "2024-01-08"})["results"][0]["appointments"], 1)
+        for params in [{"ordering": "rating"}, {"to": "2023-12-31"}, {"limit": "x"}, {"to": "2024-02-30"}, {"to": "2025-01-01"}]:
+            response = self.client.get("/api/doctors/analytics/", {"from": "2024-01-01", **params})
+            self.assertEqual(response.status_code, 400)
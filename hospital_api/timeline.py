@@ -0,0 +1,70 @@
+# timeline.py
+# A patient's appointments and medical records as one newest-first stream.
+import heapq
+from base64 import b64decode, b64encode
+from binascii import Error as BinasciiError
+
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+from rest_framework.exceptions import NotFound
+
+from .models import Appointment, MedicalRecord
+from .serializers import AppointmentListSerializer, MedicalRecordListSerializer
+
+# type -> (model, timestamp field, fast serializer). Entries are ordered by
+# (timestamp, type, id) descending; each source reads a (patient, timestamp) index.
+SOURCES = {
+    "appointment": (Appointment, "scheduled_at", AppointmentListSerializer),
+    "record": (MedicalRecord, "created_at", MedicalRecordListSerializer),
+}
+
+
+def encode_cursor(position):
+    at, kind, pk = position
+    return b64encode(f"{at.isoformat()}|{kind}|{pk}".encode()).decode()
+
+
+def decode_cursor(cursor):
+    try:
+        at, kind, pk = b64decode(cursor.encode(), validate=True).decode().split("|")
+        position = parse_datetime(at), kind, int(pk)
+    except (BinasciiError, UnicodeError, ValueError):
+        raise NotFound("Invalid cursor")
+    if position[0] is None or kind not in SOURCES:
+        raise NotFound("Invalid cursor")
+    return position
+
+
+def after(kind, field, position):
+    """Rows of source `kind` that come after `position` in the stream."""
+    at, cursor_kind, pk = position
+    if kind < cursor_kind:
+        return Q(**{f"{field}__lte": at})
+    if kind > cursor_kind:
+        return Q(**{f"{field}__lt": at})
+    return Q(**{f"{field}__lt": at}) | Q(**{field: at, "id__lt": pk})
+
+
+def patient_timeline(patient_id, limit, position=None):
+    """
+    One page of entries and the position to continue from (None on the last page).
+    Costs one query per source whatever the page: each reads at most `limit` + 1
+    rows past the cursor and the sorted results are merged in Python.
+    """
+    streams = []
+    for kind, (model, field, serializer_class) in SOURCES.items():
+        serializer = serializer_class()
+        queryset = model.objects.filter(patient_id=patient_id)
+        if position is not None:
+            queryset = queryset.filter(after(kind, field, position))
+        rows = serializer.get_queryset(queryset.order_by(f"-{field}", "-id"))[:limit + 1]
+        streams.append([((row[field], kind, row["id"]), serializer, row) for row in rows])
+
+    merged = list(heapq.merge(*streams, key=lambda entry: entry[0], reverse=True))
+    page = merged[:limit]
+    results = []
+    for (_, kind, _), serializer, row in page:
+        data = serializer.to_representation(row)
+        results.append({"type": kind, "at": data[SOURCES[kind][1]], "data": data})
+    following = page[-1][0] if len(merged) > limit else None
+    return results, following
@@ -1,6 +1,7 @@
 from rest_framework import routers
 from django.urls import path, include
-from .views import PatientViewSet, DoctorViewSet, AppointmentViewSet, DepartmentViewSet, MedicalRecordViewSet,InventoryItemViewSet
+from .async_views import AsyncReadView
+from .views import PatientViewSet, DoctorViewSet, AppointmentViewSet, DepartmentViewSet, MedicalRecordViewSet,InventoryItemViewSet, RequestMetricsView, DashboardView
 
 router = routers.DefaultRouter()
 router.register(r'patients', PatientViewSet)
@@ -11,6 +12,20 @@ router.register(r'records', MedicalRecordViewSet)
 router.register(r'inventory', InventoryItemViewSet, basename='inventory')
 
 
-urlpatterns = [
+# async list/retrieve of the busiest read endpoints, for ASGI deployments
+async_urlpatterns = []
+for prefix, viewset, name in [
+    ('patients', PatientViewSet, 'patient'),
+    ('appointments', AppointmentViewSet, 'appointment'),
+    ('inventory', InventoryItemViewSet, 'inventory'),
+]:
+    async_urlpatterns += [
+        path(f'async/{prefix}/', AsyncReadView.as_view(viewset=viewset), name=f'async-{name}-list'),
+        path(f'async/{prefix}/<int:pk>/', AsyncReadView.as_view(viewset=viewset), name=f'async-{name}-detail'),
+    ]
+
+urlpatterns = async_urlpatterns + [
+    path('metrics/', RequestMetricsView.as_view(), name='request-metrics'),
+    path('dashboard/', DashboardView.as_view(), name='dashboard'),
     path('', include(router.urls)),
 ]
\ No newline at end of file
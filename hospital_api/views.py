@@ -1,52 +1,496 @@
+from datetime import datetime, timedelta
+from functools import lru_cache
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.http import StreamingHttpResponse
 from django.shortcuts import render
+from django.db.models import Count, F, Q, Sum
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
 
 # Create your views here.
-from rest_framework import viewsets
+from rest_framework import status, viewsets
 from rest_framework.decorators import action
+from rest_framework.exceptions import NotFound, ValidationError
+from rest_framework.permissions import IsAdminUser
 from rest_framework.response import Response
-from .models import Patient, Doctor, Appointment, Department, MedicalRecord
+from rest_framework.utils.urls import replace_query_param
+from rest_framework.views import APIView
+from . import analytics, jobs, scheduling, timeline
+from .bulk import BulkMixin
+from .caching import CachedResponseMixin
+from .middleware import metrics
+from .models import Patient, Doctor, Appointment, Department, MedicalRecord, MAX_APPOINTMENT_MINUTES
 from .serializers import PatientSerializer, DoctorSerializer, AppointmentSerializer, DepartmentSerializer, MedicalRecordSerializer
-from .models import InventoryItem
-from .serializers import InventoryItemSerializer
+from .models import InventoryItem, StatCounter
+from .serializers import InventoryItemSerializer, StockMovementSerializer, request_user
+from .serializers import PatientListSerializer, AppointmentListSerializer, InventoryItemListSerializer, MedicalRecordListSerializer
+from .serializers import InventoryReorderListSerializer
+from .exports import EXPORT_FORMATS, streaming_export
+from .fieldsets import project, requested_fields
+from .filters import split_values
+from .search import SEARCH_MAX_RESULTS, get_backend
+from .stock import InsufficientStock, apply_movement, record_opening_stock
+
+
+class FieldsetMixin:
+    """
+    ?fields=id,name / ?exclude=uses on list and retrieve (see fieldsets.py): the
+    serializer drops the other fields and the queryset loads only the columns the
+    remaining ones read.
+    """
+    fieldset_actions = ("list", "retrieve", "export", "search")
+
+    def requested_fields(self):
+        if not hasattr(self, "_requested_fields"):
+            self._requested_fields = None
+            if self.request.method == "GET" and self.action in self.fieldset_actions:
+                self._requested_fields = requested_fields(self.request, readable_fields(self.serializer_class))
+        return self._requested_fields
+
+    def ordering_columns(self):
+        # the cursor is built from these, so they are loaded even when not returned
+        if self.paginator is None or self.action != "list":
+            return ()
+        return tuple(field.lstrip("-") for field in self.paginator.get_ordering(self.request, None, self))
+
+    def get_serializer_context(self):
+        return {**super().get_serializer_context(), "fields": self.requested_fields()}
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        fields = self.requested_fields()
+        # fast list serializers pick their own columns with .values()
+        fast = self.action != "retrieve" and getattr(self, "list_serializer_class", None) is not None
+        if fields is None or fast or self.action not in ("list", "retrieve"):
+            return queryset
+        return project(queryset, [*self.serializer_class.columns(fields), *self.ordering_columns()])
+
+
+@lru_cache
+def readable_fields(serializer_class):
+    return tuple(name for name, field in serializer_class().fields.items() if not field.write_only)
+
+
+class FastListMixin(FieldsetMixin):
+    """
+    Serves `list` from `.values()` rows through `list_serializer_class`, which
+    produces the same JSON as `serializer_class` without building model instances.
+    """
+    list_serializer_class = None
+
+    def get_list_serializer(self):
+        return self.list_serializer_class(fields=self.requested_fields(), extra=self.ordering_columns())
+
+    def list(self, request, *args, **kwargs):
+        if self.list_serializer_class is None:
+            return super().list(request, *args, **kwargs)
+
+        fast = self.get_list_serializer()
+        queryset = fast.get_queryset(self.filter_queryset(self.get_queryset()))
+        page = self.paginate_queryset(queryset)
+        if page is not None:
+            return self.get_paginated_response(fast.serialize(page))
+        return Response(fast.serialize(queryset))
+
+
+class ExportMixin:
+    # GET /<prefix>/export/?as=ndjson|csv streams every row without building the response in memory
+    @action(detail=False, methods=["get"])
+    def export(self, request):
+        export_format = request.query_params.get("as", "ndjson")
+        if export_format not in EXPORT_FORMATS:
+            return Response(
+                {"detail": f"Unknown export format '{export_format}', use one of: {', '.join(EXPORT_FORMATS)}."},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        queryset = self.filter_queryset(self.get_queryset())
+        filename = f"{self.basename}-export-{timezone.localdate().isoformat()}"
+        return streaming_export(self.get_list_serializer(), queryset, export_format, filename)
 
-class PatientViewSet(viewsets.ModelViewSet):
+class PatientViewSet(ExportMixin, FastListMixin, viewsets.ModelViewSet):
     queryset = Patient.objects.all()
+    cursor_ordering = ("-created_at", "-id")
+    filter_fields = {"status": "in", "created_at": "range"}
+    ordering_fields = {"created_at": ("created_at", "id"), "last_name": ("last_name", "first_name", "id")}
     serializer_class = PatientSerializer
+    list_serializer_class = PatientListSerializer
 
-class DoctorViewSet(viewsets.ModelViewSet):
-    queryset = Doctor.objects.all()
+    # GET /patients/search/?q=wanjiku kam&limit=20, best match first
+    @action(detail=False, methods=["get"])
+    def search(self, request):
+        query = request.query_params.get("q", "").strip()
+        if not query:
+            raise ValidationError({"q": "A search query is required."})
+        try:
+            limit = min(max(int(request.query_params.get("limit", 20)), 1), SEARCH_MAX_RESULTS)
+        except ValueError:
+            limit = 20
+
+        ids = get_backend().search(query, limit)
+        fast = self.list_serializer_class(fields=self.requested_fields(), extra=("id",))
+        rows = {row["id"]: fast.to_representation(row) for row in fast.get_queryset(Patient.objects.filter(pk__in=ids))}
+        return Response({"query": query, "results": [rows[pk] for pk in ids if pk in rows]})
+
+    # GET /patients/{id}/timeline/?page_size=20, appointments and records newest first
+    @action(detail=True, methods=["get"])
+    def timeline(self, request, pk=None):
+        try:
+            patient_id = int(pk)
+        except ValueError:
+            raise NotFound()
+        cursor = request.query_params.get("cursor")
+        position = timeline.decode_cursor(cursor) if cursor else None
+        limit = self.paginator.get_page_size(request)
+        results, following = timeline.patient_timeline(patient_id, limit, position)
+        # only an empty page needs to tell "no history" from "no such patient"
+        if not results and not Patient.objects.filter(pk=patient_id).exists():
+            raise NotFound()
+        next_url = None
+        if following is not None:
+            next_url = replace_query_param(request.build_absolute_uri(), "cursor", timeline.encode_cursor(following))
+        return Response({"next": next_url, "results": results})
+
+def parse_moment(value, default):
+    # accepts an ISO datetime or a date (midnight, current timezone)
+    if not value:
+        return default
+    try:
+        # both raise ValueError for well-formed but impossible dates (2024-02-30)
+        moment = parse_datetime(value)
+        day = parse_date(value) if moment is None else None
+    except ValueError:
+        moment = day = None
+    if moment is None:
+        if day is None:
+            raise ValidationError(f"'{value}' is not a valid date or datetime.")
+        moment = datetime.combine(day, datetime.min.time())
+    if timezone.is_naive(moment):
+        moment = timezone.make_aware(moment)
+    return moment
+
+
+# longest ?from=&to= range of the dashboard and the doctor analytics
+MAX_RANGE_DAYS = 366
+
+
+def parse_day(request, param, default):
+    value = request.query_params.get(param)
+    if not value:
+        return default
+    try:
+        # ValueError for well-formed but impossible dates (2024-02-30)
+        day = parse_date(value)
+    except ValueError:
+        day = None
+    if day is None:
+        raise ValidationError({param: f"'{value}' is not a valid date."})
+    return day
+
+
+def check_range(start, end):
+    if end < start or (end - start).days >= MAX_RANGE_DAYS:
+        raise ValidationError({"to": f"Must be on or after 'from' and at most {MAX_RANGE_DAYS} days later."})
+
+
+def parse_duration(request):
+    try:
+        minutes = int(request.query_params.get("duration", 30))
+    except ValueError:
+        raise ValidationError({"duration": "Must be a number of minutes."})
+    if not 5 <= minutes <= MAX_APPOINTMENT_MINUTES:
+        raise ValidationError({"duration": f"Must be between 5 and {MAX_APPOINTMENT_MINUTES} minutes."})
+    return minutes
+
+
+class DoctorViewSet(CachedResponseMixin, FieldsetMixin, viewsets.ModelViewSet):
+    queryset = Doctor.objects.select_related("user")
+    cursor_ordering = ("id",)
+    filter_fields = {"availability": "in", "specialization": "in"}
+    ordering_fields = {"id": ("id",), "rating": ("rating", "id")}
     serializer_class = DoctorSerializer
+    cache_models = (Doctor, User)
 
-class AppointmentViewSet(viewsets.ModelViewSet):
-    queryset = Appointment.objects.all()
+    # GET /doctors/{id}/free-slots/?start=2024-01-20&end=2024-01-27&duration=30
+    @action(detail=True, methods=["get"], url_path="free-slots")
+    def free_slots(self, request, pk=None):
+        doctor = self.get_object()
+        minutes = parse_duration(request)
+        start = parse_moment(request.query_params.get("start"), timezone.now())
+        end = parse_moment(request.query_params.get("end"), start + timedelta(days=7))
+        if end < start:
+            raise ValidationError({"end": "Must be after 'start'."})
+        if end - start > timedelta(days=31):
+            raise ValidationError({"end": "The search range is limited to 31 days."})
+
+        return Response({
+            "doctor": doctor.pk,
+            "availability": doctor.availability,
+            "duration_minutes": minutes,
+            "slots": [
+                {"start": slot_start, "end": slot_end}
+                for slot_start, slot_end in scheduling.free_slots(doctor, start, end, minutes)
+            ],
+        })
+
+    # GET /doctors/analytics/?from=2024-01-01&to=2024-01-07&ordering=-utilization&limit=20, busiest first
+    @action(detail=False, methods=["get"])
+    def analytics(self, request):
+        today = timezone.localdate()
+        start = parse_day(request, "from", today - timedelta(days=today.weekday()))
+        end = parse_day(request, "to", start + timedelta(days=6))
+        check_range(start, end)
+        ordering = request.query_params.get("ordering", "-appointments")
+        if ordering.lstrip("-") not in analytics.ORDERINGS:
+            raise ValidationError({"ordering": f"Can't order by '{ordering.lstrip('-')}', use one of: {', '.join(analytics.ORDERINGS)}."})
+        try:
+            limit = min(max(int(request.query_params.get("limit", 20)), 1), self.paginator.max_page_size)
+        except ValueError:
+            raise ValidationError({"limit": "Must be an integer."})
+
+        return Response({
+            "from": start.isoformat(),
+            "to": end.isoformat(),
+            "workday_minutes": analytics.WORKDAY_MINUTES,
+            "results": analytics.doctor_workload(
+                start, end, ordering, limit, split_values(request, "specialization")
+            ),
+        })
+
+    # GET /doctors/next-available/?specialization=Cardiologist&duration=30
+    @action(detail=False, methods=["get"], url_path="next-available")
+    def next_available(self, request):
+        specialization = request.query_params.get("specialization")
+        if not specialization:
+            raise ValidationError({"specialization": "This query parameter is required."})
+        minutes = parse_duration(request)
+        after = parse_moment(request.query_params.get("after"), timezone.now())
+
+        found = scheduling.next_available(specialization, minutes, after)
+        if found is None:
+            return Response({"detail": "No free slot in the next 14 days."}, status=status.HTTP_404_NOT_FOUND)
+        doctor, slot_start, slot_end = found
+        return Response({
+            "doctor": doctor.pk,
+            "doctorName": doctor.user.get_full_name(),
+            "start": slot_start,
+            "end": slot_end,
+        })
+
+class AppointmentViewSet(BulkMixin, ExportMixin, FastListMixin, viewsets.ModelViewSet):
+    # patientName / doctorName read patient, doctor and doctor.user on every row
+    queryset = Appointment.objects.select_related("patient", "doctor__user")
+    cursor_ordering = ("-scheduled_at", "-id")
+    filter_fields = {"status": "in", "doctor": "in", "patient": "in", "scheduled_at": "range"}
+    ordering_fields = {"scheduled_at": ("scheduled_at", "id")}
     serializer_class = AppointmentSerializer
+    list_serializer_class = AppointmentListSerializer
+    bulk_related = {
+        "patient": Patient.objects.all(),
+        "doctor": Doctor.objects.select_related("user"),
+    }
 
-class DepartmentViewSet(viewsets.ModelViewSet):
+    def bulk_errors(self, objs, errors, exclude_pks=()):
+        # double booking against the database and within the batch, one query for all doctors
+        candidates = [
+            (index, obj) for index, obj in enumerate(objs)
+            if index not in errors and obj.doctor_id is not None and obj.status != "cancelled"
+        ]
+        if not candidates:
+            return
+        # lock the doctor rows, as AppointmentSerializer.ensure_doctor_is_free() does, so
+        # concurrent bookings for the same doctors serialize; in pk order, against deadlocks
+        doctor_ids = sorted({obj.doctor_id for _, obj in candidates})
+        list(Doctor.objects.select_for_update().filter(pk__in=doctor_ids).order_by("pk").values_list("pk", flat=True))
+        busy = scheduling.booked_intervals(
+            {obj.doctor_id for _, obj in candidates},
+            min(obj.scheduled_at for _, obj in candidates),
+            max(obj.ends_at for _, obj in candidates),
+            exclude_pks,
+        )
+        indexes = {}
+        for index, obj in sorted(candidates, key=lambda candidate: candidate[1].scheduled_at):
+            doctor_index = indexes.setdefault(obj.doctor_id, scheduling.IntervalIndex(busy[obj.doctor_id]))
+            if doctor_index.overlaps(obj.scheduled_at, obj.ends_at):
+                errors[index] = {"scheduled_at": [f"{obj.doctor} is already booked at this time."]}
+            else:
+                doctor_index.add(obj.scheduled_at, obj.ends_at)
+
+    def bulk_created(self, objs):
+        jobs.refresh_visit_counts(after=objs)
+
+    def bulk_updated(self, before, objs):
+        jobs.refresh_visit_counts(before, objs)
+
+class DepartmentViewSet(CachedResponseMixin, FieldsetMixin, viewsets.ModelViewSet):
     queryset = Department.objects.all()
+    cursor_ordering = ("name",)
     serializer_class = DepartmentSerializer
+    cache_models = (Department,)
 
-class MedicalRecordViewSet(viewsets.ModelViewSet):
-    queryset = MedicalRecord.objects.all()
+class MedicalRecordViewSet(ExportMixin, FastListMixin, viewsets.ModelViewSet):
+    queryset = MedicalRecord.objects.select_related("created_by")
+    cursor_ordering = ("-created_at", "-id")
+    filter_fields = {"patient": "in", "created_by": "in", "created_at": "range"}
+    ordering_fields = {"created_at": ("created_at", "id")}
     serializer_class = MedicalRecordSerializer
+    list_serializer_class = MedicalRecordListSerializer
+
+    # GET /records/{id}/notes/ streams the full note, decompressed one chunk at a time
+    @action(detail=True, methods=["get"])
+    def notes(self, request, pk=None):
+        record = self.get_object()
+        return StreamingHttpResponse(record.iter_notes(), content_type="text/plain; charset=utf-8")
 
-class InventoryItemViewSet(viewsets.ModelViewSet):
+class InventoryItemViewSet(BulkMixin, FastListMixin, viewsets.ModelViewSet):
     queryset = InventoryItem.objects.all().order_by("name")
+    cursor_ordering = ("name", "id")
+    filter_fields = {"sku": "in", "category": "in", "expiry_date": "range"}
+    ordering_fields = {"name": ("name", "id")}
     serializer_class = InventoryItemSerializer
+    list_serializer_class = InventoryItemListSerializer
+    bulk_unique = ("sku",)
+    # longer expiry windows overflow date arithmetic
+    summary_max_days = 100 * 365
+
+    def bulk_created(self, objs):
+        record_opening_stock(objs, request_user(self.get_serializer_context()))
+
+    # GET /inventory/{id}/movements/ lists the ledger, POST applies a receive/dispense/adjust
+    @action(detail=True, methods=["get", "post"])
+    def movements(self, request, pk=None):
+        item = self.get_object()
+        if request.method == "GET":
+            paginator = self.pagination_class(ordering=("-created_at", "-id"))
+            page = paginator.paginate_queryset(item.movements.select_related("created_by"), request, view=self)
+            serializer = StockMovementSerializer(page, many=True)
+            return paginator.get_paginated_response(serializer.data)
+
+        serializer = StockMovementSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        try:
+            movement = apply_movement(
+                item.pk,
+                serializer.validated_data["kind"],
+                serializer.validated_data["quantity"],
+                user=request_user(self.get_serializer_context()),
+                reason=serializer.validated_data.get("reason", ""),
+            )
+        except InsufficientStock:
+            raise ValidationError({"quantity": ["Not enough stock."]})
+        except InventoryItem.DoesNotExist:
+            raise NotFound()
+        return Response(StockMovementSerializer(movement).data, status=status.HTTP_201_CREATED)
 
     # GET /inventory/low-stock/
-    @action(detail=False, methods=["get"])
+    @action(detail=False, methods=["get"], url_path="low-stock")
     def low_stock(self, request):
-        low_stock_items = InventoryItem.objects.filter(stock__lte=models.F("min_stock"))
-        serializer = self.get_serializer(low_stock_items, many=True)
-        return Response(serializer.data)
+        low_stock_items = self.get_queryset().filter(stock__lte=F("min_stock"))
+        page = self.paginate_queryset(low_stock_items)
+        serializer = self.get_serializer(page, many=True)
+        return self.get_paginated_response(serializer.data)
 
-    # GET /inventory/summary/
+    # GET /inventory/reorder/ lists what to order as of the last forecast run, soonest to run out first
+    @action(detail=False, methods=["get"])
+    def reorder(self, request):
+        paginator = self.pagination_class(ordering=("forecast__days_of_stock", "id"))
+        fast = InventoryReorderListSerializer(extra=paginator.fixed_ordering)
+        queryset = self.filter_queryset(self.get_queryset()).filter(forecast__needs_reorder=True)
+        page = paginator.paginate_queryset(fast.get_queryset(queryset), request, view=self)
+        return paginator.get_paginated_response(fast.serialize(page))
+
+    # GET /inventory/summary/?days=30
     @action(detail=False, methods=["get"])
     def summary(self, request):
-        total_medicines = InventoryItem.objects.count()
-        total_units = InventoryItem.objects.all().values_list("stock", flat=True)
+        try:
+            days = min(max(int(request.query_params.get("days", 30)), 0), self.summary_max_days)
+        except ValueError:
+            days = 30
+        today = timezone.localdate()
+
+        # one GROUP BY category query, totals are summed from the (few) category rows
+        categories = list(
+            InventoryItem.objects.order_by("category").values("category").annotate(
+                medicines=Count("id"),
+                units=Coalesce(Sum("stock"), 0),
+                low_stock=Count("id", filter=Q(stock__lte=F("min_stock"))),
+                expiring_soon=Count("id", filter=Q(expiry_date__gte=today, expiry_date__lte=today + timedelta(days=days))),
+                expired=Count("id", filter=Q(expiry_date__lt=today)),
+            )
+        )
+
+        totals = {
+            key: sum(row[key] for row in categories)
+            for key in ["medicines", "units", "low_stock", "expiring_soon", "expired"]
+        }
+        return Response({
+            "total_medicines": totals["medicines"],
+            "total_units": totals["units"],
+            "low_stock": totals["low_stock"],
+            "expiring_soon": totals["expiring_soon"],
+            "expired": totals["expired"],
+            "expiring_within_days": days,
+            "categories": categories,
+        })
+
+
+class DashboardView(APIView):
+    # GET /dashboard/?from=2024-01-01&to=2024-01-14 reads the counters, two queries at any data size
+
+    def get(self, request):
+        today = timezone.localdate()
+        start = parse_day(request, "from", today - timedelta(days=6))
+        end = parse_day(request, "to", today + timedelta(days=7))
+        check_range(start, end)
 
+        totals = {}
+        for metric, key, count in StatCounter.objects.filter(day__isnull=True).values_list("metric", "key", "count"):
+            totals.setdefault(metric, {})[key] = count
+        days = {}
+        for key, day, count in StatCounter.objects.filter(
+            metric="appointments", day__range=(start, end)
+        ).values_list("key", "day", "count"):
+            days.setdefault(day, {})[key] = count
+
+        patients = totals.get("patients", {})
+        doctors = totals.get("doctors", {})
+        inventory = totals.get("inventory", {})
+        return Response({
+            "patients": {"total": sum(patients.values()), "by_status": patients},
+            "doctors": {"total": sum(doctors.values()), "by_availability": doctors},
+            "inventory": {"total": inventory.get("total", 0), "low_stock": inventory.get("low_stock", 0)},
+            "appointments": {
+                "from": start.isoformat(),
+                "to": end.isoformat(),
+                "by_day": [
+                    {
+                        "day": day.isoformat(),
+                        "total": sum(days.get(day, {}).values()),
+                        "by_status": days.get(day, {}),
+                    }
+                    for day in (start + timedelta(days=n) for n in range((end - start).days + 1))
+                ],
+            },
+        })
+
+
+
+class RequestMetricsView(APIView):
+    # GET /metrics/ returns the aggregated request metrics, DELETE resets them
+    def get_permissions(self):
+        if settings.DEBUG:
+            return []
+        return [IsAdminUser()]
+
+    def get(self, request):
         return Response({
-            "total_medicines": total_medicines,
-            "total_units": sum(total_units)
-        })
\ No newline at end of file
+            "enabled": getattr(settings, "REQUEST_METRICS_ENABLED", False),
+            **metrics.snapshot(),
+        })
+
+    def delete(self, request):
+        metrics.reset()
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
@@ -10,12 +10,18 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.2/ref/settings/
 """
 
+import os
+from importlib.util import find_spec
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
 
 
+def env_flag(name, default=''):
+    return os.environ.get(name, default).lower() in ('1', 'true', 'yes')
+
+
 # Quick-start development settings - unsuitable for production
 # See https://docs.djangoproject.com/en/5.2/howto/deployment/checklist/
 
@@ -45,14 +51,35 @@ INSTALLED_APPS = [
 MIDDLEWARE = [
     'corsheaders.middleware.CorsMiddleware', 
     'django.middleware.security.SecurityMiddleware',
+    'hospital_api.middleware.CompressionMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'hospital_api.middleware.RequestMetricsMiddleware',
 ]
 
+# Per-request SQL/timing metrics, exposed at /api/metrics/. Off unless REQUEST_METRICS_ENABLED=1.
+REQUEST_METRICS_ENABLED = env_flag('REQUEST_METRICS_ENABLED')
+REQUEST_METRICS_QUERY_BUDGET = int(os.environ.get('REQUEST_METRICS_QUERY_BUDGET', 20))
+
+# Responses at least this large are sent gzip/brotli compressed when the client accepts it.
+RESPONSE_COMPRESSION_MIN_BYTES = int(os.environ.get('RESPONSE_COMPRESSION_MIN_BYTES', 1024))
+
+REST_FRAMEWORK = {
+    'DEFAULT_PAGINATION_CLASS': 'hospital_api.pagination.HospitalCursorPagination',
+    'DEFAULT_FILTER_BACKENDS': ['hospital_api.filters.HospitalFilterBackend'],
+    # JSON first so it stays the default, MessagePack with Accept: application/msgpack (needs msgpack)
+    'DEFAULT_RENDERER_CLASSES': [
+        'hospital_api.renderers.ORJSONRenderer',
+        *(['hospital_api.renderers.MessagePackRenderer'] if find_spec('msgpack') else []),
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
+    'PAGE_SIZE': 50,
+}
+
 CORS_ALLOWED_ORIGINS = [
     "https://life-line-hospital-mangement-system.vercel.app",
     "http://localhost:3000",
@@ -84,12 +111,91 @@ WSGI_APPLICATION = 'life_line_backend.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/5.2/ref/settings/#databases
 
-DATABASES = {
+# DB_ENGINE picks the backend: sqlite (default), postgresql or mysql.
+DB_ENGINE = os.environ.get('DB_ENGINE', 'sqlite').lower()
+# seconds a connection is kept open between requests, 0 closes it after every request
+DB_CONN_MAX_AGE = int(os.environ.get('DB_CONN_MAX_AGE', 60))
+
+if DB_ENGINE in ('postgres', 'postgresql'):
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.postgresql',
+            'NAME': os.environ.get('DB_NAME', 'life_line'),
+            'USER': os.environ.get('DB_USER', 'postgres'),
+            'PASSWORD': os.environ.get('DB_PASSWORD', ''),
+            'HOST': os.environ.get('DB_HOST', 'localhost'),
+            'PORT': os.environ.get('DB_PORT', '5432'),
+            'CONN_MAX_AGE': DB_CONN_MAX_AGE,
+            'CONN_HEALTH_CHECKS': True,
+            'OPTIONS': {},
+        }
+    }
+    if env_flag('DB_POOL'):
+        # psycopg 3 pool (pip install "psycopg[pool]"), shared by the threads of a worker
+        # process. It replaces persistent connections, Django refuses both at once.
+        DATABASES['default']['CONN_MAX_AGE'] = 0
+        DATABASES['default']['OPTIONS']['pool'] = {
+            'min_size': int(os.environ.get('DB_POOL_MIN_SIZE', 2)),
+            'max_size': int(os.environ.get('DB_POOL_MAX_SIZE', 10)),
+            'timeout': int(os.environ.get('DB_POOL_TIMEOUT', 10)),
+        }
+elif DB_ENGINE == 'mysql':
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.mysql',
+            'NAME': os.environ.get('DB_NAME', 'life_line'),
+            'USER': os.environ.get('DB_USER', 'root'),
+            'PASSWORD': os.environ.get('DB_PASSWORD', ''),
+            'HOST': os.environ.get('DB_HOST', 'localhost'),
+            'PORT': os.environ.get('DB_PORT', '3306'),
+            'CONN_MAX_AGE': DB_CONN_MAX_AGE,
+            'CONN_HEALTH_CHECKS': True,
+            'OPTIONS': {'charset': 'utf8mb4'},
+        }
+    }
+else:
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': os.environ.get('SQLITE_PATH', BASE_DIR / 'db.sqlite3'),
+            'CONN_MAX_AGE': DB_CONN_MAX_AGE,
+            'OPTIONS': {
+                # wait this many seconds for a lock instead of failing with "database is locked"
+                'timeout': float(os.environ.get('SQLITE_BUSY_TIMEOUT', 20)),
+            },
+            # a file (not shared-cache memory) so threaded tests see real SQLite locking
+            'TEST': {'NAME': BASE_DIR / 'test_db.sqlite3'},
+        }
+    }
+    if not env_flag('SQLITE_DEFAULTS'):
+        DATABASES['default']['OPTIONS'].update({
+            # writers take the lock at BEGIN, so a transaction that read first can't fail
+            # when it upgrades to a write lock held by someone else (busy timeout doesn't apply there)
+            'transaction_mode': 'IMMEDIATE',
+            # WAL lets readers run alongside the writer, NORMAL only fsyncs at checkpoints
+            'init_command': (
+                'PRAGMA journal_mode=WAL;'
+                'PRAGMA synchronous=NORMAL;'
+                f"PRAGMA mmap_size={int(os.environ.get('SQLITE_MMAP_SIZE', 256 * 1024 * 1024))};"
+                'PRAGMA cache_size=-32000;'
+                'PRAGMA temp_store=MEMORY;'
+            ),
+        })
+
+# Cache
+# https://docs.djangoproject.com/en/5.2/topics/cache/
+# Cached responses are invalidated by model signals in the process that made the
+# write, so use a shared backend (Redis, Memcached) when running several workers.
+
+CACHES = {
     'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'life-line',
     }
 }
+
+RESPONSE_CACHE_TIMEOUT = 300
+
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
 